@@ -9,8 +9,14 @@ https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
 
 import os
 
+from django.conf import settings
+from django.contrib.staticfiles.handlers import ASGIStaticFilesHandler
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "Outsourcing_data_services.settings")
 
 application = get_asgi_application()
+
+# в режиме отладки статику отдает сам Django, как runserver; в production — веб-сервер из STATIC_ROOT
+if settings.DEBUG:
+    application = ASGIStaticFilesHandler(application)
@@ -17,10 +17,13 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
+    "django.contrib.postgres",
     "working_time_accounting_system",
 ]
 
 MIDDLEWARE = [
+    "working_time_accounting_system.metrics.metrics_middleware",
+    "working_time_accounting_system.routers.replica_pin_middleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -54,6 +57,12 @@ WSGI_APPLICATION = "Outsourcing_data_services.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
+# Постоянные соединения: процесс переиспользует соединение DATABASE_CONN_MAX_AGE секунд, а перед первым
+# запросом каждого HTTP-запроса проверяет, что оно живо (CONN_HEALTH_CHECKS), — после перезапуска базы
+# или разрыва сети запрос откроет новое соединение вместо ошибки. Под ASGI значение должно быть 0:
+# соединения потоков sync_to_async не закрываются по окончании запроса.
+DATABASE_CONN_MAX_AGE = int(os.environ.get('DATABASE_CONN_MAX_AGE', 60))
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.postgresql_psycopg2',
@@ -64,9 +73,84 @@ DATABASES = {
         'PORT': '5432',
         # 'HOST': 'localhost',
         # 'PORT': '6543',
+        'CONN_MAX_AGE': DATABASE_CONN_MAX_AGE,
+        'CONN_HEALTH_CHECKS': True,
+    }
+}
+
+# Реплики только для чтения (потоковая репликация default): DATABASE_REPLICA_HOSTS="хост[:порт],...".
+# Каждая становится алиасом replica_1, replica_2, ... с теми же базой и пользователем, что и default.
+# ReplicaRouter направляет в случайную реплику чтение отчетов, списка таймшитов, выгрузок и
+# автодополнения (ReplicaReadMixin); запись и остальные страницы, в том числе результат импорта,
+# работают с default. После POST, PUT, PATCH или DELETE клиент еще DATABASE_REPLICA_PIN_SECONDS секунд
+# читает из default, чтобы увидеть свои изменения, пока реплика их догоняет.
+DATABASE_REPLICAS = []
+for number, address in enumerate(filter(None, os.environ.get('DATABASE_REPLICA_HOSTS', '').split(',')), 1):
+    host, _, port = address.strip().partition(':')
+    DATABASES[f'replica_{number}'] = {
+        **DATABASES['default'],
+        'HOST': host,
+        'PORT': port or DATABASES['default']['PORT'],
+        # в тестах реплика — то же соединение, что и default
+        'TEST': {'MIRROR': 'default'},
     }
+    DATABASE_REPLICAS.append(f'replica_{number}')
+
+DATABASE_ROUTERS = ['working_time_accounting_system.routers.ReplicaRouter']
+DATABASE_REPLICA_PIN_SECONDS = 5
+
+# Кэш отчетов. Файловый бэкенд общий для всех процессов gunicorn и обработчика импорта
+# на одном хосте; для одного процесса можно использовать locmem.LocMemCache.
+# TIMEOUT — TTL записей в секундах, MAX_ENTRIES — граница, после которой старые записи вытесняются.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'reports': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache', 'reports'),
+        'TIMEOUT': 600,
+        'OPTIONS': {
+            'MAX_ENTRIES': 1000,
+        },
+    },
 }
 
+# Отчет без фильтров читается из материализованных представлений (миграция 0008), которые
+# обновляются manage.py refresh_report_views и после каждого импорта. Данные отчета отстают
+# на время с последнего обновления; отчет с фильтрами всегда строится по сводной таблице.
+REPORT_USE_MATERIALIZED_VIEWS = False
+
+# Секции архива удаленных таймшитов старше этого числа месяцев удаляются
+# manage.py prune_timesheet_history (с --dump-dir предварительно выгружаются в gzip CSV).
+TIMESHEET_HISTORY_RETENTION_MONTHS = 24
+
+# JSON API пакетной загрузки (api/positions/, api/employees/, api/timesheets/): запросы должны
+# передавать заголовок "Authorization: Token <токен>", без заданного токена API отвечает 403;
+# размер запроса ограничен INGEST_MAX_ITEMS элементами, которые загружаются в одной транзакции.
+INGEST_API_TOKEN = os.environ.get('INGEST_API_TOKEN', '')
+INGEST_MAX_ITEMS = 5000
+
+# Число процессов построчного импорта таймшитов в фоновой задаче. При значении больше 1 строки
+# делятся по сотрудникам и загружаются параллельно, каждая часть — в своей транзакции
+# (см. TimesheetImporter.import_parallel).
+TIMESHEET_IMPORT_WORKERS = 1
+
+# Кэши разрешения должностей, сотрудников и задач по имени и id (см. resolvers): не больше
+# RESOLVER_CACHE_SIZE объектов на кэш в каждом процессе, каждый не дольше RESOLVER_CACHE_TTL секунд.
+# Изменения в других процессах видны после истечения TTL. Если задан RESOLVER_CACHE_ALIAS (общий
+# кэш из CACHES, например Redis или Memcached), промахи сначала ищутся в нем, а сохранение или
+# удаление объекта сбрасывает кэши всех процессов сразу.
+RESOLVER_CACHE_SIZE = 10000
+RESOLVER_CACHE_TTL = 300
+RESOLVER_CACHE_ALIAS = None
+
+# Автодополнение сотрудников (employees/autocomplete/): подсказок в ответе по умолчанию и не больше
+# чем MAX_LIMIT; ответы кэшируются в кэше default на TTL секунд.
+EMPLOYEE_AUTOCOMPLETE_LIMIT = 10
+EMPLOYEE_AUTOCOMPLETE_MAX_LIMIT = 50
+EMPLOYEE_AUTOCOMPLETE_TTL = 30
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         "NAME": "django.contrib.auth.password_validation.UserAttributeSimilarityValidator",
@@ -93,6 +177,8 @@ USE_TZ = True
 STATIC_URL = "static/"
 STATIC_ROOT = os.path.join(BASE_DIR, 'static')
 
+MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+
 STATICFILES_DIRS = [
     BASE_DIR / "../tailwind_css/node_modules/flowbite/dist/",
 ]
@@ -1,19 +1,127 @@
+from datetime import datetime
 from django.contrib import admin
-from .models import Position, Employee, Task, Timesheet, TimesheetHistory
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.db.models import Q
+from django.utils.formats import date_format
+from django.utils.text import smart_split, unescape_string_literal
+from .models import Position, Employee, Task, Timesheet, TimesheetHistory, ImportJob, ImportManifest
+from .pagination import EstimatedCountPaginator
+from .partitions import MonthlyPartitions, month_start, add_months
+
+
+def search_terms(search_term):
+    """Слова поиска, как их разбирает ModelAdmin.get_search_results: фразы в кавычках — одним словом."""
+    for bit in smart_split(search_term):
+        if bit.startswith(('"', "'")) and bit[0] == bit[-1]:
+            bit = unescape_string_literal(bit)
+        yield bit
+
+
+class MonthListFilter(admin.SimpleListFilter):
+    """Фильтр по месяцу start_time для секционированных таблиц вместо date_hierarchy: навигация по датам
+    на каждой загрузке списка выполняет Min/Max и DISTINCT по дням или месяцам всей таблицы. Месяцы
+    фильтра берутся из каталога секций (MonthlyPartitions), а выбранный месяц ограничивает start_time,
+    поэтому запрос читает одну секцию."""
+
+    title = 'месяц'
+    parameter_name = 'month'
+
+    def lookups(self, request, model_admin):
+        partitions = MonthlyPartitions(model_admin.model._meta.db_table).partitions()
+        return [(f'{month:%Y-%m}', date_format(month, 'YEAR_MONTH_FORMAT')) for month in reversed(partitions)]
+
+    def queryset(self, request, queryset):
+        if not self.value():
+            return queryset
+        try:
+            month = month_start(datetime.strptime(self.value(), '%Y-%m'))
+        except ValueError as e:
+            raise IncorrectLookupParameters(e)
+        return queryset.filter(start_time__gte=month, start_time__lt=add_months(month, 1))
+
+
+class EmployeeAdmin(admin.ModelAdmin):
+    list_display = ('employee_name', 'position')
+    list_select_related = ('position',)
+    search_fields = ('employee_name',)
+    ordering = ('employee_name',)
+
+
+class TaskAdmin(admin.ModelAdmin):
+    search_fields = ('task_name',)
+    ordering = ('task_name',)
 
 
 class TimesheetAdmin(admin.ModelAdmin):
+    """Список таймшитов для таблицы в десятки миллионов строк: сотрудник и задача загружаются
+    тем же запросом (list_select_related), число строк оценивается планировщиком
+    (EstimatedCountPaginator) без второго COUNT(*) по всей таблице, а фильтр по месяцу (MonthListFilter)
+    читает только секцию выбранного месяца. Сотрудник и задача в форме выбираются поиском
+    (autocomplete_fields), а не выпадающим списком всех записей."""
+
     list_display = ('employee', 'task', 'start_time', 'end_time')
-    search_fields = ('employee', 'task')
+    list_select_related = ('employee', 'task')
+    search_fields = ('employee__employee_name', 'task__task_name')
+    list_filter = (MonthListFilter,)
+    autocomplete_fields = ('employee', 'task')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_search_results(self, request, queryset, search_term):
+        """Каждое слово ищется в именах сотрудников и названиях задач (GIN-индексы pg_trgm),
+        и таймшиты отбираются по найденным id через индексы employee_id и task_id.
+        Стандартный поиск соединил бы таблицу таймшитов с сотрудниками и задачами и проверял
+        условие по каждой строке."""
+        for term in search_terms(search_term):
+            queryset = queryset.filter(
+                Q(employee__in=Employee.objects.filter(employee_name__icontains=term).values('pk'))
+                | Q(task__in=Task.objects.filter(task_name__icontains=term).values('pk'))
+            )
+        return queryset, False
 
 
 class TimesheetHistoryAdmin(admin.ModelAdmin):
-    list_display = ('employee_id', 'task_title', 'start_time', 'end_time')
-    search_fields = ('employee_id', 'task_title', 'start_time', 'end_time')
+    """Поиск: числовое слово — id сотрудника (индекс history_employee_start_idx), остальные — подстрока
+    названия задачи (GIN-индекс pg_trgm); фильтр по месяцу, как и у таймшитов, читает только секцию
+    выбранного месяца, а число строк оценивается планировщиком."""
+
+    # наибольшее значение bigint — 19 цифр
+    MAX_ID_DIGITS = 18
+
+    list_display = ('employee_id', 'task_title', 'start_time', 'end_time', 'deleted_at')
+    search_fields = ('task_title',)
+    list_filter = (MonthListFilter,)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_search_results(self, request, queryset, search_term):
+        """Стандартный поиск '=employee_id' сравнивает UPPER(employee_id::text) со строкой, и индекс
+        по employee_id не используется — поэтому id сравнивается как число. Числовое слово не ищется
+        в названиях задач: образец короче трех символов не использует индекс pg_trgm."""
+        for term in search_terms(search_term):
+            if term.isdigit() and len(term) <= self.MAX_ID_DIGITS:
+                queryset = queryset.filter(employee_id=int(term))
+            else:
+                queryset = queryset.filter(task_title__icontains=term)
+        return queryset, False
+
+
+class ImportJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'status', 'stage', 'rows_processed', 'error_count', 'created_at', 'finished_at')
+    list_filter = ('status',)
+
+
+class ImportManifestAdmin(admin.ModelAdmin):
+    """Удаление файла удаляет и отпечатки его строк: при следующей загрузке они будут обработаны снова."""
+
+    list_display = ('id', 'importer', 'content_hash', 'size', 'created_at', 'completed_at', 'reopened_at')
+    list_filter = ('importer',)
 
 
 admin.site.register(Position)
-admin.site.register(Employee)
-admin.site.register(Task)
+admin.site.register(Employee, EmployeeAdmin)
+admin.site.register(Task, TaskAdmin)
 admin.site.register(TimesheetHistory, TimesheetHistoryAdmin)
 admin.site.register(Timesheet, TimesheetAdmin)
+admin.site.register(ImportJob, ImportJobAdmin)
+admin.site.register(ImportManifest, ImportManifestAdmin)
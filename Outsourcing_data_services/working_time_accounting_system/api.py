@@ -0,0 +1,110 @@
+import json
+from django.conf import settings
+from django.db import transaction
+from django.http import JsonResponse
+from django.utils import timezone
+from django.utils.crypto import constant_time_compare
+from django.utils.dateparse import parse_datetime
+from django.utils.decorators import method_decorator
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from .importers import CsvImporter, PositionImporter, EmployeeImporter, TimesheetImporter
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class BulkIngestView(View):
+    """Пакетная загрузка записей в JSON: список объектов или {"items": [...]} с полями fields.
+    Элементы проходят через тот же импортер, что и CSV, одним пакетом в одной транзакции,
+    поэтому запрос на несколько тысяч записей стоит несколько SQL-запросов, а не запрос на запись.
+    В ответе — итоги и статус каждого элемента в порядке запроса: created (с id), skipped или error.
+    Запрос должен передать заголовок "Authorization: Token <INGEST_API_TOKEN>". Представление
+    не проверяет CSRF, поэтому без заданного токена API выключен и отвечает 403 — иначе записывать
+    данные мог бы любой клиент, в том числе чужая страница, открытая в браузере пользователя."""
+
+    importer_class = None
+    fields = ()
+
+    def post(self, request):
+        if not settings.INGEST_API_TOKEN:
+            return JsonResponse({'errors': ['Ingest API is disabled: INGEST_API_TOKEN is not set']}, status=403)
+        if not self.authorized(request):
+            return JsonResponse({'errors': ['Invalid or missing API token']}, status=401)
+        try:
+            payload = json.loads(request.body)
+        except ValueError as e:
+            return JsonResponse({'errors': [f'Invalid JSON: {e}']}, status=400)
+        items = payload.get('items') if isinstance(payload, dict) else payload
+        if not isinstance(items, list):
+            return JsonResponse({'errors': ['Expected a list of items or {"items": [...]}']}, status=400)
+        if len(items) > settings.INGEST_MAX_ITEMS:
+            return JsonResponse({'errors': [f'Too many items: at most {settings.INGEST_MAX_ITEMS} per request']}, status=400)
+
+        results = [None] * len(items)
+        rows, indexes = [], []
+        for index, item in enumerate(items):
+            try:
+                rows.append(self.item_to_row(item))
+            except ValueError as e:
+                results[index] = CsvImporter.result(CsvImporter.ERROR, error=str(e))
+                continue
+            indexes.append(index)
+
+        importer = self.importer_class()
+        with transaction.atomic():
+            for index, result in zip(indexes, importer.import_batch(rows)):
+                results[index] = result
+
+        summary = {status: 0 for status in (CsvImporter.CREATED, CsvImporter.SKIPPED, CsvImporter.ERROR)}
+        for result in results:
+            summary[result['status']] += 1
+        return JsonResponse({
+            'created': summary[CsvImporter.CREATED],
+            'skipped': summary[CsvImporter.SKIPPED],
+            'errors': summary[CsvImporter.ERROR],
+            'items': results,
+        })
+
+    def authorized(self, request):
+        token = settings.INGEST_API_TOKEN
+        scheme, _, value = request.headers.get('Authorization', '').partition(' ')
+        return scheme == 'Token' and constant_time_compare(value.strip(), token)
+
+    def item_to_row(self, item):
+        """Элемент запроса в строку импортера (значения полей в порядке fields)."""
+        if not isinstance(item, dict):
+            raise ValueError('Item must be an object')
+        row = []
+        for field in self.fields:
+            value = item.get(field)
+            if value is None or isinstance(value, (dict, list)):
+                raise ValueError(f"Missing or invalid field '{field}'")
+            row.append(str(value))
+        return row
+
+
+class PositionIngestView(BulkIngestView):
+    importer_class = PositionImporter
+    fields = ('position_name', 'hourly_rate')
+
+
+class EmployeeIngestView(BulkIngestView):
+    importer_class = EmployeeImporter
+    fields = ('employee_name', 'position_name')
+
+
+class TimesheetIngestView(BulkIngestView):
+    """start_time и end_time принимаются в ISO 8601; время без смещения считается временем TIME_ZONE."""
+
+    importer_class = TimesheetImporter
+    fields = ('task_name', 'employee_name', 'start_time', 'end_time')
+
+    def item_to_row(self, item):
+        row = super().item_to_row(item)
+        for position in (2, 3):
+            value = parse_datetime(row[position])
+            if value is None:
+                raise ValueError(f"Invalid datetime '{row[position]}' in field '{self.fields[position]}'")
+            if timezone.is_aware(value):
+                value = timezone.localtime(value)
+            row[position] = value.strftime(TimesheetImporter.datetime_format)
+        return row
@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class DashboardAppConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "working_time_accounting_system"
+
+    def ready(self):
+        # обертка SQL-запросов для метрик ставится на соединения по сигналу connection_created
+        from . import metrics  # noqa: F401
+        # кэши разрешения имен сбрасываются по сигналам post_save и post_delete
+        from . import resolvers  # noqa: F401
@@ -0,0 +1,48 @@
+import hashlib
+from django.conf import settings
+from django.contrib.postgres.search import TrigramWordSimilarity
+from django.core.cache import caches
+from django.db import connection
+from django.db.models import Case, IntegerField, Q, TextField, Value, When
+from django.db.models.functions import Cast, Upper
+from .models import Employee
+
+# поиск с подстрокой и похожими словами — только с этой длины: более короткий образец
+# не дает триграмм, и индекс pg_trgm пришлось бы читать целиком
+MIN_TRIGRAM_LENGTH = 3
+
+
+def search_employees(term, limit):
+    """Сотрудники для автодополнения: [{'id', 'name'}, ...], не больше limit.
+    Сначала имена, начинающиеся с term (индекс employee_name_prefix_idx), затем содержащие term
+    или похожие на одно из слов имени по триграммам (employee_name_trgm_idx), по убыванию похожести.
+    Сравнение без учета регистра идет по тому же выражению UPPER(employee_name::text), что и в индексах."""
+    term = term.strip()
+    if not term:
+        return []
+    search = Upper(Cast('employee_name', TextField()))
+    employees = Employee.objects.annotate(search=search)
+    pattern = term.upper()
+    if len(term) < MIN_TRIGRAM_LENGTH or connection.vendor != 'postgresql':
+        employees = employees.filter(employee_name__istartswith=term).order_by('employee_name')
+    else:
+        employees = employees.filter(
+            Q(employee_name__icontains=term) | Q(search__trigram_word_similar=pattern)
+        ).annotate(
+            prefix=Case(When(employee_name__istartswith=term, then=Value(0)), default=Value(1), output_field=IntegerField()),
+            similarity=TrigramWordSimilarity(Value(pattern), search),
+        ).order_by('prefix', '-similarity', 'employee_name')
+    return [{'id': pk, 'name': name} for pk, name in employees.values_list('pk', 'employee_name')[:limit]]
+
+
+def cached_search_employees(term, limit):
+    """search_employees с кэшем на EMPLOYEE_AUTOCOMPLETE_TTL секунд: подсказки запрашиваются на каждое
+    нажатие клавиши, а новые и переименованные сотрудники появляются в них не позже чем через TTL."""
+    digest = hashlib.md5(term.strip().lower().encode()).hexdigest()
+    key = f'employee_autocomplete:{limit}:{digest}'
+    cache = caches['default']
+    results = cache.get(key)
+    if results is None:
+        results = search_employees(term, limit)
+        cache.set(key, results, timeout=settings.EMPLOYEE_AUTOCOMPLETE_TTL)
+    return results
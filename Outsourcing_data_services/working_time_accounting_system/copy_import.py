@@ -0,0 +1,264 @@
+from uuid import uuid4
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import transaction, connection, DataError
+from .intervals import IntervalIndex
+from .metrics import IMPORT_PHASE_SECONDS, IMPORT_ROWS, timed
+from .models import Position, Employee, Task, Timesheet
+from .report_cache import invalidate_reports
+from .rollups import rollup_upsert_sql, rollup_upsert_params
+
+
+def table(model):
+    return connection.ops.quote_name(model._meta.db_table)
+
+
+class CopyImporter:
+    """Быстрый импорт для PostgreSQL. Файл целиком загружается в нежурналируемую промежуточную таблицу
+    через COPY FROM STDIN, затем несколькими множественными запросами разрешаются внешние ключи,
+    отклоненные строки помечаются в колонке error, а остальные вставляются с ON CONFLICT DO NOTHING.
+    Возвращает тот же кортеж (errors, count), что и построчные импортеры. В метрики этап COPY
+    записывается как parse, а слияние (разрешение ключей, проверки и вставка одним SQL) — как write."""
+
+    name = None
+    columns = ()
+    extra_columns = ''
+
+    @classmethod
+    def import_from_csv(cls, uploaded_file):
+        staging = connection.ops.quote_name(f'import_staging_{cls.name}_{uuid4().hex}')
+        try:
+            with transaction.atomic(), connection.cursor() as cursor:
+                # таблица создается внутри транзакции, поэтому при ошибке она исчезнет вместе с откатом
+                cursor.execute(
+                    f"CREATE UNLOGGED TABLE {staging} ("
+                    f"line_no bigserial, {', '.join(f'{column} text' for column in cls.columns)}, "
+                    f"{cls.extra_columns}error text)"
+                )
+                uploaded_file.seek(0)
+                with timed(IMPORT_PHASE_SECONDS, importer=cls.name, phase='parse'):
+                    with connection.wrap_database_errors:
+                        cursor.copy_expert(
+                            f"COPY {staging} ({', '.join(cls.columns)}) FROM STDIN WITH (FORMAT csv, ENCODING 'UTF8')",
+                            uploaded_file,
+                        )
+                    cursor.execute(f"ANALYZE {staging}")
+                with timed(IMPORT_PHASE_SECONDS, importer=cls.name, phase='write'):
+                    count = cls.merge(cursor, staging)
+                invalidate_reports()
+                cursor.execute(f"SELECT {cls.columns[0]}, error FROM {staging} WHERE error IS NOT NULL ORDER BY line_no")
+                errors = [cls.format_error(name, error) for name, error in cursor.fetchall()]
+                cursor.execute(f"SELECT count(*) FROM {staging}")
+                rows = cursor.fetchone()[0]
+                cursor.execute(f"DROP TABLE {staging}")
+        except DataError as e:
+            return [f"Error importing {cls.name}: {e}"], 0
+        IMPORT_ROWS.inc(count, importer=cls.name, status='created')
+        IMPORT_ROWS.inc(len(errors), importer=cls.name, status='error')
+        IMPORT_ROWS.inc(rows - count - len(errors), importer=cls.name, status='skipped')
+        return errors, count
+
+    @classmethod
+    def merge(cls, cursor, staging):
+        raise NotImplementedError
+
+    @classmethod
+    def format_error(cls, name, error):
+        return f"Error adding {cls.name[:-1]} '{name}': {error}"
+
+
+class PositionCopyImporter(CopyImporter):
+    name = 'positions'
+    columns = ('position_name', 'hourly_rate')
+    extra_columns = 'rate integer, '
+
+    @classmethod
+    def merge(cls, cursor, staging):
+        cursor.execute(
+            f"UPDATE {staging} SET rate = hourly_rate::int WHERE hourly_rate ~ '^\\s*\\d{{1,9}}\\s*$'"
+        )
+        cursor.execute(
+            f"UPDATE {staging} SET error = 'invalid hourly rate ' || coalesce(quote_literal(hourly_rate), 'NULL') "
+            f"WHERE rate IS NULL OR rate > 100"
+        )
+        cursor.execute(
+            f"UPDATE {staging} s SET error = 'position already exists with hourly rate ' || p.hourly_rate "
+            f"FROM {table(Position)} p "
+            f"WHERE s.error IS NULL AND p.position_name = s.position_name AND p.hourly_rate <> s.rate"
+        )
+        cursor.execute(
+            f"WITH inserted AS ("
+            f"INSERT INTO {table(Position)} (position_name, hourly_rate) "
+            f"SELECT DISTINCT ON (position_name) position_name, rate FROM {staging} "
+            f"WHERE error IS NULL ORDER BY position_name, line_no "
+            f"ON CONFLICT DO NOTHING RETURNING 1"
+            f") SELECT count(*) FROM inserted"
+        )
+        return cursor.fetchone()[0]
+
+
+class EmployeeCopyImporter(CopyImporter):
+    name = 'employees'
+    columns = ('employee_name', 'position_name')
+    extra_columns = 'position_id bigint, '
+
+    @classmethod
+    def merge(cls, cursor, staging):
+        cursor.execute(
+            f"UPDATE {staging} s SET position_id = p.id FROM {table(Position)} p "
+            f"WHERE p.position_name = s.position_name"
+        )
+        cursor.execute(
+            f"UPDATE {staging} SET error = 'position ' || coalesce(quote_literal(position_name), 'NULL') "
+            f"|| ' does not exist' WHERE position_id IS NULL"
+        )
+        cursor.execute(
+            f"UPDATE {staging} s SET error = 'employee already exists with another position' "
+            f"FROM {table(Employee)} e "
+            f"WHERE s.error IS NULL AND e.employee_name = s.employee_name AND e.position_id <> s.position_id"
+        )
+        cursor.execute(
+            f"WITH inserted AS ("
+            f"INSERT INTO {table(Employee)} (employee_name, position_id) "
+            f"SELECT DISTINCT ON (employee_name) employee_name, position_id FROM {staging} "
+            f"WHERE error IS NULL ORDER BY employee_name, line_no "
+            f"ON CONFLICT DO NOTHING RETURNING 1"
+            f") SELECT count(*) FROM inserted"
+        )
+        return cursor.fetchone()[0]
+
+
+class TimesheetCopyImporter(CopyImporter):
+    name = 'timesheets'
+    columns = ('task_name', 'employee_name', 'start_time', 'end_time')
+    extra_columns = (
+        'employee_id bigint, task_id bigint, starts timestamptz, ends timestamptz, '
+        'skip boolean NOT NULL DEFAULT false, '
+    )
+    datetime_pattern = '^\\d{4}-\\d{2}-\\d{2} \\d{2}:\\d{2}:\\d{2}$'
+    overlap_message = (
+        'Сотрудник не может работать над двумя задачами одновременно. Найден пересекающийся таймшит: '
+    )
+
+    @classmethod
+    def valid_datetime_sql(cls, column):
+        """Условие, что значение column — существующие дата и время в формате datetime_pattern. Приведение
+        к timestamp несуществующей даты (2023-02-30 или год 0) вызвало бы ошибку для всего файла, поэтому
+        поля проверяются как числа; CASE не дает вычислить дату, пока не проверены формат и месяц.
+        Как и strptime в построчном импорте, отклоняются час 24 и секунда 60, которые PostgreSQL принимает."""
+        return (
+            f"CASE WHEN {column} IS NULL OR {column} !~ %s THEN false "
+            f"WHEN substr({column}, 1, 4)::int = 0 OR substr({column}, 6, 2)::int NOT BETWEEN 1 AND 12 THEN false "
+            f"ELSE substr({column}, 9, 2)::int BETWEEN 1 AND extract(day FROM "
+            f"(substr({column}, 1, 7) || '-01')::date + interval '1 month' - interval '1 day') "
+            f"AND substr({column}, 12, 2)::int <= 23 AND substr({column}, 15, 2)::int <= 59 "
+            f"AND substr({column}, 18, 2)::int <= 59 END"
+        )
+
+    @classmethod
+    def merge(cls, cursor, staging):
+        cursor.execute(
+            f"UPDATE {staging} SET error = 'invalid datetime' "
+            f"WHERE NOT ({cls.valid_datetime_sql('start_time')}) OR NOT ({cls.valid_datetime_sql('end_time')})",
+            [cls.datetime_pattern, cls.datetime_pattern],
+        )
+        # строки CSV без зоны трактуются в TIME_ZONE проекта, как и наивные datetime в ORM
+        cursor.execute(
+            f"UPDATE {staging} SET starts = start_time::timestamp AT TIME ZONE %s, "
+            f"ends = end_time::timestamp AT TIME ZONE %s WHERE error IS NULL",
+            [settings.TIME_ZONE, settings.TIME_ZONE],
+        )
+        cursor.execute(
+            f"UPDATE {staging} SET error = %s WHERE error IS NULL AND starts >= ends",
+            ['Время окончания работы должно быть позже времени начала'],
+        )
+        cursor.execute(
+            f"UPDATE {staging} s SET employee_id = e.id FROM {table(Employee)} e "
+            f"WHERE s.error IS NULL AND e.employee_name = s.employee_name"
+        )
+        cursor.execute(
+            f"UPDATE {staging} SET error = 'Сотрудник ' || coalesce(quote_literal(employee_name), 'NULL') "
+            f"|| ' не найден' WHERE error IS NULL AND employee_id IS NULL"
+        )
+        cursor.execute(
+            f"INSERT INTO {table(Task)} (task_name) SELECT DISTINCT task_name FROM {staging} "
+            f"WHERE error IS NULL ORDER BY task_name ON CONFLICT DO NOTHING"
+        )
+        cursor.execute(
+            f"UPDATE {staging} s SET task_id = k.id FROM {table(Task)} k "
+            f"WHERE s.error IS NULL AND k.task_name = s.task_name"
+        )
+
+        # блокировки сотрудников файла до конца транзакции, как в Timesheet.save
+        cursor.execute(
+            f"SELECT pg_advisory_xact_lock(%s, employee_id::integer) FROM ("
+            f"SELECT DISTINCT employee_id FROM {staging} WHERE error IS NULL ORDER BY employee_id"
+            f") e",
+            [Timesheet.OVERLAP_LOCK_NAMESPACE],
+        )
+        # точные дубликаты уже сохраненных записей пропускаются без ошибки
+        # (дубликаты более ранних строк файла — в reject_file_overlaps)
+        cursor.execute(
+            f"UPDATE {staging} s SET skip = true WHERE s.error IS NULL AND EXISTS ("
+            f"SELECT 1 FROM {table(Timesheet)} t WHERE t.employee_id = s.employee_id "
+            f"AND t.task_id = s.task_id AND t.start_time = s.starts AND t.end_time = s.ends)"
+        )
+        cursor.execute(
+            f"UPDATE {staging} s SET error = %s || o.label FROM ("
+            f"SELECT c.line_no, (SELECT e.employee_name || ': ' || k.task_name FROM {table(Timesheet)} t "
+            f"JOIN {table(Employee)} e ON e.id = t.employee_id JOIN {table(Task)} k ON k.id = t.task_id "
+            f"WHERE t.employee_id = c.employee_id AND t.start_time < c.ends AND t.end_time > c.starts "
+            f"LIMIT 1) AS label FROM {staging} c WHERE c.error IS NULL AND NOT c.skip"
+            f") o WHERE o.line_no = s.line_no AND o.label IS NOT NULL",
+            [cls.overlap_message],
+        )
+        cls.reject_file_overlaps(cursor, staging)
+        cursor.execute(
+            f"WITH inserted AS ("
+            f"INSERT INTO {table(Timesheet)} (employee_id, task_id, start_time, end_time) "
+            f"SELECT employee_id, task_id, starts, ends FROM {staging} WHERE error IS NULL AND NOT skip "
+            f"ON CONFLICT DO NOTHING RETURNING employee_id, task_id, start_time, end_time"
+            f"), rollups AS ({rollup_upsert_sql('inserted')}) "
+            f"SELECT count(*) FROM inserted",
+            rollup_upsert_params(),
+        )
+        return cursor.fetchone()[0]
+
+    @classmethod
+    def reject_file_overlaps(cls, cursor, staging):
+        """Пересечения и дубликаты между строками файла. Как и в построчном импорте, строки проверяются
+        в порядке файла и сравниваются только с уже принятыми строками того же сотрудника (IntervalIndex),
+        поэтому отклоненная строка не влечет отклонения следующих, а в ошибке указана строка, с которой
+        запись действительно пересекается. В Python читаются только строки сотрудников, у которых
+        оконная функция нашла хотя бы одну строку, начинающуюся раньше конца одной из предыдущих."""
+        cursor.execute(
+            f"SELECT line_no, employee_id, starts, ends, task_id, employee_name || ': ' || task_name "
+            f"FROM {staging} WHERE error IS NULL AND NOT skip AND employee_id IN ("
+            f"SELECT employee_id FROM ("
+            f"SELECT employee_id, starts, max(ends) OVER (PARTITION BY employee_id ORDER BY starts, line_no "
+            f"ROWS BETWEEN UNBOUNDED PRECEDING AND 1 PRECEDING) AS previous_end "
+            f"FROM {staging} WHERE error IS NULL AND NOT skip"
+            f") o WHERE o.previous_end > o.starts"
+            f") ORDER BY line_no"
+        )
+        index = IntervalIndex()
+        duplicates, overlaps, labels = [], [], []
+        for line_no, employee_id, starts, ends, task_id, label in cursor.fetchall():
+            status, overlap = index.check(employee_id, starts, ends, task_id, label)
+            if status == IntervalIndex.DUPLICATE:
+                duplicates.append(line_no)
+            elif status == IntervalIndex.OVERLAP:
+                overlaps.append(line_no)
+                labels.append(overlap[3])
+        if duplicates:
+            cursor.execute(f"UPDATE {staging} SET skip = true WHERE line_no = ANY(%s)", [duplicates])
+        if overlaps:
+            cursor.execute(
+                f"UPDATE {staging} s SET error = %s || o.label "
+                f"FROM unnest(%s::bigint[], %s::text[]) AS o(line_no, label) WHERE o.line_no = s.line_no",
+                [cls.overlap_message, overlaps, labels],
+            )
+
+    @classmethod
+    def format_error(cls, name, error):
+        return f"Error adding timesheet entry: {str(ValidationError(error))}"
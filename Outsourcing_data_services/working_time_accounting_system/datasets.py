@@ -0,0 +1,117 @@
+import csv
+import random
+from datetime import date, datetime, timedelta
+from itertools import product
+from pathlib import Path
+
+POSITION_TITLES = (
+    'Software Engineer', 'QA Engineer', 'Data Engineer', 'DevOps Engineer',
+    'Business Analyst', 'Designer', 'Product Manager', 'Engineering Manager',
+)
+# уровень должности -> доля максимальной ставки
+POSITION_LEVELS = (('Junior', 0.3), ('', 0.5), ('Senior', 0.8), ('Lead', 0.95))
+MAX_HOURLY_RATE = 100
+MAX_POSITIONS = len(POSITION_LEVELS) * len(POSITION_TITLES)
+
+TASK_PREFIXES = ('ANALYTICS', 'BILLING', 'DATA', 'SEC', 'WEB')
+
+FIRST_NAMES = (
+    'Aaliyah', 'Anna', 'Anthony', 'Cole', 'David', 'Emilia', 'Evan', 'Grace', 'Hannah', 'Isaac',
+    'Jonah', 'Julia', 'Leo', 'Lucy', 'Maria', 'Mason', 'Nathaniel', 'Nora', 'Oliver', 'Roman',
+    'Ruby', 'Samuel', 'Sophia', 'Theodore', 'Vera', 'Victor', 'William', 'Zoe',
+)
+LAST_NAMES = (
+    'Adams', 'Baker', 'Carter', 'Davis', 'Evans', 'Fisher', 'Garcia', 'Hughes', 'Ivanov', 'Jones',
+    'King', 'Lewis', 'Miller', 'Novak', 'Orlov', 'Parker', 'Quinn', 'Reed', 'Smith', 'Turner',
+)
+
+DATETIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# рабочий день: записи начинаются не раньше WORKDAY_START и заканчиваются не позже WORKDAY_END
+WORKDAY_START = 8
+WORKDAY_END = 21
+TASKS_PER_EMPLOYEE = 6
+
+
+def position_rows(count):
+    """Должности «уровень + специальность» со ставкой, растущей с уровнем."""
+    titles = [
+        (f'{level} {title}'.strip(), round(MAX_HOURLY_RATE * share * (0.8 + 0.2 * index / len(POSITION_TITLES))))
+        for (level, share), (index, title) in product(POSITION_LEVELS, enumerate(POSITION_TITLES))
+    ]
+    if count > MAX_POSITIONS:
+        raise ValueError(f'At most {MAX_POSITIONS} positions can be generated')
+    return titles[:count]
+
+
+def employee_names(count):
+    """Уникальные имена «имя фамилия»; когда сочетания заканчиваются, добавляется номер."""
+    names = [f'{first} {last}' for last, first in product(LAST_NAMES, FIRST_NAMES)]
+    for index in range(count):
+        base = names[index % len(names)]
+        yield base if index < len(names) else f'{base} {index // len(names) + 1}'
+
+
+def task_names(count, rng):
+    numbers = rng.sample(range(1, max(count * 3, 1000)), count)
+    return [f'{TASK_PREFIXES[index % len(TASK_PREFIXES)]}-{number}' for index, number in enumerate(numbers)]
+
+
+def workday_entries(day, tasks, rng):
+    """Записи сотрудника за день: от одной до четырех задач подряд с перерывами, без пересечений."""
+    current = datetime.combine(day, datetime.min.time()) + timedelta(hours=WORKDAY_START + rng.randint(0, 3))
+    end_of_day = datetime.combine(day, datetime.min.time()) + timedelta(hours=WORKDAY_END)
+    for _ in range(rng.randint(1, 4)):
+        end = current + timedelta(minutes=30 * rng.randint(1, 8))
+        if end > end_of_day:
+            return
+        yield rng.choice(tasks), current, end
+        current = end + timedelta(minutes=30 * rng.randint(0, 2))
+
+
+def generate_dataset(directory, positions=8, employees=100, tasks=500, timesheets=100_000,
+                     start=date(2021, 1, 1), seed=0):
+    """Пишет positions.csv, employees.csv и timesheet.csv в формате импорта в directory.
+    Таймшиты идут по рабочим дням, внутри дня — по сотрудникам; у каждого сотрудника свой небольшой
+    набор задач, а записи одного дня не пересекаются. Возвращает число строк в каждом файле
+    и последний день таймшитов."""
+    rng = random.Random(seed)
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+
+    position_list = position_rows(positions)
+    with open(directory / 'positions.csv', 'w', newline='', encoding='utf-8') as output:
+        csv.writer(output).writerows(position_list)
+
+    employee_list = list(employee_names(employees))
+    with open(directory / 'employees.csv', 'w', newline='', encoding='utf-8') as output:
+        csv.writer(output).writerows(
+            (name, position_list[rng.randrange(len(position_list))][0]) for name in employee_list
+        )
+
+    task_list = task_names(tasks, rng)
+    employee_tasks = {name: rng.sample(task_list, min(TASKS_PER_EMPLOYEE, len(task_list))) for name in employee_list}
+    written, day = 0, start
+    with open(directory / 'timesheet.csv', 'w', newline='', encoding='utf-8') as output:
+        writer = csv.writer(output)
+        while written < timesheets:
+            if day.weekday() < 5:
+                for name in employee_list:
+                    # около 10% рабочих дней сотрудник отсутствует
+                    if rng.random() < 0.1:
+                        continue
+                    for task, start_time, end_time in workday_entries(day, employee_tasks[name], rng):
+                        writer.writerow((task, name, start_time.strftime(DATETIME_FORMAT), end_time.strftime(DATETIME_FORMAT)))
+                        written += 1
+                        if written == timesheets:
+                            break
+                    if written == timesheets:
+                        break
+            day += timedelta(days=1)
+    return {
+        'positions': len(position_list),
+        'employees': len(employee_list),
+        'tasks': len(task_list),
+        'timesheets': written,
+        'last_day': day - timedelta(days=1),
+    }
@@ -0,0 +1,143 @@
+import csv
+import tempfile
+from itertools import islice
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import FileResponse, StreamingHttpResponse
+from django.utils import timezone
+from openpyxl import Workbook
+from .models import Timesheet
+from .reports import REPORTS
+
+# сколько строк забирать за раз из серверного курсора
+CHUNK_SIZE = 2000
+
+TIMESHEET_HEADER = ['task', 'employee', 'start_time', 'end_time']
+REPORT_HEADER = ['report', 'rank', 'name', 'value']
+
+
+class Echo:
+    """Псевдофайл для csv.writer: вместо записи возвращает строку, которую сразу отдает генератор."""
+
+    def write(self, value):
+        return value
+
+
+def timesheet_queryset(employee=None, task=None, date_from=None, date_to=None, using=None):
+    timesheets = Timesheet.objects.using(using).for_period(date_from, date_to)
+    if employee:
+        timesheets = timesheets.filter(employee_id=employee)
+    if task:
+        timesheets = timesheets.filter(task_id=task)
+    return timesheets.order_by('start_time', 'id').values_list(
+        'task__task_name', 'employee__employee_name', 'start_time', 'end_time'
+    )
+
+
+def timesheet_row(row, current_timezone, datetime_format="%Y-%m-%d %H:%M:%S"):
+    task_name, employee_name, start_time, end_time = row
+    return (
+        task_name,
+        employee_name,
+        start_time.astimezone(current_timezone).strftime(datetime_format),
+        end_time.astimezone(current_timezone).strftime(datetime_format),
+    )
+
+
+def timesheet_rows(employee=None, task=None, date_from=None, date_to=None, using=None):
+    """Строки таймшитов в формате timesheet.csv (задача, сотрудник, начало и конец в TIME_ZONE),
+    поэтому экспорт можно загрузить обратно импортом. Читаются через серверный курсор
+    (.iterator), так что в памяти одновременно находится не больше CHUNK_SIZE строк.
+    Поток читается уже после выхода из представления, поэтому база (using) задается явно."""
+    current_timezone = timezone.get_current_timezone()
+    for row in timesheet_queryset(employee, task, date_from, date_to, using).iterator(chunk_size=CHUNK_SIZE):
+        yield timesheet_row(row, current_timezone)
+
+
+async def atimesheet_rows(employee=None, task=None, date_from=None, date_to=None, using=None):
+    """timesheet_rows для ASGI: пока база отдает очередной блок строк, цикл событий обслуживает
+    другие запросы. В Django 4.2 aiterator() для values_list выполняет запрос прямо в цикле событий
+    (SynchronousOnlyOperation), поэтому блоки серверного курсора читаются через sync_to_async
+    в одном потоке — том же, где открыт курсор."""
+    current_timezone = timezone.get_current_timezone()
+    rows = timesheet_queryset(employee, task, date_from, date_to, using).iterator(chunk_size=CHUNK_SIZE)
+    next_chunk = sync_to_async(lambda: list(islice(rows, CHUNK_SIZE)))
+    while chunk := await next_chunk():
+        for row in chunk:
+            yield timesheet_row(row, current_timezone)
+
+
+def report_rows(report):
+    for name in REPORTS:
+        for row in report[name]:
+            yield name, row['rank'], row['name'], row['value']
+
+
+async def aiterate(rows):
+    """Асинхронный итератор по строкам, уже загруженным в память."""
+    for row in rows:
+        yield row
+
+
+def csv_response(filename, rows, header=None):
+    """Отдает CSV потоком: каждая строка кодируется и отправляется по мере чтения из курсора.
+    rows может быть асинхронным итератором — так ответ отдается потоком и под ASGI, где синхронный
+    итератор Django сначала целиком собирает в память."""
+    writer = csv.writer(Echo())
+
+    def stream():
+        if header:
+            yield writer.writerow(header)
+        for row in rows:
+            yield writer.writerow(row)
+
+    async def astream():
+        if header:
+            yield writer.writerow(header)
+        async for row in rows:
+            yield writer.writerow(row)
+
+    response = StreamingHttpResponse(
+        astream() if hasattr(rows, '__aiter__') else stream(), content_type='text/csv; charset=utf-8'
+    )
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+def xlsx_response(filename, rows, header=None):
+    """XLSX — это zip-архив, поэтому его нельзя отдавать раньше, чем записана последняя строка.
+    Workbook(write_only=True) сбрасывает строки на диск по мере добавления, и память не растет;
+    готовый файл отдается из временного файла через FileResponse блоками."""
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    if header:
+        sheet.append(header)
+    for row in rows:
+        sheet.append(row)
+
+    output = tempfile.TemporaryFile(suffix='.xlsx')
+    workbook.save(output)
+    output.seek(0)
+    return FileResponse(
+        output,
+        as_attachment=True,
+        filename=filename,
+        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    )
+
+
+def export_response(export_format, basename, rows, header):
+    if export_format == 'xlsx':
+        return xlsx_response(f'{basename}.xlsx', rows, header)
+    return csv_response(f'{basename}.csv', rows, header)
+
+
+async def aexport_response(request, export_format, basename, rows, header, arows=None):
+    """export_response для асинхронных представлений. XLSX собирается в потоке, чтобы не блокировать
+    цикл событий; CSV под ASGI отдается из асинхронного итератора arows (или rows, если строки уже
+    в памяти), а под WSGI — из синхронного rows."""
+    if export_format == 'xlsx':
+        return await sync_to_async(xlsx_response)(f'{basename}.xlsx', rows, header)
+    if isinstance(request, ASGIRequest):
+        return csv_response(f'{basename}.csv', arows if arows is not None else aiterate(rows), header)
+    return csv_response(f'{basename}.csv', rows, header)
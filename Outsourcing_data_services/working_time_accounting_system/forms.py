@@ -1,15 +1,194 @@
 from django import forms
-from .models import Position, Employee, Timesheet
+from django.db import connection
+from django.urls import reverse_lazy
+from .models import Timesheet
+from .pagination import KeysetPaginator, InvalidCursor
+from .resolvers import POSITIONS_BY_ID, EMPLOYEES_BY_ID, TASKS_BY_ID
+
+
+class ResolvedModelChoiceField(forms.ModelChoiceField):
+    """Выбор объекта по id: значение проверяется через кэш resolvers, а не запросом при каждой
+    отправке формы. queryset используется только для вывода списка в выпадающем меню."""
+
+    def __init__(self, resolver, **kwargs):
+        self.resolver = resolver
+        super().__init__(queryset=resolver.model.objects.all(), **kwargs)
+
+    def to_python(self, value):
+        if value in self.empty_values:
+            return None
+        if isinstance(value, self.queryset.model):
+            return value
+        try:
+            obj = self.resolver.get(int(value))
+        except (TypeError, ValueError):
+            obj = None
+        if obj is None:
+            raise forms.ValidationError(
+                self.error_messages['invalid_choice'], code='invalid_choice', params={'value': value}
+            )
+        return obj
+
+
+class AutocompleteWidget(forms.Widget):
+    """Поле поиска с подсказками с сервера (url отвечает {"results": [{"id", "name"}, ...]})
+    и скрытое поле с id выбранной подсказки. В отличие от <select> список объектов не загружается."""
+
+    template_name = 'widgets/autocomplete.html'
+
+    def __init__(self, url, resolver, attrs=None):
+        super().__init__(attrs)
+        self.url = url
+        self.resolver = resolver
+
+    def get_context(self, name, value, attrs):
+        context = super().get_context(name, value, attrs)
+        context['widget']['url'] = str(self.url)
+        obj = None
+        if value not in (None, ''):
+            try:
+                obj = self.resolver.get(int(value))
+            except (TypeError, ValueError):
+                pass
+        context['widget']['label'] = str(obj) if obj else ''
+        return context
 
 
 class EmployeeTimesheetsForm(forms.Form):
-    employee = forms.ModelChoiceField(queryset=Employee.objects.all())
+    """Сотрудник выбирается автодополнением (employees/autocomplete/), проверяется только переданный id."""
+
+    employee = ResolvedModelChoiceField(
+        EMPLOYEES_BY_ID, widget=AutocompleteWidget(reverse_lazy('employee_autocomplete'), EMPLOYEES_BY_ID)
+    )
 
 
 class DeleteTimesheetForm(forms.Form):
     timesheet_id = forms.IntegerField()
 
 
+class BulkDeleteTimesheetsForm(forms.Form):
+    """Массовое удаление: условия объединяются через И, нужно задать хотя бы одно."""
+
+    timesheet_ids = forms.CharField(required=False, label='Timesheet IDs', help_text='Comma-separated')
+    employee = ResolvedModelChoiceField(EMPLOYEES_BY_ID, required=False, widget=forms.NumberInput)
+    task = ResolvedModelChoiceField(TASKS_BY_ID, required=False, widget=forms.NumberInput)
+    date_from = forms.DateField(required=False, widget=forms.DateInput(attrs={'type': 'date'}))
+    date_to = forms.DateField(required=False, widget=forms.DateInput(attrs={'type': 'date'}))
+
+    def clean_timesheet_ids(self):
+        value = self.cleaned_data['timesheet_ids']
+        try:
+            return [int(item) for item in value.replace(' ', '').split(',') if item]
+        except ValueError:
+            raise forms.ValidationError("Timesheet IDs must be comma-separated integers")
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if not any(cleaned_data.get(field) for field in self.fields):
+            raise forms.ValidationError("Specify at least one condition")
+        date_from, date_to = cleaned_data.get('date_from'), cleaned_data.get('date_to')
+        if date_from and date_to and date_from > date_to:
+            raise forms.ValidationError("'date_from' must not be later than 'date_to'")
+        return cleaned_data
+
+    def timesheets(self):
+        data = self.cleaned_data
+        timesheets = Timesheet.objects.for_period(data['date_from'], data['date_to'])
+        if data['timesheet_ids']:
+            timesheets = timesheets.filter(pk__in=data['timesheet_ids'])
+        if data['employee']:
+            timesheets = timesheets.filter(employee=data['employee'])
+        if data['task']:
+            timesheets = timesheets.filter(task=data['task'])
+        return timesheets
+
+
+class TimesheetFilterForm(forms.Form):
+    """Фильтры и курсор списка таймшитов сотрудника. Период задается днями (включительно)."""
+
+    DEFAULT_PAGE_SIZE = 50
+    MAX_PAGE_SIZE = 500
+
+    date_from = forms.DateField(required=False, widget=forms.DateInput(attrs={'type': 'date'}))
+    date_to = forms.DateField(required=False, widget=forms.DateInput(attrs={'type': 'date'}))
+    page_size = forms.IntegerField(min_value=1, max_value=MAX_PAGE_SIZE, required=False, initial=DEFAULT_PAGE_SIZE)
+    after = forms.CharField(required=False, widget=forms.HiddenInput)
+    before = forms.CharField(required=False, widget=forms.HiddenInput)
+
+    def clean_cursor(self, name):
+        cursor = self.cleaned_data[name]
+        if cursor:
+            try:
+                KeysetPaginator.decode_cursor(cursor)
+            except InvalidCursor as e:
+                raise forms.ValidationError(str(e))
+        return cursor
+
+    def clean_after(self):
+        return self.clean_cursor('after')
+
+    def clean_before(self):
+        return self.clean_cursor('before')
+
+    def clean(self):
+        cleaned_data = super().clean()
+        date_from, date_to = cleaned_data.get('date_from'), cleaned_data.get('date_to')
+        if date_from and date_to and date_from > date_to:
+            raise forms.ValidationError("'date_from' must not be later than 'date_to'")
+        return cleaned_data
+
+
+class ExportFormatForm(forms.Form):
+    format = forms.ChoiceField(choices=[('csv', 'CSV'), ('xlsx', 'XLSX')], required=False)
+
+
+class TimesheetExportForm(ExportFormatForm):
+    date_from = forms.DateField(required=False)
+    date_to = forms.DateField(required=False)
+    employee = ResolvedModelChoiceField(EMPLOYEES_BY_ID, required=False, widget=forms.NumberInput)
+    task = ResolvedModelChoiceField(TASKS_BY_ID, required=False, widget=forms.NumberInput)
+
+    def clean(self):
+        cleaned_data = super().clean()
+        date_from, date_to = cleaned_data.get('date_from'), cleaned_data.get('date_to')
+        if date_from and date_to and date_from > date_to:
+            raise forms.ValidationError("'date_from' must not be later than 'date_to'")
+        return cleaned_data
+
+
+class ReportFilterForm(forms.Form):
+    """Параметры отчета. Сотрудник и задача задаются по id: поле проверяет только переданное значение
+    (через кэш resolvers) и не загружает весь список в выпадающее меню."""
+
+    date_from = forms.DateField(required=False, widget=forms.DateInput(attrs={'type': 'date'}))
+    date_to = forms.DateField(required=False, widget=forms.DateInput(attrs={'type': 'date'}))
+    employee = ResolvedModelChoiceField(EMPLOYEES_BY_ID, required=False, widget=forms.NumberInput)
+    task = ResolvedModelChoiceField(TASKS_BY_ID, required=False, widget=forms.NumberInput)
+    position = ResolvedModelChoiceField(POSITIONS_BY_ID, required=False)
+    top_n = forms.IntegerField(min_value=1, max_value=100, required=False, initial=5)
+
+    def clean(self):
+        cleaned_data = super().clean()
+        date_from, date_to = cleaned_data.get('date_from'), cleaned_data.get('date_to')
+        if date_from and date_to and date_from > date_to:
+            raise forms.ValidationError("'date_from' must not be later than 'date_to'")
+        return cleaned_data
+
+    def report_params(self):
+        """Параметры для reports.build_report; для невалидной формы — отчет за все время."""
+        if not self.is_valid():
+            return {'top_n': 5}
+        data = self.cleaned_data
+        return {
+            'date_from': data['date_from'] and data['date_from'].isoformat(),
+            'date_to': data['date_to'] and data['date_to'].isoformat(),
+            'employee': data['employee'] and data['employee'].pk,
+            'task': data['task'] and data['task'].pk,
+            'position': data['position'] and data['position'].pk,
+            'top_n': data['top_n'] or 5,
+        }
+
+
 def validate_filename(filename, expected):
     if not filename.name.lower() == expected:
         raise forms.ValidationError(f"Incorrect file name: '{filename}'. Expected: '{expected}'")
@@ -40,6 +219,23 @@ class ImportForm(forms.ModelForm):
         })
     )
 
+    fast_import = forms.BooleanField(
+        required=False,
+        label='Fast import (PostgreSQL COPY)',
+    )
+
+    incremental = forms.BooleanField(
+        required=False,
+        initial=True,
+        label='Skip files and rows imported earlier',
+    )
+
     class Meta:
         model = Timesheet
-        fields = ["positions_file", "employees_file", "timesheets_file"]
+        fields = ["positions_file", "employees_file", "timesheets_file", "fast_import", "incremental"]
+
+    def clean_fast_import(self):
+        fast_import = self.cleaned_data['fast_import']
+        if fast_import and connection.vendor != 'postgresql':
+            raise forms.ValidationError("Fast import is only available on PostgreSQL")
+        return fast_import
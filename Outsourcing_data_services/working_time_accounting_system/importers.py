@@ -1,103 +1,525 @@
+import codecs
 import csv
+import multiprocessing
+import os
+import tempfile
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import ExitStack, contextmanager
 from datetime import datetime
-from django.db import transaction
-from .models import Position, Employee, Task, Timesheet
+from itertools import islice
+import django
+from django.db import connection, transaction
+from django.db.transaction import TransactionManagementError
+from django.utils import timezone
+from .intervals import IntervalIndex
+from .manifests import open_manifest, complete_manifest, row_fingerprint, known_fingerprints, record_fingerprints
+from .metrics import IMPORT_PHASE_SECONDS, IMPORT_ROWS, IMPORT_ROWS_PER_SECOND, timed
+from .models import Position, Employee, Task, Timesheet, ImportManifest
+from .report_cache import invalidate_reports
+from .resolvers import POSITIONS, EMPLOYEES, TASKS
+from .rollups import apply_to_rollups
 from django.core.exceptions import ValidationError
-from django.db import IntegrityError
 
 
-class PositionImporter:
-    @staticmethod
-    def import_from_csv(uploaded_file):
-        csvfile = uploaded_file.read().decode('utf-8').splitlines()
-        reader = csv.reader(csvfile)
-        errors = []
-        with transaction.atomic():
-            position_count = 0
-            for row in reader:
-                position_name, hourly_rate = row
-                hourly_rate = int(hourly_rate)
-                try:
-                    position, created = Position.objects.get_or_create(
-                        position_name=position_name,
-                        hourly_rate=hourly_rate,
-                    )
-                    if not created:
-                        print(
-                            f"Skipping position '{position_name}', as it already exists in the database.")
-                    if created:
-                        position_count += 1
-                except (IntegrityError, ValidationError) as e:
-                    errors.append(f"Error adding position '{position_name}': {str(e)}")
-
-        return errors, position_count
-
-
-class EmployeeImporter:
-    @staticmethod
-    def import_from_csv(uploaded_file):
-        csvfile = uploaded_file.read().decode('utf-8').splitlines()
-        reader = csv.reader(csvfile)
-        errors = []
+def iter_csv_rows(uploaded_file, encoding='utf-8'):
+    """Читает загруженный файл по чанкам и отдает строки CSV генератором.
+    Байты декодируются инкрементально, поэтому в памяти находится только текущий чанк,
+    а не весь файл целиком."""
+    return (row for row in csv.reader(_iter_lines(uploaded_file, encoding)) if row)
+
+
+def _iter_lines(uploaded_file, encoding):
+    decoder = codecs.getincrementaldecoder(encoding)()
+    tail = ''
+    for chunk in uploaded_file.chunks():
+        *lines, tail = (tail + decoder.decode(chunk)).split('\n')
+        for line in lines:
+            yield line + '\n'
+    tail += decoder.decode(b'', final=True)
+    if tail:
+        yield tail
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+class CsvImporter:
+    """Общая часть импортеров: файл читается потоком и обрабатывается пакетами по batch_size строк.
+    Ошибки и число созданных записей накапливаются в errors и count, поэтому фоновые задачи
+    могут вызывать import_batch сами и фиксировать каждый пакет в отдельной транзакции.
+    import_batch возвращает результат по каждой строке пакета (см. result) — его отдает JSON API.
+    Время этапов пакета (parse, resolve, validate, write) и число строк по результату
+    записываются в метрики (см. metrics) с меткой importer=name.
+
+    С манифестом (manifest, см. manifests) для каждой строки считается отпечаток: строки, отпечатки
+    которых уже есть в базе, пропускаются без обработки (если incremental), а отпечатки созданных
+    и пропущенных как дубликаты строк сохраняются. Повторная загрузка того же файла с дописанными
+    строками обрабатывает только новые строки и строки, записи которых с тех пор удалены (missing_rows)."""
+
+    CREATED = 'created'
+    SKIPPED = 'skipped'
+    ERROR = 'error'
+
+    name = None
+    batch_size = 1000
+
+    def __init__(self, batch_size=None, manifest=None, incremental=True):
+        self.batch_size = batch_size or self.batch_size
+        self.manifest = manifest
+        self.incremental = incremental
+        self.errors = []
+        self.count = 0
+
+    @classmethod
+    def import_from_csv(cls, uploaded_file, batch_size=None, incremental=True):
+        """Файл, уже импортированный полностью, при incremental не обрабатывается."""
+        importer = cls(batch_size, incremental=incremental)
         with transaction.atomic():
-            employee_count = 0
-            for row in reader:
-                employee_name, position_name = row
-                position = Position.objects.get(position_name=position_name)
+            importer.manifest, unchanged = open_manifest(cls.name, uploaded_file)
+            if unchanged and incremental:
+                return [], 0
+            for rows in batched(iter_csv_rows(uploaded_file), importer.batch_size):
+                importer.import_batch(rows)
+            complete_manifest(importer.manifest)
+        return importer.errors, importer.count
+
+    def import_batch(self, rows):
+        started = time.perf_counter()
+        if self.manifest is None:
+            results = self.process_batch(rows)
+        else:
+            results = self.process_new_rows(rows)
+        elapsed = time.perf_counter() - started
+        # строки отклоняются на разных этапах (разбор, поиск связей, пересечения),
+        # а ошибки записываются в порядке строк файла
+        for result in results:
+            if result['status'] == self.ERROR:
+                self.add_error(result['error'])
+        for status in (self.CREATED, self.SKIPPED, self.ERROR):
+            IMPORT_ROWS.inc(sum(result['status'] == status for result in results), importer=self.name, status=status)
+        if rows and elapsed:
+            IMPORT_ROWS_PER_SECOND.set(round(len(rows) / elapsed, 1), importer=self.name)
+        return results
+
+    def process_batch(self, rows):
+        raise NotImplementedError
+
+    def missing_rows(self, rows):
+        """Номера строк, импортированных ранее, записей которых больше нет в базе (удалены после импорта).
+        Такие строки обрабатываются заново, а не пропускаются по отпечатку."""
+        raise NotImplementedError
+
+    def process_new_rows(self, rows):
+        """Обрабатывает строки, отпечатков которых нет в базе или записей которых больше нет,
+        и сохраняет отпечатки строк без ошибок. Наличие записей (missing_rows) проверяется только
+        для отпечатков файлов, открытых заново после удаления (ImportManifest.reopened_at);
+        остальные известные строки пропускаются без запросов к данным."""
+        with self.phase('fingerprint'):
+            fingerprints = [row_fingerprint(self.name, row) for row in rows]
+            known = known_fingerprints(fingerprints) if self.incremental else {}
+            unverified = [index for index, fingerprint in enumerate(fingerprints) if known.get(fingerprint)]
+            missing = set()
+            if unverified:
+                missing = {unverified[index] for index in self.missing_rows([rows[index] for index in unverified])}
+        new = [index for index, fingerprint in enumerate(fingerprints) if fingerprint not in known or index in missing]
+        results = [self.result(self.SKIPPED)] * len(rows)
+        for index, result in zip(new, self.process_batch([rows[index] for index in new])):
+            results[index] = result
+        with self.phase('fingerprint'):
+            # отпечатки проверенных строк переходят к текущему файлу и снова считаются надежными
+            record_fingerprints(
+                self.manifest,
+                {fingerprints[index] for index in new if results[index]['status'] != self.ERROR}
+                | {fingerprints[index] for index in unverified if index not in missing},
+                self.batch_size,
+            )
+        return results
+
+    @contextmanager
+    def phase(self, phase):
+        with timed(IMPORT_PHASE_SECONDS, importer=self.name, phase=phase):
+            yield
+
+    @classmethod
+    def result(cls, status, obj=None, error=None):
+        result = {'status': status}
+        if obj is not None:
+            result['id'] = obj.pk
+        if error is not None:
+            result['error'] = error
+        return result
+
+    def reject(self, results, index, message):
+        results[index] = self.result(self.ERROR, error=message)
+
+    def add_error(self, message):
+        self.errors.append(self.format_error(message))
+
+    def format_error(self, message):
+        return message
+
+
+class PositionImporter(CsvImporter):
+    """Существующие должности берутся из кэша resolvers.POSITIONS (промахи — одним запросом на пакет),
+    новые создаются через bulk_create.
+    Должность с тем же названием и ставкой пропускается, с другой ставкой — считается ошибкой."""
+
+    name = 'positions'
+
+    def process_batch(self, rows):
+        results = [None] * len(rows)
+        positions = {}
+        with self.phase('parse'):
+            for index, row in enumerate(rows):
                 try:
-                    employee, created = Employee.objects.get_or_create(
-                        employee_name=employee_name,
-                        position=position,
-                    )
-                    if not created:
-                        print(
-                            f"Skipping employee '{employee_name}', as it already exists in the database.")
-                    if created:
-                        employee_count += 1
-                except (IntegrityError, ValidationError) as e:
-                    errors.append(f"Error adding employee '{employee_name}': {str(e)}")
-
-        return errors, employee_count
-
-
-class TimesheetImporter:
-    @staticmethod
-    def import_from_csv(uploaded_file):
-        csvfile = uploaded_file.read().decode('utf-8').splitlines()
-        rows = list(csv.reader(csvfile))
-        datetime_format = "%Y-%m-%d %H:%M:%S"
-        errors = []
-        with transaction.atomic():
-            for row in rows:
-                task_name, _, _, _ = row
+                    position_name, hourly_rate = row
+                    position = Position(position_name=position_name, hourly_rate=int(hourly_rate))
+                    position.clean_fields()
+                except (ValueError, ValidationError) as e:
+                    self.reject(results, index, f"Error adding position '{row[0] if row else ''}': {str(e)}")
+                    continue
+                positions.setdefault(position_name, []).append((index, position))
+
+        with self.phase('resolve'):
+            existing = POSITIONS.resolve(positions.keys())
+
+        new_positions = []
+        with self.phase('validate'):
+            for position_name, entries in positions.items():
+                for index, position in entries:
+                    current = existing.get(position_name)
+                    if current is None:
+                        existing[position_name] = current = position
+                        new_positions.append((index, position))
+                        continue
+                    if current.hourly_rate != position.hourly_rate:
+                        self.reject(results, index, (
+                            f"Error adding position '{position_name}': "
+                            f"position already exists with hourly rate {current.hourly_rate}"
+                        ))
+                        continue
+                    results[index] = self.result(self.SKIPPED, current)
+
+        with self.phase('write'):
+            Position.objects.bulk_create([position for _, position in new_positions], batch_size=self.batch_size)
+            POSITIONS.prime([position for _, position in new_positions])
+        for index, position in new_positions:
+            results[index] = self.result(self.CREATED, position)
+        self.count += len(new_positions)
+        return results
+
+    def missing_rows(self, rows):
+        existing = POSITIONS.resolve({row[0] for row in rows})
+        return {index for index, row in enumerate(rows) if row[0] not in existing}
+
+
+class EmployeeImporter(CsvImporter):
+    """Должности и существующие сотрудники берутся из кэшей resolvers (промахи — одним запросом
+    на пакет), новые сотрудники создаются через bulk_create."""
+
+    name = 'employees'
+
+    def process_batch(self, rows):
+        results = [None] * len(rows)
+        entries = []
+        with self.phase('parse'):
+            for index, row in enumerate(rows):
                 try:
-                    task, created = Task.objects.get_or_create(task_name=task_name)
-                    if not created:
-                        print(
-                            f"Skipping task '{task_name}', as it already exists in the database.")
-                except (IntegrityError, ValidationError) as e:
-                    errors.append(f"Error adding task '{task_name}': {str(e)}")
+                    employee_name, position_name = row
+                    Employee(employee_name=employee_name).clean_fields(exclude=['position'])
+                except (ValueError, ValidationError) as e:
+                    self.reject(results, index, f"Error adding employee '{row[0] if row else ''}': {str(e)}")
+                    continue
+                entries.append((index, employee_name, position_name))
 
-        with transaction.atomic():
-            timesheet_count = 0
-            for row in rows:
+        with self.phase('resolve'):
+            positions = POSITIONS.resolve({position_name for _, _, position_name in entries})
+            existing = EMPLOYEES.resolve({employee_name for _, employee_name, _ in entries})
+
+        new_employees = []
+        with self.phase('validate'):
+            for index, employee_name, position_name in entries:
+                position = positions.get(position_name)
+                if position is None:
+                    self.reject(results, index, f"Error adding employee '{employee_name}': position '{position_name}' does not exist")
+                    continue
+                current = existing.get(employee_name)
+                if current is None:
+                    existing[employee_name] = current = Employee(employee_name=employee_name, position=position)
+                    new_employees.append((index, current))
+                    continue
+                if current.position_id != position.pk:
+                    self.reject(results, index, f"Error adding employee '{employee_name}': employee already exists with another position")
+                    continue
+                results[index] = self.result(self.SKIPPED, current)
+
+        with self.phase('write'):
+            Employee.objects.bulk_create([employee for _, employee in new_employees], batch_size=self.batch_size)
+            EMPLOYEES.prime([employee for _, employee in new_employees])
+        for index, employee in new_employees:
+            results[index] = self.result(self.CREATED, employee)
+        self.count += len(new_employees)
+        return results
+
+    def missing_rows(self, rows):
+        existing = EMPLOYEES.resolve({row[0] for row in rows})
+        return {index for index, row in enumerate(rows) if row[0] not in existing}
+
+
+class TimesheetImporter(CsvImporter):
+    """Пакетный импорт таймшитов. Имена задач и сотрудников разрешаются через кэши resolvers
+    (промахи — одним запросом на пакет) и запоминаются на время импорта в tasks и employees,
+    пересечения проверяются в памяти, а новые записи сохраняются через bulk_create."""
+
+    name = 'timesheets'
+    datetime_format = "%Y-%m-%d %H:%M:%S"
+
+    def __init__(self, batch_size=None, manifest=None, incremental=True):
+        super().__init__(batch_size, manifest, incremental)
+        self.tasks = {}
+        self.employees = {}
+
+    @classmethod
+    def import_from_csv(cls, uploaded_file, batch_size=None, incremental=True, workers=1):
+        """При workers > 1 файл загружается параллельно (см. import_parallel) и не в одной транзакции."""
+        if workers == 1:
+            return super().import_from_csv(uploaded_file, batch_size, incremental)
+        manifest, unchanged = open_manifest(cls.name, uploaded_file)
+        if unchanged and incremental:
+            return [], 0
+        errors, count, _ = cls.import_parallel(iter_csv_rows(uploaded_file), workers, batch_size, manifest, incremental)
+        complete_manifest(manifest)
+        return errors, count
+
+    def process_batch(self, rows):
+        results = [None] * len(rows)
+        with self.phase('parse'):
+            entries = self.parse_rows(rows, results)
+
+        timesheets = []
+        with self.phase('resolve'):
+            self.resolve_tasks({task_name for _, task_name, _, _, _ in entries})
+            self.resolve_employees({employee_name for _, _, employee_name, _, _ in entries})
+            for index, task_name, employee_name, start_time, end_time in entries:
+                employee = self.employees.get(employee_name)
+                if employee is None:
+                    self.reject(results, index, f"Сотрудник '{employee_name}' не найден")
+                    continue
+                timesheets.append((index, Timesheet(
+                    employee=employee,
+                    task=self.tasks[task_name],
+                    start_time=start_time,
+                    end_time=end_time,
+                )))
+
+        with self.phase('validate'):
+            timesheets = self.validate_overlaps(timesheets, results)
+
+        with self.phase('write'):
+            Timesheet.objects.bulk_create([timesheet for _, timesheet in timesheets], batch_size=self.batch_size)
+            if timesheets:
+                apply_to_rollups(Timesheet.objects.filter(pk__in=[timesheet.pk for _, timesheet in timesheets]))
+                invalidate_reports()
+        for index, timesheet in timesheets:
+            results[index] = self.result(self.CREATED, timesheet)
+        self.count += len(timesheets)
+        return results
+
+    def missing_rows(self, rows):
+        """Таймшит строки ищется по сотруднику, задаче и интервалу одним запросом на пакет;
+        имена разрешаются через кэши resolvers, отсутствующие задачи при этом не создаются.
+        Строки с отпечатком уже прошли parse_row, поэтому время разбирается fromisoformat — он понимает
+        тот же формат и на порядок быстрее strptime и make_aware; неразобранная строка обрабатывается заново."""
+        tz = timezone.get_current_timezone()
+        entries = []
+        for index, row in enumerate(rows):
+            try:
                 task_name, employee_name, start_time, end_time = row
-                task = Task.objects.get(task_name=task_name)
-                employee = Employee.objects.get(employee_name=employee_name)
-                start_time = datetime.strptime(start_time, datetime_format)
-                end_time = datetime.strptime(end_time, datetime_format)
-                try:
-                    timesheet, created = Timesheet.objects.get_or_create(
-                        employee=employee,
-                        task=task,
-                        start_time=start_time,
-                        end_time=end_time,
-                    )
-                    if not created:
-                        print(f"Skipping timesheet '{employee}: {task}', as it already exists in the database.")
-                    if created:
-                        timesheet_count += 1
-                except (IntegrityError, ValidationError) as e:
-                    errors.append(f"Error adding timesheet entry: {str(e)}")
-
-        return errors, timesheet_count
+                start_time = datetime.fromisoformat(start_time).replace(tzinfo=tz)
+                end_time = datetime.fromisoformat(end_time).replace(tzinfo=tz)
+            except ValueError:
+                continue
+            entries.append((index, task_name, employee_name, start_time, end_time))
+        tasks = TASKS.resolve({task_name for _, task_name, _, _, _ in entries})
+        employees = EMPLOYEES.resolve({employee_name for _, _, employee_name, _, _ in entries})
+        keys = {
+            index: (employees[employee_name].pk, tasks[task_name].pk, start_time, end_time)
+            for index, task_name, employee_name, start_time, end_time in entries
+            if task_name in tasks and employee_name in employees
+        }
+        existing = set(Timesheet.objects.filter(
+            employee_id__in={key[0] for key in keys.values()},
+            start_time__in={key[2] for key in keys.values()},
+        ).values_list('employee_id', 'task_id', 'start_time', 'end_time')) if keys else set()
+        return {index for index in range(len(rows)) if keys.get(index) not in existing}
+
+    def parse_rows(self, rows, results):
+        entries = []
+        for index, row in enumerate(rows):
+            try:
+                entries.append((index, *self.parse_row(row)))
+            except ValueError as e:
+                self.reject(results, index, str(e))
+        return entries
+
+    def parse_row(self, row):
+        """(задача, сотрудник, начало, конец) строки файла; для некорректной строки — ValueError с текстом ошибки."""
+        try:
+            task_name, employee_name, start_time, end_time = row
+            start_time = timezone.make_aware(datetime.strptime(start_time, self.datetime_format))
+            end_time = timezone.make_aware(datetime.strptime(end_time, self.datetime_format))
+        except ValueError as e:
+            raise ValueError(f"Некорректная строка {row}: {e}")
+        if start_time >= end_time:
+            raise ValueError('Время окончания работы должно быть позже времени начала')
+        return task_name, employee_name, start_time, end_time
+
+    def resolve_tasks(self, task_names):
+        missing = task_names - self.tasks.keys()
+        if not missing:
+            return
+        self.tasks.update(TASKS.resolve(missing))
+        new_tasks = [Task(task_name=task_name) for task_name in sorted(missing - self.tasks.keys())]
+        for task in Task.objects.bulk_create(new_tasks, batch_size=self.batch_size):
+            self.tasks[task.task_name] = task
+        TASKS.prime(new_tasks)
+
+    def resolve_employees(self, employee_names):
+        missing = employee_names - self.employees.keys()
+        if not missing:
+            return
+        self.employees.update(EMPLOYEES.resolve(missing))
+
+    def validate_overlaps(self, timesheets, results):
+        """Загружает существующие интервалы затронутых сотрудников одним запросом и отбрасывает
+        дубликаты и пересечения, в том числе между строками одного файла.
+        timesheets — пары (номер строки пакета, Timesheet)."""
+        if not timesheets:
+            return []
+
+        # до конца транзакции пакета параллельные записи этих сотрудников ждут (см. Timesheet.save)
+        Timesheet.lock_employees({timesheet.employee_id for _, timesheet in timesheets})
+        index = IntervalIndex.load(
+            {timesheet.employee_id for _, timesheet in timesheets},
+            start_time=min(timesheet.start_time for _, timesheet in timesheets),
+            end_time=max(timesheet.end_time for _, timesheet in timesheets),
+        )
+        accepted = []
+        for row_index, timesheet in timesheets:
+            status, overlap = index.check(
+                timesheet.employee_id, timesheet.start_time, timesheet.end_time, timesheet.task_id, str(timesheet)
+            )
+            if status == IntervalIndex.DUPLICATE:
+                results[row_index] = self.result(self.SKIPPED)
+            elif status == IntervalIndex.OVERLAP:
+                self.reject(results, row_index, (
+                    f"Сотрудник не может работать над двумя задачами одновременно. "
+                    f"Найден пересекающийся таймшит: {overlap[3]}"
+                ))
+            else:
+                accepted.append((row_index, timesheet))
+        return accepted
+
+    def format_error(self, message):
+        return f"Error adding timesheet entry: {str(ValidationError(message))}"
+
+    @classmethod
+    def import_parallel(cls, rows, workers, batch_size=None, manifest=None, incremental=True,
+                        skip_shards=(), on_shard=None):
+        """Параллельный импорт: строки делятся на части по сотруднику (crc32 имени по модулю workers),
+        и части загружаются в пуле процессов, каждая в своем соединении и своей транзакции.
+        Пересечения проверяются только между записями одного сотрудника, а все его строки попадают
+        в одну часть в исходном порядке, поэтому результат не зависит от числа процессов.
+        Задачи создаются заранее в этом процессе, как и в построчном импорте — только для строк,
+        которые разбираются без ошибок. Части создавали бы их в своих транзакциях, и вставка одного
+        названия в разных частях ждала бы (ограничение unique_task_name) конца транзакции другой части.
+        Ошибки упорядочиваются по номеру строки.
+
+        Вызывается вне транзакции: части фиксируются независимо, и при сбое одной из них остальные
+        остаются в базе. После каждой зафиксированной части вызывается on_shard(номер части, ошибки,
+        число созданных записей, число строк) — по нему фоновая задача сохраняет прогресс, а при
+        повторном запуске передает номера готовых частей в skip_shards, и они не загружаются снова.
+        Манифест и incremental передаются импортерам частей (см. CsvImporter).
+        Возвращает (errors, count, число прочитанных строк)."""
+        if connection.in_atomic_block:
+            raise TransactionManagementError('Parallel import must run outside a transaction')
+        importer = cls(batch_size)
+        shards = [shard for shard in range(workers) if shard not in skip_shards]
+        with tempfile.TemporaryDirectory() as directory:
+            paths = {shard: os.path.join(directory, f'shard_{shard}.csv') for shard in shards}
+            task_names, total = set(), 0
+            with ExitStack() as stack:
+                writers = {shard: csv.writer(stack.enter_context(open(path, 'w', newline='', encoding='utf-8')))
+                           for shard, path in paths.items()}
+                for line_number, row in enumerate(rows):
+                    total += 1
+                    shard = zlib.crc32(row[1].encode()) % workers if len(row) > 1 else 0
+                    if shard not in writers:
+                        continue
+                    writers[shard].writerow([line_number, *row])
+                    try:
+                        task_names.add(importer.parse_row(row)[0])
+                    except ValueError:
+                        pass
+
+            with transaction.atomic():
+                for names in batched(sorted(task_names), importer.batch_size):
+                    importer.resolve_tasks(set(names))
+
+            # spawn, а не fork: дочерний процесс не должен наследовать сокет соединения этого процесса
+            # (на нем, например, держится advisory-блокировка задачи импорта) и открывает свое
+            errors, count, failures = [], 0, []
+            with ProcessPoolExecutor(workers, multiprocessing.get_context('spawn'), initializer=django.setup) as pool:
+                futures = {pool.submit(
+                    import_timesheet_shard, path, importer.batch_size, manifest and manifest.pk, incremental,
+                    connection.settings_dict['NAME'],
+                ): shard for shard, path in paths.items()}
+                for future in as_completed(futures):
+                    try:
+                        shard_errors, shard_count, shard_rows = future.result()
+                    except Exception as e:
+                        # остальные части дорабатывают, и их прогресс тоже сохраняется
+                        failures.append(e)
+                        continue
+                    shard_errors.sort()
+                    if on_shard is not None:
+                        on_shard(futures[future], [message for _, message in shard_errors], shard_count, shard_rows)
+                    errors.extend(shard_errors)
+                    count += shard_count
+
+        # кэш отчетов у каждого процесса свой, поэтому версия данных сдвигается здесь
+        invalidate_reports()
+        if failures:
+            raise failures[0]
+        return [message for _, message in sorted(errors)], count, total
+
+
+def import_timesheet_shard(path, batch_size, manifest_id=None, incremental=True, database_name=None):
+    """Загружает часть строк таймшитов (первая колонка — номер строки в исходном файле)
+    в одной транзакции. Выполняется в процессе пула TimesheetImporter.import_parallel.
+    database_name — база вызывающего процесса: под тестовым раннером это тестовая база,
+    а не указанная в настройках. Соединение закрывается в конце, поэтому следующая часть
+    в том же процессе подключается заново.
+    Возвращает ([(номер строки, ошибка), ...], число созданных записей, число строк)."""
+    if database_name is not None:
+        connection.settings_dict['NAME'] = database_name
+    manifest = ImportManifest.objects.get(pk=manifest_id) if manifest_id else None
+    importer = TimesheetImporter(batch_size, manifest, incremental)
+    errors, rows = [], 0
+    try:
+        with open(path, newline='', encoding='utf-8') as source, transaction.atomic():
+            for batch in batched(csv.reader(source), importer.batch_size):
+                results = importer.import_batch([row[1:] for row in batch])
+                errors.extend(
+                    (int(row[0]), importer.format_error(result['error']))
+                    for row, result in zip(batch, results) if result['status'] == importer.ERROR
+                )
+                rows += len(batch)
+    finally:
+        connection.close()
+    return errors, importer.count, rows
@@ -0,0 +1,73 @@
+from bisect import bisect_left
+from collections import defaultdict
+from .models import Timesheet
+
+
+class IntervalIndex:
+    """Индекс интервалов работы сотрудников в памяти. Интервалы каждого сотрудника хранятся
+    отсортированными по началу и не пересекаются, поэтому для новой записи достаточно бинарным поиском
+    найти ближайший интервал, начинающийся раньше ее окончания, и сравнить его конец с началом записи.
+    Проверка пакета из n строк занимает O(n log n) и учитывает пересечения между строками самого пакета."""
+
+    OK = 'ok'
+    DUPLICATE = 'duplicate'
+    OVERLAP = 'overlap'
+
+    def __init__(self):
+        # employee_id -> [(start_time, end_time, task_id, label), ...]
+        self.intervals = defaultdict(list)
+
+    @classmethod
+    def load(cls, employee_ids, start_time=None, end_time=None):
+        """Загружает одним запросом существующие интервалы сотрудников, попадающие в окно [start_time, end_time)."""
+        index = cls()
+        timesheets = Timesheet.objects.filter(employee_id__in=employee_ids)
+        if start_time is not None:
+            timesheets = timesheets.filter(end_time__gt=start_time)
+        if end_time is not None:
+            timesheets = timesheets.filter(start_time__lt=end_time)
+        rows = timesheets.order_by('employee_id', 'start_time').values_list(
+            'employee_id', 'start_time', 'end_time', 'task_id', 'employee__employee_name', 'task__task_name'
+        )
+        for employee_id, start, end, task_id, employee_name, task_name in rows:
+            index.intervals[employee_id].append((start, end, task_id, f"{employee_name}: {task_name}"))
+        return index
+
+    def find_overlap(self, employee_id, start_time, end_time):
+        employee_intervals = self.intervals.get(employee_id, ())
+        position = bisect_left(employee_intervals, end_time, key=lambda interval: interval[0])
+        if position and employee_intervals[position - 1][1] > start_time:
+            return employee_intervals[position - 1]
+        return None
+
+    def add(self, employee_id, start_time, end_time, task_id, label):
+        employee_intervals = self.intervals[employee_id]
+        position = bisect_left(employee_intervals, start_time, key=lambda interval: interval[0])
+        employee_intervals.insert(position, (start_time, end_time, task_id, label))
+
+    def check(self, employee_id, start_time, end_time, task_id, label):
+        """Проверяет запись и, если она не конфликтует, добавляет ее в индекс.
+        Возвращает статус (OK, DUPLICATE или OVERLAP) и найденный интервал."""
+        overlap = self.find_overlap(employee_id, start_time, end_time)
+        if overlap is None:
+            self.add(employee_id, start_time, end_time, task_id, label)
+            return self.OK, None
+        if overlap[:3] == (start_time, end_time, task_id):
+            return self.DUPLICATE, overlap
+        return self.OVERLAP, overlap
+
+    @staticmethod
+    def sweep(rows):
+        """Находит пересечения в потоке интервалов, отсортированном по (employee_id, start_time).
+        rows: кортежи (employee_id, start_time, end_time, ...); отдает пары (раньше начавшийся, текущий).
+        Хранится только интервал с наибольшим концом для текущего сотрудника, поэтому память O(1)."""
+        current_employee, latest = None, None
+        for row in rows:
+            employee_id, start_time, end_time = row[:3]
+            if employee_id != current_employee:
+                current_employee, latest = employee_id, row
+                continue
+            if latest[2] > start_time:
+                yield latest, row
+            if end_time > latest[2]:
+                latest = row
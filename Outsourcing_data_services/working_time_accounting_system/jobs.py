@@ -0,0 +1,157 @@
+from django.conf import settings
+from django.db import transaction, connection
+from django.utils import timezone
+from itertools import islice
+from .copy_import import PositionCopyImporter, EmployeeCopyImporter, TimesheetCopyImporter
+from .importers import PositionImporter, EmployeeImporter, TimesheetImporter, batched, iter_csv_rows
+from .manifests import open_manifest, complete_manifest
+from .models import ImportJob
+from .reports import refresh_report_views
+
+IMPORTERS = {
+    'positions': (PositionImporter, PositionCopyImporter, 'position_count'),
+    'employees': (EmployeeImporter, EmployeeCopyImporter, 'employee_count'),
+    'timesheets': (TimesheetImporter, TimesheetCopyImporter, 'timesheet_count'),
+}
+
+# пространство ключей pg_advisory_lock для задач импорта
+JOB_LOCK_NAMESPACE = 4210
+
+
+def enqueue_import(positions_file, employees_file, timesheets_file, fast_import=False, incremental=True):
+    return ImportJob.objects.create(
+        positions_file=positions_file,
+        employees_file=employees_file,
+        timesheets_file=timesheets_file,
+        fast_import=fast_import,
+        incremental=incremental,
+    )
+
+
+def claim_next_job():
+    """Берет следующую задачу из очереди. Задача захватывается сессионной advisory-блокировкой,
+    которая освобождается автоматически при падении обработчика, поэтому незавершенные задачи
+    в статусе running подхватываются следующим обработчиком и продолжаются с сохраненной строки."""
+    candidates = ImportJob.objects.filter(
+        status__in=[ImportJob.PENDING, ImportJob.RUNNING]
+    ).order_by('created_at').values_list('pk', flat=True)
+    for job_id in candidates:
+        if not lock_job(job_id):
+            continue
+        job = ImportJob.objects.get(pk=job_id)
+        if job.status not in (ImportJob.PENDING, ImportJob.RUNNING):
+            unlock_job(job_id)
+            continue
+        job.status = ImportJob.RUNNING
+        job.started_at = job.started_at or timezone.now()
+        job.save()
+        return job
+    return None
+
+
+def lock_job(job_id):
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT pg_try_advisory_lock(%s, %s)', [JOB_LOCK_NAMESPACE, job_id])
+        return cursor.fetchone()[0]
+
+
+def unlock_job(job_id):
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT pg_advisory_unlock(%s, %s)', [JOB_LOCK_NAMESPACE, job_id])
+
+
+def run_job(job):
+    try:
+        for stage in ImportJob.STAGES[ImportJob.STAGES.index(job.stage):]:
+            if stage != job.stage:
+                job.stage, job.stage_rows, job.stage_workers, job.stage_shards = stage, 0, 0, []
+                job.save()
+            run_stage(job, stage)
+        job.status = ImportJob.DONE
+        job.finished_at = timezone.now()
+        job.save()
+        for stage in ImportJob.STAGES:
+            getattr(job, f'{stage}_file').delete(save=False)
+    except Exception as e:
+        # счетчики в памяти могли разойтись с базой из-за отката последнего пакета
+        job.refresh_from_db()
+        job.status = ImportJob.FAILED
+        job.finished_at = timezone.now()
+        job.add_errors([f"Import failed at {job.stage} row {job.stage_rows}: {e}"])
+        job.save()
+        raise
+    finally:
+        unlock_job(job.pk)
+
+    if settings.REPORT_USE_MATERIALIZED_VIEWS:
+        # вне try: задача уже завершена, и сбой обновления не должен помечать ее как failed
+        refresh_report_views()
+
+
+def run_stage(job, stage):
+    """Импортирует файл текущего этапа. Каждый пакет строк фиксируется в отдельной транзакции
+    вместе с прогрессом задачи, поэтому после сбоя импорт продолжается с первой незафиксированной строки.
+    Построчный импорт ведет манифест файла (см. manifests): полностью импортированный ранее файл
+    пропускается, а при incremental обрабатываются только строки с новыми отпечатками.
+    Быстрый импорт через COPY манифест не использует — он сам пропускает существующие записи."""
+    importer_class, copy_importer_class, count_field = IMPORTERS[stage]
+    uploaded_file = getattr(job, f'{stage}_file')
+
+    if job.fast_import:
+        with transaction.atomic():
+            errors, count = copy_importer_class.import_from_csv(uploaded_file)
+            record_progress(job, count_field, count + len(errors), count, errors)
+        uploaded_file.close()
+        return
+
+    manifest, unchanged = open_manifest(importer_class.name, uploaded_file)
+    if unchanged and job.incremental:
+        uploaded_file.close()
+        return
+
+    workers = settings.TIMESHEET_IMPORT_WORKERS
+    if stage == 'timesheets' and workers > 1:
+        run_parallel_stage(job, importer_class, count_field, uploaded_file, manifest, workers)
+        return
+
+    # после параллельного запуска stage_rows — число строк готовых частей, а не номер строки,
+    # поэтому файл читается с начала, а загруженные строки пропускаются по отпечаткам или как дубликаты
+    rows = islice(iter_csv_rows(uploaded_file), 0 if job.stage_workers else job.stage_rows, None)
+    importer = importer_class(manifest=manifest, incremental=job.incremental)
+    for batch in batched(rows, importer.batch_size):
+        with transaction.atomic():
+            importer.import_batch(batch)
+            record_progress(job, count_field, len(batch), importer.count, importer.errors)
+        importer.count, importer.errors = 0, []
+    complete_manifest(manifest)
+    uploaded_file.close()
+
+
+def run_parallel_stage(job, importer_class, count_field, uploaded_file, manifest, workers):
+    """Параллельный импорт таймшитов (см. TimesheetImporter.import_parallel). Каждая часть фиксируется
+    отдельно, и вместе с ней сохраняется прогресс задачи; после сбоя загружаются только незавершенные
+    части. Если с тех пор изменилось число процессов, деление на части другое, и файл загружается
+    заново — уже загруженные строки пропускаются по отпечаткам или как дубликаты."""
+    if job.stage_workers != workers:
+        job.stage_workers, job.stage_shards = workers, []
+        job.save()
+
+    def shard_done(shard, errors, count, rows):
+        with transaction.atomic():
+            job.stage_shards.append(shard)
+            record_progress(job, count_field, rows, count, errors)
+
+    importer_class.import_parallel(
+        iter_csv_rows(uploaded_file), workers, manifest=manifest, incremental=job.incremental,
+        skip_shards=set(job.stage_shards), on_shard=shard_done,
+    )
+    complete_manifest(manifest)
+    uploaded_file.close()
+
+
+def record_progress(job, count_field, rows, count, errors):
+    job.stage_rows += rows
+    job.rows_processed += rows
+    setattr(job, count_field, getattr(job, count_field) + count)
+    job.add_errors(errors)
+    job.save()
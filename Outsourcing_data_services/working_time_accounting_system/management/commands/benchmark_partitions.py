@@ -0,0 +1,112 @@
+import time
+from datetime import datetime
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from working_time_accounting_system.models import Timesheet
+from working_time_accounting_system.partitions import month_start, add_months
+
+COPY_TABLE = 'timesheet_benchmark_plain'
+
+# запросы отчетов и списков по таймшитам за месяц; {table} — секционированная таблица или ее копия
+QUERIES = {
+    'task hours for month': (
+        "SELECT task_id, sum(extract(epoch FROM end_time - start_time)) AS seconds FROM {table} "
+        "WHERE start_time >= %(start)s AND start_time < %(end)s GROUP BY task_id ORDER BY seconds DESC LIMIT 5"
+    ),
+    'employee hours for month': (
+        "SELECT employee_id, sum(extract(epoch FROM end_time - start_time)) AS seconds FROM {table} "
+        "WHERE start_time >= %(start)s AND start_time < %(end)s GROUP BY employee_id ORDER BY seconds DESC LIMIT 5"
+    ),
+    'employee timesheet page': (
+        "SELECT id, task_id, start_time, end_time FROM {table} "
+        "WHERE employee_id = %(employee)s AND start_time >= %(start)s ORDER BY start_time, id LIMIT 50"
+    ),
+    'overlap check': (
+        "SELECT 1 FROM {table} WHERE employee_id = %(employee)s "
+        "AND start_time < %(end)s AND end_time > %(start)s LIMIT 1"
+    ),
+}
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает время запросов отчетов по секционированной таблице таймшитов '
+            'и по ее несекционированной копии с теми же индексами')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--month', help='Месяц запросов в формате YYYY-MM (по умолчанию — месяц с наибольшим числом записей)')
+        parser.add_argument('--repeat', type=int, default=20, help='Сколько раз выполнить каждый запрос')
+
+    def handle(self, *args, **options):
+        table = connection.ops.quote_name(Timesheet._meta.db_table)
+        params = self.query_params(options['month'])
+        self.stdout.write(f"Month {params['start']:%Y-%m}, employee {params['employee']}, {options['repeat']} runs")
+
+        # копия живет только в транзакции и удаляется откатом
+        with transaction.atomic():
+            self.create_copy(table)
+            self.stdout.write(f"{'query':<28}{'partitioned, ms':>18}{'plain, ms':>12}{'partitions scanned':>22}")
+            for name, sql in QUERIES.items():
+                partitioned = self.measure(sql.format(table=table), params, options['repeat'])
+                plain = self.measure(sql.format(table=COPY_TABLE), params, options['repeat'])
+                scanned = self.scanned_partitions(sql.format(table=table), params)
+                self.stdout.write(f"{name:<28}{partitioned:>18.3f}{plain:>12.3f}{scanned:>22}")
+            transaction.set_rollback(True)
+
+    def query_params(self, month):
+        if month:
+            start = month_start(datetime.strptime(month, '%Y-%m'))
+        else:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f"SELECT date_trunc('month', start_time AT TIME ZONE %s) FROM "
+                    f"{connection.ops.quote_name(Timesheet._meta.db_table)} GROUP BY 1 ORDER BY count(*) DESC LIMIT 1",
+                    [settings.TIME_ZONE],
+                )
+                row = cursor.fetchone()
+            start = month_start(row[0] if row else datetime.now())
+        end = add_months(start, 1)
+        employee = Timesheet.objects.filter(start_time__gte=start, start_time__lt=end).values_list(
+            'employee_id', flat=True
+        ).first()
+        return {'start': start, 'end': end, 'employee': employee or 0}
+
+    def create_copy(self, table):
+        with connection.cursor() as cursor:
+            cursor.execute(f"CREATE TEMP TABLE {COPY_TABLE} ON COMMIT DROP AS SELECT * FROM {table}")
+            cursor.execute(f"ALTER TABLE {COPY_TABLE} ADD PRIMARY KEY (id)")
+            cursor.execute(f"CREATE INDEX ON {COPY_TABLE} (employee_id, start_time, id)")
+            cursor.execute(f"CREATE INDEX ON {COPY_TABLE} (employee_id)")
+            cursor.execute(f"CREATE INDEX ON {COPY_TABLE} (task_id)")
+            cursor.execute(
+                f"ALTER TABLE {COPY_TABLE} ADD EXCLUDE USING gist "
+                f"(employee_id WITH =, tstzrange(start_time, end_time, '[)') WITH &&)"
+            )
+            cursor.execute(f"ANALYZE {COPY_TABLE}")
+            cursor.execute(f"ANALYZE {table}")
+
+    def measure(self, sql, params, repeat):
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)  # прогрев кэша
+            started = time.perf_counter()
+            for _ in range(repeat):
+                cursor.execute(sql, params)
+                cursor.fetchall()
+        return (time.perf_counter() - started) * 1000 / repeat
+
+    def scanned_partitions(self, sql, params):
+        """Число секций в плане запроса (после отсечения по start_time)."""
+        prefix = f"{Timesheet._meta.db_table}_"
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+            plan = cursor.fetchone()[0]
+        relations = set()
+
+        def walk(node):
+            if node.get('Relation Name', '').startswith(prefix):
+                relations.add(node['Relation Name'])
+            for child in node.get('Plans', []):
+                walk(child)
+
+        walk(plan[0]['Plan'])
+        return len(relations)
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from working_time_accounting_system.models import Timesheet, TimesheetHistory
+from working_time_accounting_system.partitions import MonthlyPartitions, TIMESHEET_PARTITION_SQL
+
+
+class Command(BaseCommand):
+    help = 'Создает помесячные секции на ближайшие месяцы и переносит в них строки из секции по умолчанию'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--months-ahead', type=int, default=3, help='На сколько месяцев вперед создать секции')
+
+    def handle(self, *args, **options):
+        for partitions in [
+            MonthlyPartitions(Timesheet._meta.db_table, partition_sql=TIMESHEET_PARTITION_SQL),
+            MonthlyPartitions(TimesheetHistory._meta.db_table),
+        ]:
+            created = partitions.create_ahead(options['months_ahead']) + partitions.split_default()
+            for name in created:
+                self.stdout.write(f"Created partition {name}")
+            self.stdout.write(self.style.SUCCESS(f"{partitions.table}: {len(created)} partitions created"))
@@ -0,0 +1,38 @@
+from datetime import datetime
+from django.core.management.base import BaseCommand, CommandError
+from working_time_accounting_system.datasets import generate_dataset, MAX_POSITIONS
+
+
+class Command(BaseCommand):
+    help = ('Генерирует синтетические positions.csv, employees.csv и timesheet.csv заданного размера '
+            'без пересечений интервалов сотрудника')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output-dir', default='.', help='Каталог для файлов')
+        parser.add_argument('--timesheets', type=int, default=100_000, help='Число строк timesheet.csv')
+        parser.add_argument('--employees', type=int, default=100)
+        parser.add_argument('--tasks', type=int, default=500)
+        parser.add_argument('--positions', type=int, default=8, help=f'Не больше {MAX_POSITIONS}')
+        parser.add_argument('--start-date', default='2021-01-01', help='Первый день таймшитов, YYYY-MM-DD')
+        parser.add_argument('--seed', type=int, default=0, help='Одинаковый seed дает одинаковые файлы')
+
+    def handle(self, *args, **options):
+        if min(options['employees'], options['tasks'], options['positions']) < 1:
+            raise CommandError('--employees, --tasks and --positions must be positive')
+        try:
+            summary = generate_dataset(
+                options['output_dir'],
+                positions=options['positions'],
+                employees=options['employees'],
+                tasks=options['tasks'],
+                timesheets=options['timesheets'],
+                start=datetime.strptime(options['start_date'], '%Y-%m-%d').date(),
+                seed=options['seed'],
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+        self.stdout.write(self.style.SUCCESS(
+            f"Wrote {summary['positions']} positions, {summary['employees']} employees and "
+            f"{summary['timesheets']} timesheets for {summary['tasks']} tasks "
+            f"({options['start_date']} - {summary['last_day']}) to {options['output_dir']}"
+        ))
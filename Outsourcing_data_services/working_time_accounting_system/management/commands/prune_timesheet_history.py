@@ -0,0 +1,35 @@
+import os
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from working_time_accounting_system.models import TimesheetHistory
+from working_time_accounting_system.partitions import MonthlyPartitions, month_start, add_months
+
+
+class Command(BaseCommand):
+    help = 'Удаляет секции архива удаленных таймшитов старше заданного срока хранения'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than-months', type=int, default=settings.TIMESHEET_HISTORY_RETENTION_MONTHS,
+                            help='Срок хранения в месяцах (по умолчанию TIMESHEET_HISTORY_RETENTION_MONTHS)')
+        parser.add_argument('--dump-dir', help='Перед удалением выгрузить каждую секцию в <dump-dir>/<секция>.csv.gz')
+        parser.add_argument('--dry-run', action='store_true', help='Только показать секции, которые будут удалены')
+
+    def handle(self, *args, **options):
+        partitions = MonthlyPartitions(TimesheetHistory._meta.db_table)
+        cutoff = add_months(month_start(timezone.now()), -options['older_than_months'])
+        expired = partitions.older_than(cutoff)
+        if options['dump_dir'] and not options['dry_run']:
+            os.makedirs(options['dump_dir'], exist_ok=True)
+
+        for name in expired:
+            if options['dry_run']:
+                self.stdout.write(f"Would drop {name}")
+                continue
+            if options['dump_dir']:
+                path = os.path.join(options['dump_dir'], f'{name}.csv.gz')
+                partitions.dump(name, path)
+                self.stdout.write(f"Dumped {name} to {path}")
+            partitions.drop(name)
+            self.stdout.write(f"Dropped {name}")
+        self.stdout.write(self.style.SUCCESS(f"{len(expired)} partitions older than {cutoff:%Y-%m} processed"))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from working_time_accounting_system.models import TimesheetRollup
+from working_time_accounting_system.rollups import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает сводную таблицу отчетов TimesheetRollup по таймшитам'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--employee', type=int, action='append', help='Пересчитать только указанных сотрудников (id)')
+
+    def handle(self, *args, **options):
+        rebuild_rollups(options['employee'])
+        self.stdout.write(self.style.SUCCESS(f"Rollups rebuilt: {TimesheetRollup.objects.count()} rows"))
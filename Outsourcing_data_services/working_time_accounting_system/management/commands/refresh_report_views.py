@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from working_time_accounting_system.reports import refresh_report_views, report_views_refreshed_at
+
+
+class Command(BaseCommand):
+    help = 'Обновляет материализованные представления отчетов (REFRESH MATERIALIZED VIEW CONCURRENTLY)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--blocking', action='store_true',
+                            help='Обновить без CONCURRENTLY: быстрее, но блокирует чтение отчета')
+
+    def handle(self, *args, **options):
+        refresh_report_views(concurrently=not options['blocking'])
+        self.stdout.write(self.style.SUCCESS(f"Report views refreshed at {report_views_refreshed_at()}"))
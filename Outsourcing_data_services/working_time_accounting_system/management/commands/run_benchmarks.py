@@ -0,0 +1,245 @@
+import csv
+import gc
+import json
+import platform
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+import django
+from asgiref.sync import async_to_sync
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+from working_time_accounting_system.datasets import generate_dataset
+from working_time_accounting_system.importers import PositionImporter, EmployeeImporter, TimesheetImporter
+from working_time_accounting_system.models import (
+    Position, Employee, Task, Timesheet, TimesheetHistory, TimesheetRollup, ImportJob, ImportManifest,
+    ImportedRow,
+)
+from working_time_accounting_system.pagination import KeysetPaginator
+from working_time_accounting_system.partitions import MonthlyPartitions, TIMESHEET_PARTITION_SQL, month_start, add_months
+from working_time_accounting_system.report_cache import report_cache
+from working_time_accounting_system.reports import (
+    REPORTS, build_report, abuild_report, build_report_from_views, refresh_report_views,
+)
+
+IMPORTS = (
+    ('positions.csv', PositionImporter),
+    ('employees.csv', EmployeeImporter),
+    ('timesheet.csv', TimesheetImporter),
+)
+
+
+class Command(BaseCommand):
+    help = ('Набор замеров производительности: импорт, сохранение таймшита с проверкой пересечений, '
+            'запросы отчета, список таймшитов и удаление. Выполняется во временной тестовой базе '
+            '(как manage.py test), результаты пишутся в JSON и сравниваются с сохраненным базовым файлом')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--data-dir', help='Каталог с positions.csv, employees.csv и timesheet.csv '
+                                               '(по умолчанию данные генерируются, см. generate_dataset)')
+        parser.add_argument('--timesheets', type=int, default=100_000, help='Размер генерируемых данных')
+        parser.add_argument('--employees', type=int, default=100)
+        parser.add_argument('--tasks', type=int, default=500)
+        parser.add_argument('--repeat', type=int, default=5, help='Сколько раз выполнить каждый повторяемый замер')
+        parser.add_argument('--output', help='Записать результаты в JSON-файл')
+        parser.add_argument('--baseline', help='JSON-файл прошлого запуска (--output) для сравнения')
+        parser.add_argument('--threshold', type=float, default=1.25,
+                            help='Замедление относительно базового файла, считающееся регрессией')
+        parser.add_argument('--keepdb', action='store_true', help='Не удалять тестовую базу после запуска')
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options['baseline']:
+            baseline = json.loads(Path(options['baseline']).read_text(encoding='utf-8'))
+        self.repeat = options['repeat']
+        self.results = {}
+        self.dataset = {}
+
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=options['keepdb'])
+        try:
+            with tempfile.TemporaryDirectory() as temp_dir:
+                data_dir = Path(options['data_dir'] or temp_dir)
+                if not options['data_dir']:
+                    generate_dataset(
+                        data_dir, employees=options['employees'], tasks=options['tasks'],
+                        timesheets=options['timesheets'],
+                    )
+                self.prepare_database(data_dir)
+                self.run_suite(data_dir)
+            meta = self.meta(options['data_dir'])
+        finally:
+            # соединения потоков пула (in_thread) живут до истечения CONN_MAX_AGE; потоки уже завершены,
+            # но их соединения закрываются только при сборке мусора, а иначе DROP DATABASE отклоняется
+            gc.collect()
+            connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=options['keepdb'])
+
+        report = {'meta': meta, 'results': self.results}
+        if options['output']:
+            Path(options['output']).write_text(json.dumps(report, indent=2), encoding='utf-8')
+        if baseline and baseline['meta'].get('dataset') != meta['dataset']:
+            self.stderr.write(f"Baseline was measured on a different dataset: {baseline['meta'].get('dataset')}")
+        regressions = self.print_results(baseline, options['threshold'])
+        if regressions:
+            raise CommandError(f"Slower than baseline by more than {options['threshold']}x: {', '.join(regressions)}")
+
+    def prepare_database(self, data_dir):
+        """Очищает таблицы (тестовая база могла остаться от --keepdb) и заранее создает помесячные
+        секции на период данных и следующий месяц, куда пишутся одиночные таймшиты. Манифесты импорта
+        очищаются вместе с данными: иначе замеряемый импорт пропустил бы все строки как уже загруженные."""
+        tables = ', '.join(connection.ops.quote_name(model._meta.db_table) for model in (
+            Timesheet, TimesheetHistory, TimesheetRollup, Task, Employee, Position, ImportJob,
+            ImportManifest, ImportedRow,
+        ))
+        with connection.cursor() as cursor:
+            cursor.execute(f"TRUNCATE {tables} RESTART IDENTITY CASCADE")
+
+        months = self.dataset_months(data_dir / 'timesheet.csv')
+        if months:
+            months.add(add_months(max(months), 1))
+        for partitions in [
+            MonthlyPartitions(Timesheet._meta.db_table, partition_sql=TIMESHEET_PARTITION_SQL),
+            MonthlyPartitions(TimesheetHistory._meta.db_table),
+        ]:
+            for month in sorted(months):
+                partitions.create(month)
+
+    @staticmethod
+    def dataset_months(path):
+        with open(path, newline='', encoding='utf-8') as source:
+            return {
+                month_start(datetime.strptime(row[2][:7], '%Y-%m'))
+                for row in csv.reader(source) if len(row) == 4
+            }
+
+    def run_suite(self, data_dir):
+        for filename, importer_class in IMPORTS:
+            content = (data_dir / filename).read_bytes()
+            rows = content.count(b'\n') + (not content.endswith(b'\n') and bool(content))
+            self.dataset[filename] = rows
+            started = time.perf_counter()
+            importer_class.import_from_csv(SimpleUploadedFile(filename, content))
+            self.record(f'import {filename}', [time.perf_counter() - started], rows=rows)
+
+        employee_id = Timesheet.objects.values('employee_id').annotate(
+            count=Count('id')
+        ).order_by('-count').values_list('employee_id', flat=True).first()
+        task = Task.objects.order_by('pk').first()
+        first_day = Timesheet.objects.order_by('start_time').values_list('start_time', flat=True).first()
+        last_day = Timesheet.objects.order_by('-start_time').values_list('start_time', flat=True).first()
+        if employee_id is None:
+            raise CommandError('The dataset contains no timesheets')
+
+        self.benchmark_reports(first_day, employee_id)
+        self.benchmark_list(employee_id)
+        saved = self.benchmark_save(employee_id, task, last_day)
+        self.benchmark_delete(saved, employee_id, first_day)
+
+    def benchmark_reports(self, first_day, employee_id):
+        month = month_start(first_day)
+        period = {'date_from': month.date().isoformat(), 'date_to': (add_months(month, 1) - timedelta(days=1)).date().isoformat()}
+        for name in REPORTS:
+            self.measure(f'report {name}', lambda name=name: build_report(reports=(name,)))
+        self.measure('report all rankings', build_report)
+        self.measure('report async', async_to_sync(abuild_report))
+        self.measure('report for month', lambda: build_report(**period))
+        self.measure('report for employee', lambda: build_report(employee=employee_id))
+
+        client = Client()
+
+        def report_view():
+            report_cache().clear()
+            client.get(reverse('report'))
+
+        self.measure('report view uncached', report_view)
+        refresh_report_views(concurrently=False)
+        self.measure('report from materialized views', build_report_from_views)
+
+    def benchmark_list(self, employee_id):
+        client = Client()
+        url = reverse('timesheet_list', args=[employee_id])
+        timesheets = Timesheet.objects.filter(employee_id=employee_id).order_by('start_time', 'pk')
+        middle = timesheets[timesheets.count() // 2]
+        cursor = KeysetPaginator.encode_cursor(middle)
+        self.measure('timesheet list first page', lambda: client.get(url))
+        self.measure('timesheet list deep page', lambda: client.get(url, {'after': cursor}))
+
+    def benchmark_save(self, employee_id, task, last_day):
+        """Одиночные Timesheet.save с блокировкой и проверкой пересечений — в месяце после данных,
+        по одной записи в час, чтобы записи не пересекались."""
+        start = add_months(month_start(last_day), 1)
+        saved = []
+
+        def save():
+            start_time = start + timedelta(hours=len(saved))
+            timesheet = Timesheet(employee_id=employee_id, task=task, start_time=start_time,
+                                  end_time=start_time + timedelta(minutes=30))
+            timesheet.save()
+            saved.append(timesheet.pk)
+
+        self.measure('timesheet save with overlap check', save)
+        return saved
+
+    def benchmark_delete(self, saved, employee_id, first_day):
+        pending = list(saved)
+        self.measure('timesheet delete', lambda: Timesheet.objects.get(pk=pending.pop()).delete(), runs=len(pending))
+        month = month_start(first_day)
+        timesheets = Timesheet.objects.filter(employee_id=employee_id, start_time__gte=month,
+                                              start_time__lt=add_months(month, 1))
+        rows = timesheets.count()
+        started = time.perf_counter()
+        timesheets.archive_and_delete()
+        self.record('bulk delete employee month', [time.perf_counter() - started], rows=rows)
+
+    def measure(self, name, func, runs=None):
+        timings = []
+        for _ in range(runs or self.repeat):
+            started = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - started)
+        self.record(name, timings)
+
+    def record(self, name, timings, rows=None):
+        result = {'median': statistics.median(timings), 'min': min(timings), 'runs': len(timings)}
+        if rows is not None:
+            result['rows'] = rows
+            result['rows_per_second'] = round(rows / result['median'], 1) if result['median'] else None
+        self.results[name] = result
+        self.stdout.write(f"{name}: {result['median'] * 1000:.1f} ms")
+
+    def meta(self, data_dir):
+        with connection.cursor() as cursor:
+            cursor.execute('SHOW server_version')
+            server_version = cursor.fetchone()[0]
+        return {
+            'created_at': timezone.now().isoformat(),
+            'data_dir': data_dir,
+            'dataset': self.dataset,
+            'repeat': self.repeat,
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'postgresql': server_version,
+        }
+
+    def print_results(self, baseline, threshold):
+        """Выводит таблицу результатов и возвращает имена замеров, медленнее базовых больше чем в threshold раз."""
+        previous = (baseline or {}).get('results', {})
+        self.stdout.write(f"\n{'benchmark':<36}{'median, ms':>12}{'min, ms':>10}{'rows/sec':>12}{'baseline, ms':>14}{'change':>9}")
+        regressions = []
+        for name, result in self.results.items():
+            line = (f"{name:<36}{result['median'] * 1000:>12.1f}{result['min'] * 1000:>10.1f}"
+                    f"{result.get('rows_per_second') or '':>12}")
+            if name in previous:
+                ratio = result['median'] / previous[name]['median'] if previous[name]['median'] else 1
+                line += f"{previous[name]['median'] * 1000:>14.1f}{(ratio - 1) * 100:>+8.0f}%"
+                if ratio > threshold:
+                    regressions.append(name)
+                    line = self.style.ERROR(line)
+            self.stdout.write(line)
+        return regressions
@@ -0,0 +1,43 @@
+import time
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from working_time_accounting_system.jobs import claim_next_job, run_job
+from working_time_accounting_system.metrics import IMPORT_PHASE_SECONDS
+
+
+class Command(BaseCommand):
+    help = 'Обрабатывает очередь фоновых импортов (ImportJob)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=2.0, help='Пауза между опросами очереди, сек')
+        parser.add_argument('--once', action='store_true', help='Обработать очередь и завершиться')
+
+    def handle(self, *args, **options):
+        while True:
+            close_old_connections()
+            job = claim_next_job()
+            if job is None:
+                if options['once']:
+                    return
+                time.sleep(options['interval'])
+                continue
+
+            self.stdout.write(f"Starting {job}, stage {job.stage} from row {job.stage_rows}")
+            phases_before = IMPORT_PHASE_SECONDS.totals()
+            try:
+                run_job(job)
+            except Exception as e:
+                self.stderr.write(f"{job} failed: {e}")
+                continue
+            self.stdout.write(self.style.SUCCESS(
+                f"{job} finished: {job.rows_processed} rows, {job.rows_per_second} rows/sec, "
+                f"{job.error_count} errors"
+            ))
+            self.stdout.write(f"Phase timings: {self.phase_timings(phases_before)}")
+
+    def phase_timings(self, before):
+        """Время этапов импорта за задачу: разница счетчиков процесса до и после нее."""
+        spent = {key: total - before.get(key, 0) for key, total in IMPORT_PHASE_SECONDS.totals().items()}
+        return ', '.join(
+            f"{importer} {phase} {seconds:.2f}s" for (importer, phase), seconds in sorted(spent.items()) if seconds
+        ) or '-'
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+from working_time_accounting_system.intervals import IntervalIndex
+from working_time_accounting_system.models import Timesheet
+
+
+class Command(BaseCommand):
+    help = 'Проверяет всю таблицу таймшитов на пересечения интервалов одного сотрудника и выводит отчет'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--employee', type=int, action='append', help='Проверить только указанных сотрудников (id)')
+        parser.add_argument('--limit', type=int, default=100, help='Сколько найденных пересечений вывести')
+        parser.add_argument('--chunk-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        timesheets = Timesheet.objects.all()
+        if options['employee']:
+            timesheets = timesheets.filter(employee_id__in=options['employee'])
+        rows = timesheets.order_by('employee_id', 'start_time', 'id').values_list(
+            'employee_id', 'start_time', 'end_time', 'id', 'employee__employee_name'
+        ).iterator(chunk_size=options['chunk_size'])
+
+        overlaps = 0
+        employees = set()
+        for previous, current in IntervalIndex.sweep(rows):
+            overlaps += 1
+            employees.add(current[0])
+            if overlaps <= options['limit']:
+                self.stdout.write(
+                    f"{current[4]} (employee {current[0]}): timesheet {previous[3]} "
+                    f"[{previous[1]:%Y-%m-%d %H:%M} - {previous[2]:%Y-%m-%d %H:%M}] overlaps timesheet {current[3]} "
+                    f"[{current[1]:%Y-%m-%d %H:%M} - {current[2]:%Y-%m-%d %H:%M}]"
+                )
+
+        if overlaps:
+            self.stdout.write(self.style.ERROR(
+                f"Found {overlaps} overlapping timesheets for {len(employees)} employees"
+            ))
+        else:
+            self.stdout.write(self.style.SUCCESS("No overlapping timesheets found"))
@@ -0,0 +1,221 @@
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from asgiref.sync import iscoroutinefunction
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.utils.decorators import sync_and_async_middleware
+
+# каждый процесс (воркер gunicorn, обработчик импорта) ведет свой реестр,
+# и /metrics отдает значения процесса, который обработал запрос
+REGISTRY = []
+
+
+class Metric:
+    """Метрика с метками в памяти процесса; значения хранятся по кортежу значений меток."""
+
+    type = None
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self._lock = threading.Lock()
+        self._values = {}
+        REGISTRY.append(self)
+
+    def key(self, labels):
+        return tuple(str(labels[label]) for label in self.labels)
+
+    def totals(self):
+        """Текущие значения: {значения меток: значение}."""
+        with self._lock:
+            return dict(self._values)
+
+    def samples(self):
+        """Строки метрики в виде (имя, метки, значение)."""
+        for key, value in sorted(self.totals().items()):
+            yield self.name, dict(zip(self.labels, key)), value
+
+
+class Counter(Metric):
+    type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self.key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    type = 'gauge'
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self.key(labels)] = value
+
+
+class Histogram(Metric):
+    """Значение по меткам — (число наблюдений в каждой корзине, сумма, общее число наблюдений)."""
+
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labels=(), buckets=()):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self.key(labels)
+        with self._lock:
+            counts, total, count = self._values.get(key, ((0,) * len(self.buckets), 0, 0))
+            counts = tuple(bucket + (value <= bound) for bucket, bound in zip(counts, self.buckets))
+            self._values[key] = (counts, total + value, count + 1)
+
+    def samples(self):
+        for key, (counts, total, count) in sorted(self.totals().items()):
+            labels = dict(zip(self.labels, key))
+            for bound, bucket in zip(self.buckets, counts):
+                yield f'{self.name}_bucket', {**labels, 'le': format_value(bound)}, bucket
+            yield f'{self.name}_bucket', {**labels, 'le': '+Inf'}, count
+            yield f'{self.name}_sum', labels, total
+            yield f'{self.name}_count', labels, count
+
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+SIZE_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+REQUEST_DURATION = Histogram(
+    'http_request_duration_seconds', 'Время обработки запроса', ('view', 'method'), LATENCY_BUCKETS
+)
+REQUESTS = Counter('http_requests_total', 'Число запросов', ('view', 'method', 'status'))
+REQUEST_QUERIES = Histogram('http_request_db_queries', 'Число SQL-запросов на запрос', ('view',), QUERY_BUCKETS)
+REQUEST_DB_DURATION = Histogram(
+    'http_request_db_duration_seconds', 'Суммарное время SQL-запросов на запрос', ('view',), LATENCY_BUCKETS
+)
+RESPONSE_SIZE = Histogram(
+    'http_response_size_bytes', 'Размер ответа (без потоковых ответов)', ('view',), SIZE_BUCKETS
+)
+IMPORT_PHASE_SECONDS = Counter(
+    'import_phase_seconds_total', 'Время этапов импорта: fingerprint, parse, resolve, validate, write', ('importer', 'phase')
+)
+IMPORT_ROWS = Counter('import_rows_total', 'Обработанные строки импорта по результату', ('importer', 'status'))
+IMPORT_ROWS_PER_SECOND = Gauge('import_rows_per_second', 'Скорость последнего пакета импорта', ('importer',))
+RESOLVER_LOOKUPS = Counter(
+    'resolver_lookups_total', 'Поиск объектов в кэшах resolvers: hit, shared_hit или miss', ('resolver', 'result')
+)
+RESOLVER_ENTRIES = Gauge('resolver_cache_entries', 'Число объектов в кэше resolvers процесса', ('resolver',))
+
+
+def format_value(value):
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value)
+
+
+def escape(value):
+    return str(value).replace('\\', r'\\').replace('\n', r'\n').replace('"', r'\"')
+
+
+def render():
+    """Все метрики реестра в текстовом формате Prometheus."""
+    lines = []
+    for metric in REGISTRY:
+        lines.append(f'# HELP {metric.name} {escape(metric.documentation)}')
+        lines.append(f'# TYPE {metric.name} {metric.type}')
+        for name, labels, value in metric.samples():
+            label_text = ','.join(f'{label}="{escape(label_value)}"' for label, label_value in labels.items())
+            lines.append(f'{name}{{{label_text}}} {format_value(value)}' if label_text else f'{name} {format_value(value)}')
+    return '\n'.join(lines) + '\n'
+
+
+@contextmanager
+def timed(counter, **labels):
+    """Добавляет время выполнения блока к счетчику секунд."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        counter.inc(time.perf_counter() - started, **labels)
+
+
+class QueryStats:
+    """SQL-запросы текущего HTTP-запроса. Асинхронные представления выполняют запросы в других
+    потоках (sync_to_async), поэтому счетчики защищены блокировкой."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.queries = 0
+        self.duration = 0.0
+
+    def add(self, duration):
+        with self.lock:
+            self.queries += 1
+            self.duration += duration
+
+
+# контекст копируется в потоки sync_to_async, поэтому запросы из них попадают в статистику запроса
+_query_stats = contextvars.ContextVar('query_stats', default=None)
+
+
+def record_query(execute, sql, params, many, context):
+    stats = _query_stats.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.add(time.perf_counter() - started)
+
+
+@receiver(connection_created)
+def install_query_recorder(sender, connection, **kwargs):
+    """Обертка execute_wrapper ставится на каждое новое соединение, а не только на соединение
+    потока запроса: отчеты выполняют запросы в отдельных потоках со своими соединениями."""
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+def view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    return match.view_name if match else 'unresolved'
+
+
+def observe_request(request, response, stats, duration):
+    view = view_name(request)
+    REQUEST_DURATION.observe(duration, view=view, method=request.method)
+    REQUESTS.inc(view=view, method=request.method, status=response.status_code)
+    REQUEST_QUERIES.observe(stats.queries, view=view)
+    REQUEST_DB_DURATION.observe(stats.duration, view=view)
+    if not response.streaming:
+        RESPONSE_SIZE.observe(len(response.content), view=view)
+
+
+@sync_and_async_middleware
+def metrics_middleware(get_response):
+    """Время ответа, число и время SQL-запросов и размер ответа по каждому представлению.
+    Потоковые ответы учитываются до начала отправки: запросы, которые выполняются при чтении
+    потока, и размер ответа в метрики не попадают."""
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            stats, started = QueryStats(), time.perf_counter()
+            token = _query_stats.set(stats)
+            try:
+                response = await get_response(request)
+            finally:
+                _query_stats.reset(token)
+            observe_request(request, response, stats, time.perf_counter() - started)
+            return response
+    else:
+        def middleware(request):
+            stats, started = QueryStats(), time.perf_counter()
+            token = _query_stats.set(stats)
+            try:
+                response = get_response(request)
+            finally:
+                _query_stats.reset(token)
+            observe_request(request, response, stats, time.perf_counter() - started)
+            return response
+    return middleware
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.5 on 2026-10-18 06:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('working_time_accounting_system', '0003_timesheethistory'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='employee',
+            constraint=models.UniqueConstraint(fields=('employee_name',), name='unique_employee_name'),
+        ),
+        migrations.AddConstraint(
+            model_name='position',
+            constraint=models.UniqueConstraint(fields=('position_name',), name='unique_position_name'),
+        ),
+        migrations.AddConstraint(
+            model_name='task',
+            constraint=models.UniqueConstraint(fields=('task_name',), name='unique_task_name'),
+        ),
+        migrations.AddConstraint(
+            model_name='timesheet',
+            constraint=models.UniqueConstraint(fields=('employee', 'task', 'start_time', 'end_time'), name='unique_timesheet_entry'),
+        ),
+    ]
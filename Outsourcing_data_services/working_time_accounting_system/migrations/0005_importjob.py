@@ -0,0 +1,41 @@
+# Generated by Django 4.2.5 on 2026-10-18 07:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('working_time_accounting_system', '0004_natural_key_constraints'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('pending', 'В очереди'), ('running', 'Выполняется'), ('done', 'Завершен'), ('failed', 'Ошибка')], default='pending', max_length=10)),
+                ('fast_import', models.BooleanField(default=False)),
+                ('positions_file', models.FileField(upload_to='imports/%Y/%m/%d/')),
+                ('employees_file', models.FileField(upload_to='imports/%Y/%m/%d/')),
+                ('timesheets_file', models.FileField(upload_to='imports/%Y/%m/%d/')),
+                ('stage', models.CharField(default='positions', max_length=10)),
+                ('stage_rows', models.PositiveBigIntegerField(default=0)),
+                ('rows_processed', models.PositiveBigIntegerField(default=0)),
+                ('position_count', models.PositiveIntegerField(default=0)),
+                ('employee_count', models.PositiveIntegerField(default=0)),
+                ('timesheet_count', models.PositiveIntegerField(default=0)),
+                ('error_count', models.PositiveIntegerField(default=0)),
+                ('errors', models.JSONField(default=list)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Импорт данных',
+                'verbose_name_plural': 'Импорты данных',
+                'indexes': [models.Index(fields=['status', 'updated_at'], name='importjob_status_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 4.2.5 on 2026-10-18 07:01
+
+import django.contrib.postgres.constraints
+import django.contrib.postgres.fields.ranges
+from django.contrib.postgres.operations import BtreeGistExtension
+from django.db import migrations
+import working_time_accounting_system.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('working_time_accounting_system', '0005_importjob'),
+    ]
+
+    operations = [
+        BtreeGistExtension(),
+        migrations.AddConstraint(
+            model_name='timesheet',
+            constraint=django.contrib.postgres.constraints.ExclusionConstraint(expressions=[(working_time_accounting_system.models.TsTzRange('start_time', 'end_time', django.contrib.postgres.fields.ranges.RangeBoundary()), '&&'), ('employee', '=')], name='exclude_overlapping_timesheets'),
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 4.2.5 on 2026-10-18 07:03
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def populate_rollups(apps, schema_editor):
+    tables = {
+        name: schema_editor.quote_name(apps.get_model('working_time_accounting_system', name)._meta.db_table)
+        for name in ('Position', 'Employee', 'Timesheet', 'TimesheetRollup')
+    }
+    schema_editor.execute(
+        f"INSERT INTO {tables['TimesheetRollup']} (day, employee_id, task_id, seconds, rate_seconds) "
+        f"SELECT (t.start_time AT TIME ZONE %s)::date, t.employee_id, t.task_id, "
+        f"sum(extract(epoch FROM t.end_time - t.start_time))::bigint, "
+        f"sum(extract(epoch FROM t.end_time - t.start_time) * p.hourly_rate)::bigint "
+        f"FROM {tables['Timesheet']} t "
+        f"JOIN {tables['Employee']} e ON e.id = t.employee_id "
+        f"JOIN {tables['Position']} p ON p.id = e.position_id "
+        f"GROUP BY 1, 2, 3",
+        [settings.TIME_ZONE],
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('working_time_accounting_system', '0006_timesheet_overlap_exclusion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TimesheetRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('seconds', models.BigIntegerField(default=0)),
+                ('rate_seconds', models.BigIntegerField(default=0)),
+                ('employee', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rollups', to='working_time_accounting_system.employee')),
+                ('task', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rollups', to='working_time_accounting_system.task')),
+            ],
+            options={
+                'verbose_name': 'Сводка по дням',
+                'verbose_name_plural': 'Сводки по дням',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='timesheetrollup',
+            constraint=models.UniqueConstraint(fields=('day', 'employee', 'task'), name='unique_rollup_day_employee_task'),
+        ),
+        migrations.RunPython(populate_rollups, migrations.RunPython.noop),
+    ]
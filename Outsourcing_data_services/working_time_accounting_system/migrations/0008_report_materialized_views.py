@@ -0,0 +1,80 @@
+# Generated by Django 4.2.5 on 2026-10-18 07:07
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+ROLLUP_TABLE = 'working_time_accounting_system_timesheetrollup'
+
+# у каждого представления есть уникальный индекс — без него REFRESH ... CONCURRENTLY невозможен
+CREATE_VIEWS = f"""
+CREATE MATERIALIZED VIEW report_task_hours AS
+    SELECT task_id, sum(seconds)::bigint AS seconds, now() AS refreshed_at
+    FROM {ROLLUP_TABLE} GROUP BY task_id HAVING sum(seconds) > 0;
+CREATE UNIQUE INDEX report_task_hours_task_idx ON report_task_hours (task_id);
+CREATE INDEX report_task_hours_seconds_idx ON report_task_hours (seconds DESC);
+
+CREATE MATERIALIZED VIEW report_task_cost AS
+    SELECT task_id, sum(rate_seconds)::bigint AS rate_seconds, now() AS refreshed_at
+    FROM {ROLLUP_TABLE} GROUP BY task_id HAVING sum(rate_seconds) > 0;
+CREATE UNIQUE INDEX report_task_cost_task_idx ON report_task_cost (task_id);
+CREATE INDEX report_task_cost_rate_seconds_idx ON report_task_cost (rate_seconds DESC);
+
+CREATE MATERIALIZED VIEW report_employee_hours AS
+    SELECT employee_id, sum(seconds)::bigint AS seconds, now() AS refreshed_at
+    FROM {ROLLUP_TABLE} GROUP BY employee_id HAVING sum(seconds) > 0;
+CREATE UNIQUE INDEX report_employee_hours_employee_idx ON report_employee_hours (employee_id);
+CREATE INDEX report_employee_hours_seconds_idx ON report_employee_hours (seconds DESC);
+"""
+
+DROP_VIEWS = """
+DROP MATERIALIZED VIEW IF EXISTS report_task_hours;
+DROP MATERIALIZED VIEW IF EXISTS report_task_cost;
+DROP MATERIALIZED VIEW IF EXISTS report_employee_hours;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('working_time_accounting_system', '0007_timesheetrollup'),
+    ]
+
+    operations = [
+        migrations.RunSQL(CREATE_VIEWS, DROP_VIEWS),
+        migrations.CreateModel(
+            name='ReportEmployeeHours',
+            fields=[
+                ('employee', models.OneToOneField(on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='+', serialize=False, to='working_time_accounting_system.employee')),
+                ('seconds', models.BigIntegerField()),
+                ('refreshed_at', models.DateTimeField()),
+            ],
+            options={
+                'db_table': 'report_employee_hours',
+                'managed': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='ReportTaskCost',
+            fields=[
+                ('task', models.OneToOneField(on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='+', serialize=False, to='working_time_accounting_system.task')),
+                ('rate_seconds', models.BigIntegerField()),
+                ('refreshed_at', models.DateTimeField()),
+            ],
+            options={
+                'db_table': 'report_task_cost',
+                'managed': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='ReportTaskHours',
+            fields=[
+                ('task', models.OneToOneField(on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='+', serialize=False, to='working_time_accounting_system.task')),
+                ('seconds', models.BigIntegerField()),
+                ('refreshed_at', models.DateTimeField()),
+            ],
+            options={
+                'db_table': 'report_task_hours',
+                'managed': False,
+            },
+        ),
+    ]
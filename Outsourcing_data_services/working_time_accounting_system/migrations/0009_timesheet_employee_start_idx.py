@@ -0,0 +1,17 @@
+# Generated by Django 4.2.5 on 2026-10-18 07:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('working_time_accounting_system', '0008_report_materialized_views'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='timesheet',
+            index=models.Index(fields=['employee', 'start_time', 'id'], name='timesheet_employee_start_idx'),
+        ),
+    ]
@@ -0,0 +1,95 @@
+# Generated by Django 4.2.5 on 2026-10-18 07:13
+
+from django.db import migrations, models
+import django.utils.timezone
+from working_time_accounting_system.partitions import MonthlyPartitions
+
+
+def history_table(apps, schema_editor):
+    return apps.get_model('working_time_accounting_system', 'TimesheetHistory')._meta.db_table
+
+
+def partition_history(apps, schema_editor):
+    """Пересоздает архив как таблицу, секционированную по месяцам start_time. У секционированной
+    таблицы первичный ключ обязан включать ключ секционирования, поэтому он становится (id, start_time);
+    id берется из собственной последовательности, продолжающей нумерацию старой таблицы."""
+    table = history_table(apps, schema_editor)
+    quote = schema_editor.quote_name
+    schema_editor.execute(f"ALTER TABLE {quote(table)} RENAME TO {quote(table + '_old')}")
+    schema_editor.execute(f"ALTER TABLE {quote(table + '_old')} ALTER COLUMN id DROP IDENTITY IF EXISTS")
+    schema_editor.execute(f"CREATE SEQUENCE {quote(table + '_id_seq')}")
+    schema_editor.execute(
+        f"CREATE TABLE {quote(table)} ("
+        f"id bigint NOT NULL DEFAULT nextval('{table}_id_seq'), "
+        f"employee_id integer NOT NULL, "
+        f"task_title varchar(300) NOT NULL, "
+        f"start_time timestamp with time zone NOT NULL, "
+        f"end_time timestamp with time zone NOT NULL, "
+        f"deleted_at timestamp with time zone NOT NULL DEFAULT now(), "
+        f"PRIMARY KEY (id, start_time)"
+        f") PARTITION BY RANGE (start_time)"
+    )
+    schema_editor.execute(f"ALTER SEQUENCE {quote(table + '_id_seq')} OWNED BY {quote(table)}.id")
+    schema_editor.execute(f"CREATE TABLE {quote(table + '_default')} PARTITION OF {quote(table)} DEFAULT")
+    schema_editor.execute(
+        f"CREATE INDEX history_employee_start_idx ON {quote(table)} (employee_id, start_time)"
+    )
+    schema_editor.execute(
+        f"INSERT INTO {quote(table)} (id, employee_id, task_title, start_time, end_time) "
+        f"SELECT id, employee_id, task_title, start_time, end_time FROM {quote(table + '_old')}"
+    )
+    schema_editor.execute(
+        f"SELECT setval('{table}_id_seq', coalesce((SELECT max(id) FROM {quote(table)}), 0) + 1, false)"
+    )
+    schema_editor.execute(f"DROP TABLE {quote(table + '_old')}")
+    MonthlyPartitions(table).split_default()
+
+
+def unpartition_history(apps, schema_editor):
+    table = history_table(apps, schema_editor)
+    quote = schema_editor.quote_name
+    schema_editor.execute(f"ALTER TABLE {quote(table)} RENAME TO {quote(table + '_partitioned')}")
+    schema_editor.execute(
+        f"CREATE TABLE {quote(table)} ("
+        f"id bigint NOT NULL PRIMARY KEY GENERATED BY DEFAULT AS IDENTITY, "
+        f"employee_id integer NOT NULL, "
+        f"task_title varchar(300) NOT NULL, "
+        f"start_time timestamp with time zone NOT NULL, "
+        f"end_time timestamp with time zone NOT NULL"
+        f")"
+    )
+    schema_editor.execute(
+        f"INSERT INTO {quote(table)} (id, employee_id, task_title, start_time, end_time) "
+        f"SELECT id, employee_id, task_title, start_time, end_time FROM {quote(table + '_partitioned')}"
+    )
+    schema_editor.execute(
+        f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+        f"coalesce((SELECT max(id) FROM {quote(table)}), 0) + 1, false)"
+    )
+    schema_editor.execute(f"DROP TABLE {quote(table + '_partitioned')} CASCADE")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('working_time_accounting_system', '0009_timesheet_employee_start_idx'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunPython(partition_history, unpartition_history),
+            ],
+            state_operations=[
+                migrations.AddField(
+                    model_name='timesheethistory',
+                    name='deleted_at',
+                    field=models.DateTimeField(default=django.utils.timezone.now),
+                ),
+                migrations.AddIndex(
+                    model_name='timesheethistory',
+                    index=models.Index(fields=['employee_id', 'start_time'], name='history_employee_start_idx'),
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,125 @@
+# Generated by Django 4.2.5 on 2026-10-18 07:15
+
+from django.db import migrations
+from working_time_accounting_system.partitions import MonthlyPartitions, TIMESHEET_PARTITION_SQL
+
+EMPLOYEE_INDEX = 'working_time_accounting_system_timesheet_employee_id_b417605f'
+TASK_INDEX = 'working_time_accounting_system_timesheet_task_id_64d728fb'
+EMPLOYEE_FK = 'working_time_account_employee_id_b417605f_fk_working_t'
+TASK_FK = 'working_time_account_task_id_64d728fb_fk_working_t'
+
+
+def tables(apps, schema_editor):
+    return {
+        name: apps.get_model('working_time_accounting_system', name)._meta.db_table
+        for name in ('Timesheet', 'Employee', 'Task')
+    }
+
+
+def add_constraints(schema_editor, table, employee_table, task_table):
+    quote = schema_editor.quote_name
+    schema_editor.execute(
+        f"ALTER TABLE {quote(table)} ADD CONSTRAINT unique_timesheet_entry "
+        f"UNIQUE (employee_id, task_id, start_time, end_time)"
+    )
+    schema_editor.execute(f"CREATE INDEX timesheet_employee_start_idx ON {quote(table)} (employee_id, start_time, id)")
+    schema_editor.execute(f"CREATE INDEX {EMPLOYEE_INDEX} ON {quote(table)} (employee_id)")
+    schema_editor.execute(f"CREATE INDEX {TASK_INDEX} ON {quote(table)} (task_id)")
+    schema_editor.execute(
+        f"ALTER TABLE {quote(table)} ADD CONSTRAINT {EMPLOYEE_FK} FOREIGN KEY (employee_id) "
+        f"REFERENCES {quote(employee_table)} (id) DEFERRABLE INITIALLY DEFERRED"
+    )
+    schema_editor.execute(
+        f"ALTER TABLE {quote(table)} ADD CONSTRAINT {TASK_FK} FOREIGN KEY (task_id) "
+        f"REFERENCES {quote(task_table)} (id) DEFERRABLE INITIALLY DEFERRED"
+    )
+
+
+def partition_timesheets(apps, schema_editor):
+    """Пересоздает таблицу таймшитов секционированной по месяцам start_time. Первичный ключ
+    становится (id, start_time), ограничение exclude_overlapping_timesheets заменяется
+    ограничениями <секция>_no_overlap в каждой секции (см. Timesheet.save)."""
+    names = tables(apps, schema_editor)
+    table = names['Timesheet']
+    quote = schema_editor.quote_name
+    schema_editor.execute(f"ALTER TABLE {quote(table)} RENAME TO {quote(table + '_old')}")
+    schema_editor.execute(f"ALTER TABLE {quote(table + '_old')} ALTER COLUMN id DROP IDENTITY IF EXISTS")
+    schema_editor.execute(f"CREATE SEQUENCE {quote(table + '_id_seq')}")
+    schema_editor.execute(
+        f"CREATE TABLE {quote(table)} ("
+        f"id bigint NOT NULL DEFAULT nextval('{table}_id_seq'), "
+        f"start_time timestamp with time zone NOT NULL, "
+        f"end_time timestamp with time zone NOT NULL, "
+        f"employee_id bigint NOT NULL, "
+        f"task_id bigint NOT NULL"
+        f") PARTITION BY RANGE (start_time)"
+    )
+    schema_editor.execute(f"ALTER SEQUENCE {quote(table + '_id_seq')} OWNED BY {quote(table)}.id")
+    schema_editor.execute(f"CREATE TABLE {quote(table + '_default')} PARTITION OF {quote(table)} DEFAULT")
+    schema_editor.execute(
+        f"INSERT INTO {quote(table)} (id, start_time, end_time, employee_id, task_id) "
+        f"SELECT id, start_time, end_time, employee_id, task_id FROM {quote(table + '_old')}"
+    )
+    schema_editor.execute(
+        f"SELECT setval('{table}_id_seq', coalesce((SELECT max(id) FROM {quote(table)}), 0) + 1, false)"
+    )
+    # имена ограничений и индексов освобождаются вместе со старой таблицей
+    schema_editor.execute(f"DROP TABLE {quote(table + '_old')}")
+    schema_editor.execute(f"ALTER TABLE {quote(table)} ADD PRIMARY KEY (id, start_time)")
+    add_constraints(schema_editor, table, names['Employee'], names['Task'])
+    for sql in TIMESHEET_PARTITION_SQL:
+        schema_editor.execute(sql.format(partition=quote(table + '_default'), name=table + '_default'))
+    MonthlyPartitions(table, partition_sql=TIMESHEET_PARTITION_SQL).split_default()
+
+
+def unpartition_timesheets(apps, schema_editor):
+    names = tables(apps, schema_editor)
+    table = names['Timesheet']
+    quote = schema_editor.quote_name
+    schema_editor.execute(f"ALTER TABLE {quote(table)} RENAME TO {quote(table + '_partitioned')}")
+    schema_editor.execute(
+        f"CREATE TABLE {quote(table + '_plain')} ("
+        f"id bigint NOT NULL PRIMARY KEY GENERATED BY DEFAULT AS IDENTITY, "
+        f"start_time timestamp with time zone NOT NULL, "
+        f"end_time timestamp with time zone NOT NULL, "
+        f"employee_id bigint NOT NULL, "
+        f"task_id bigint NOT NULL"
+        f")"
+    )
+    schema_editor.execute(
+        f"INSERT INTO {quote(table + '_plain')} (id, start_time, end_time, employee_id, task_id) "
+        f"SELECT id, start_time, end_time, employee_id, task_id FROM {quote(table + '_partitioned')}"
+    )
+    schema_editor.execute(f"DROP TABLE {quote(table + '_partitioned')} CASCADE")
+    schema_editor.execute(f"ALTER TABLE {quote(table + '_plain')} RENAME TO {quote(table)}")
+    schema_editor.execute(f"ALTER INDEX {quote(table + '_plain_pkey')} RENAME TO {quote(table + '_pkey')}")
+    schema_editor.execute(
+        f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+        f"coalesce((SELECT max(id) FROM {quote(table)}), 0) + 1, false)"
+    )
+    add_constraints(schema_editor, table, names['Employee'], names['Task'])
+    schema_editor.execute(
+        f"ALTER TABLE {quote(table)} ADD CONSTRAINT exclude_overlapping_timesheets "
+        f"EXCLUDE USING gist (tstzrange(start_time, end_time, '[)') WITH &&, employee_id WITH =)"
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('working_time_accounting_system', '0010_partition_timesheethistory'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunPython(partition_timesheets, unpartition_timesheets),
+            ],
+            state_operations=[
+                migrations.RemoveConstraint(
+                    model_name='timesheet',
+                    name='exclude_overlapping_timesheets',
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 4.2.5 on 2026-10-18 07:32
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('working_time_accounting_system', '0011_partition_timesheet'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importjob',
+            name='incremental',
+            field=models.BooleanField(default=True),
+        ),
+        migrations.CreateModel(
+            name='ImportManifest',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('importer', models.CharField(max_length=10)),
+                ('content_hash', models.CharField(max_length=64)),
+                ('size', models.PositiveBigIntegerField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('completed_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Импортированный файл',
+                'verbose_name_plural': 'Импортированные файлы',
+                'indexes': [models.Index(fields=['importer', 'content_hash'], name='manifest_importer_hash_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ImportedRow',
+            fields=[
+                ('fingerprint', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('manifest', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rows', to='working_time_accounting_system.importmanifest')),
+            ],
+            options={
+                'verbose_name': 'Отпечаток строки импорта',
+                'verbose_name_plural': 'Отпечатки строк импорта',
+            },
+        ),
+    ]
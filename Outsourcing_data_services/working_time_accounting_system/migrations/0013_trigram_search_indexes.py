@@ -0,0 +1,30 @@
+# Generated by Django 4.2.5 on 2026-10-18 07:40
+
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations, models
+import django.db.models.functions.comparison
+import django.db.models.functions.text
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('working_time_accounting_system', '0012_importmanifest'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddIndex(
+            model_name='employee',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper(django.db.models.functions.comparison.Cast('employee_name', models.TextField())), name='gin_trgm_ops'), name='employee_name_trgm_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper(django.db.models.functions.comparison.Cast('task_name', models.TextField())), name='gin_trgm_ops'), name='task_name_trgm_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='timesheethistory',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper(django.db.models.functions.comparison.Cast('task_title', models.TextField())), name='gin_trgm_ops'), name='history_task_title_trgm_idx'),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 4.2.5 on 2026-10-18 07:42
+
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+import django.db.models.functions.comparison
+import django.db.models.functions.text
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('working_time_accounting_system', '0013_trigram_search_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='employee',
+            index=models.Index(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper(django.db.models.functions.comparison.Cast('employee_name', models.TextField())), name='text_pattern_ops'), name='employee_name_prefix_idx'),
+        ),
+    ]
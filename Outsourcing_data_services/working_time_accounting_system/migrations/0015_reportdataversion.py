@@ -0,0 +1,28 @@
+# Generated by Django 4.2.5 on 2026-10-18 07:57
+
+import time
+from django.db import migrations, models
+
+
+def create_version(apps, schema_editor):
+    # начальная версия — текущее время: ключи кэша, созданные с версией из файлового кэша, не совпадут
+    ReportDataVersion = apps.get_model('working_time_accounting_system', 'ReportDataVersion')
+    ReportDataVersion.objects.create(pk=1, version=time.time_ns())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('working_time_accounting_system', '0014_employee_name_prefix_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReportDataVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(create_version, migrations.RunPython.noop),
+    ]
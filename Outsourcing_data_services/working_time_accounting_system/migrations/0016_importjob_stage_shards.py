@@ -0,0 +1,23 @@
+# Generated by Django 4.2.5 on 2026-10-18 08:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('working_time_accounting_system', '0015_reportdataversion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importjob',
+            name='stage_shards',
+            field=models.JSONField(default=list),
+        ),
+        migrations.AddField(
+            model_name='importjob',
+            name='stage_workers',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+    ]
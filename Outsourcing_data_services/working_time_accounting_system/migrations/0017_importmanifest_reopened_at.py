@@ -0,0 +1,18 @@
+# Generated by Django 4.2.5 on 2026-10-18 08:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('working_time_accounting_system', '0016_importjob_stage_shards'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importmanifest',
+            name='reopened_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
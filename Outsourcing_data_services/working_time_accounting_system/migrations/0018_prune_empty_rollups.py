@@ -0,0 +1,16 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    """Удаляет строки сводки, обнулившиеся до того, как вычитание стало удалять их (rollups.prune_rollups)."""
+
+    dependencies = [
+        ('working_time_accounting_system', '0017_importmanifest_reopened_at'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            "DELETE FROM working_time_accounting_system_timesheetrollup WHERE seconds = 0",
+            migrations.RunSQL.noop,
+        ),
+    ]
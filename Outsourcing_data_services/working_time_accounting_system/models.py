@@ -1,7 +1,19 @@
+from datetime import datetime, time, timedelta
+from django.contrib.postgres.fields import DateTimeRangeField
+from django.contrib.postgres.indexes import GinIndex, OpClass
 from django.core.validators import MaxValueValidator, MinValueValidator, ValidationError
-from django.db import models
-from django.db.models.signals import pre_delete
+from django.db import connection, connections, models, transaction, IntegrityError
+from django.db.models.functions import Cast, Upper
+from django.db.models.signals import pre_delete, pre_save, post_save, post_delete
 from django.dispatch import receiver
+from django.utils import timezone
+from .report_cache import invalidate_reports
+
+
+def trigram_index(field, name):
+    """GIN-индекс pg_trgm (миграция 0013) для поиска подстроки в админке. Поиск icontains в PostgreSQL
+    выполняется как UPPER(<поле>::text) LIKE UPPER('%...%'), поэтому индекс строится по тому же выражению."""
+    return GinIndex(OpClass(Upper(Cast(field, models.TextField())), name='gin_trgm_ops'), name=name)
 
 
 class Position(models.Model):
@@ -13,7 +25,8 @@ class Position(models.Model):
 
     class Meta:
         constraints = [
-            models.CheckConstraint(check=models.Q(hourly_rate__lte=100), name='max_rate')
+            models.CheckConstraint(check=models.Q(hourly_rate__lte=100), name='max_rate'),
+            models.UniqueConstraint(fields=['position_name'], name='unique_position_name'),
         ]
         verbose_name = 'Должность'
         verbose_name_plural = 'Должности'
@@ -30,88 +43,514 @@ class Employee(models.Model):
         return self.employee_name
 
     class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['employee_name'], name='unique_employee_name'),
+        ]
+        indexes = [
+            trigram_index('employee_name', 'employee_name_trgm_idx'),
+            # поиск по началу имени (istartswith) в автодополнении, см. autocomplete
+            models.Index(
+                OpClass(Upper(Cast('employee_name', models.TextField())), name='text_pattern_ops'),
+                name='employee_name_prefix_idx',
+            ),
+        ]
         verbose_name = 'Сотрудник'
         verbose_name_plural = 'Сотрудники'
 
 
+def count_archived(deleted, archived):
+    """Добавляет архивированные таймшиты к результату delete() в формате (всего, {модель: число})."""
+    total, counts = deleted
+    if archived:
+        counts[Timesheet._meta.label] = archived
+    return total + archived, counts
+
+
+class TaskQuerySet(models.QuerySet):
+    def delete(self):
+        """Таймшиты удаляемых задач сначала архивируются одним запросом (Timesheet.archive_and_delete),
+        иначе каскадное удаление загрузило бы и обработало сигналами каждый таймшит отдельно."""
+        with transaction.atomic():
+            archived = Timesheet.objects.filter(task__in=self.values('pk')).archive_and_delete()
+            return count_archived(super().delete(), archived)
+
+    delete.alters_data = True
+    delete.queryset_only = True
+
+
 class Task(models.Model):
     task_name = models.CharField(max_length=300)
 
+    objects = TaskQuerySet.as_manager()
+
     def __str__(self):
         return self.task_name
 
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            archived = Timesheet.objects.filter(task_id=self.pk).archive_and_delete()
+            return count_archived(super().delete(*args, **kwargs), archived)
+
     class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['task_name'], name='unique_task_name'),
+        ]
+        indexes = [
+            trigram_index('task_name', 'task_name_trgm_idx'),
+        ]
         verbose_name = 'Задача'
         verbose_name_plural = 'Задачи'
 
 
+# используется в миграции 0006; ограничения исключения по секциям создаются в SQL (миграция 0011)
+class TsTzRange(models.Func):
+    function = 'TSTZRANGE'
+    output_field = DateTimeRangeField()
+
+
+class TimesheetQuerySet(models.QuerySet):
+    def for_period(self, date_from=None, date_to=None):
+        """Таймшиты, начавшиеся в указанные дни (включительно) по TIME_ZONE проекта.
+        Сравнение идет по самому start_time, а не по start_time::date, поэтому работают индексы."""
+        timesheets = self
+        if date_from:
+            timesheets = timesheets.filter(start_time__gte=start_of_day(date_from))
+        if date_to:
+            timesheets = timesheets.filter(start_time__lt=start_of_day(date_to + timedelta(days=1)))
+        return timesheets
+
+    def archive_and_delete(self):
+        """Удаляет таймшиты одним запросом: CTE deleted удаляет строки, archived переносит их
+        в TimesheetHistory через INSERT ... SELECT с названием задачи, rollups вычитает их из
+        сводной таблицы, а обнулившиеся строки сводки удаляются следующим запросом (prune_rollups).
+        Все шаги выполняются в одной транзакции и не загружают строки в Python.
+        Завершенные импорты таймшитов открываются заново (ImportManifest.reopen), чтобы повторная
+        загрузка файла вернула удаленные строки. Возвращает число удаленных таймшитов."""
+        from .rollups import rollup_upsert_sql, rollup_upsert_params, prune_rollups, table
+        subquery, params = self.order_by().values('pk').query.sql_with_params()
+        sql = (
+            f"WITH deleted AS ("
+            f"DELETE FROM {table(Timesheet)} WHERE id IN ({subquery}) "
+            f"RETURNING employee_id, task_id, start_time, end_time"
+            f"), archived AS ("
+            f"INSERT INTO {table(TimesheetHistory)} (employee_id, task_title, start_time, end_time, deleted_at) "
+            f"SELECT d.employee_id, k.task_name, d.start_time, d.end_time, now() "
+            f"FROM deleted d JOIN {table(Task)} k ON k.id = d.task_id"
+            f"), rollups AS ({rollup_upsert_sql('deleted', returning=True)}) "
+            f"SELECT (SELECT count(*) FROM deleted), ARRAY(SELECT id FROM rollups WHERE seconds = 0)"
+        )
+        with transaction.atomic(using=self.db), connections[self.db].cursor() as cursor:
+            cursor.execute(sql, list(params) + rollup_upsert_params(sign=-1))
+            deleted, emptied = cursor.fetchone()
+            prune_rollups(cursor, emptied)
+            if deleted:
+                invalidate_reports()
+                ImportManifest.reopen('timesheets')
+        return deleted
+
+    archive_and_delete.alters_data = True
+    archive_and_delete.queryset_only = True
+
+    def delete(self):
+        """Удаление через QuerySet (в том числе массовое удаление в админке) идет по пути archive_and_delete."""
+        deleted = self.archive_and_delete()
+        return deleted, {self.model._meta.label: deleted}
+
+    delete.alters_data = True
+    delete.queryset_only = True
+
+
+def start_of_day(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
 class Timesheet(models.Model):
     employee = models.ForeignKey(Employee, on_delete=models.PROTECT, related_name='timesheets')
     task = models.ForeignKey(Task, on_delete=models.CASCADE, related_name='timesheets')
     start_time = models.DateTimeField()
     end_time = models.DateTimeField()
 
+    objects = TimesheetQuerySet.as_manager()
+
     def __str__(self):
         return f"{self.employee}: {self.task}"
 
+    def delete(self, *args, **kwargs):
+        return Timesheet.objects.filter(pk=self.pk).delete()
+
     def save(self, *args, **kwargs):
-        """Метод проверяет пересечение временных рядов для данного таймшита,
-        используя start_time, end_time, и employee текущего таймшита.
-        Метод filter фильтрует все таймшиты сотрудника,
-        для которого временной ряд пересекается с текущим таймшитом.
-        Если мы обновляем уже существующую запись, проверка сначала исключает этот таймшит из рассмотрения,
-        чтобы он не сравнивался сам с собой и не вызывал ложные сообщения об ошибках.
-        Если существует хотя бы один таймшит, нарушающий условия, вызывается исключение ValidationError
-        с соответствующим сообщением. Переопределяем метод save, чтобы перед сохранением записи
-        (созданием или обновлением) вызывался наш пользовательский валидатор.
-        Это гарантирует, что для каждого таймшита будет выполнена проверка пересечения временных рядов перед
-         сохранением в базе данных."""
+        """Таблица секционирована по месяцам start_time (миграция 0011), и ограничение исключения
+        <секция>_no_overlap (GiST индекс по employee и tstzrange(start_time, end_time)) действует
+        внутри каждой секции. Таймшит, переходящий через границу месяца, может пересечься с записью
+        соседней секции, поэтому перед записью пересечения проверяются запросом под транзакционной
+        блокировкой сотрудника (lock_employees) — ее же берут импортеры, так что конкурентные записи
+        одного сотрудника выполняются по очереди. Запросы с ограничением по start_time читают только
+        нужные секции. Если база все же отклоняет запись, IntegrityError тоже переводится
+        в ValidationError с пересекающимся таймшитом в сообщении.
+        Запись и обновление сводной таблицы TimesheetRollup (сигналы pre_save/post_save)
+        выполняются в одной транзакции."""
 
         if self.start_time >= self.end_time:
             raise ValidationError('Время окончания работы должно быть позже времени начала')
 
-        overlapping_timesheets = Timesheet.objects.filter(
-            employee=self.employee,
+        try:
+            # внутри внешней транзакции atomic создает точку сохранения,
+            # поэтому внешняя транзакция остается рабочей после ошибки
+            with transaction.atomic():
+                Timesheet.lock_employees([self.employee_id])
+                if not self.overlapping_timesheets().exists():
+                    super().save(*args, **kwargs)
+                    return
+        except IntegrityError as e:
+            constraint_name = getattr(getattr(e.__cause__, 'diag', None), 'constraint_name', None) or ''
+            if not constraint_name.endswith(self.OVERLAP_CONSTRAINT_SUFFIX):
+                raise
+        raise ValidationError(
+            f"Сотрудник не может работать над двумя задачами одновременно. "
+            f"Найден пересекающийся таймшит: {self.overlapping_timesheets().first()}"
+        )
+
+    def overlapping_timesheets(self):
+        timesheets = Timesheet.objects.filter(
+            employee_id=self.employee_id,
             start_time__lt=self.end_time,
             end_time__gt=self.start_time
         )
-
         if self.pk:
             # исключаем текущий таймшит из проверки, так как он уже существует, и мы его обновляем
-            overlapping_timesheets = overlapping_timesheets.exclude(pk=self.pk)
+            timesheets = timesheets.exclude(pk=self.pk)
+        return timesheets
 
-        if overlapping_timesheets.exists():
-            raise ValidationError(
-                f"Сотрудник не может работать над двумя задачами одновременно. "
-                f"Найден пересекающийся таймшит: {overlapping_timesheets.first()}"
+    @classmethod
+    def lock_employees(cls, employee_ids):
+        """Берет транзакционные advisory-блокировки сотрудников до конца текущей транзакции.
+        Блокировки берутся в порядке id, поэтому параллельные пакеты не блокируют друг друга взаимно."""
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT pg_advisory_xact_lock(%s, id) FROM unnest(%s::integer[]) AS id",
+                [cls.OVERLAP_LOCK_NAMESPACE, sorted(set(employee_ids))],
             )
 
-        super().save(*args, **kwargs)
+    # имя ограничения исключения в секции: <секция>_no_overlap
+    OVERLAP_CONSTRAINT_SUFFIX = '_no_overlap'
+    # пространство ключей pg_advisory_xact_lock для записи таймшитов сотрудника
+    OVERLAP_LOCK_NAMESPACE = 4211
 
     class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['employee', 'task', 'start_time', 'end_time'], name='unique_timesheet_entry'
+            ),
+        ]
+        indexes = [
+            # постраничный вывод таймшитов сотрудника по ключу (start_time, id)
+            models.Index(fields=['employee', 'start_time', 'id'], name='timesheet_employee_start_idx'),
+        ]
         verbose_name = 'Таймшит'
         verbose_name_plural = 'Таймшиты'
         ordering = ['employee']
 
 
 class TimesheetHistory(models.Model):
+    """Архив удаленных таймшитов. В PostgreSQL таблица секционирована по месяцам start_time
+    (миграция 0010, см. partitions.MonthlyPartitions), поэтому запросы с периодом читают только
+    нужные секции, а старые секции удаляются целиком (manage.py prune_timesheet_history).
+    Первичный ключ секционированной таблицы — (id, start_time); id по-прежнему уникален."""
+
     employee_id = models.IntegerField()
     task_title = models.CharField(max_length=300)
     start_time = models.DateTimeField()
     end_time = models.DateTimeField()
+    deleted_at = models.DateTimeField(default=timezone.now)
 
     def __str__(self):
         return f"{self.employee_id}: {self.task_title}"
 
     class Meta:
+        indexes = [
+            models.Index(fields=['employee_id', 'start_time'], name='history_employee_start_idx'),
+            trigram_index('task_title', 'history_task_title_trgm_idx'),
+        ]
         verbose_name = 'История удаления таймшитов'
         verbose_name_plural = 'Истории удаления таймшитов'
 
 
+class ImportJob(models.Model):
+    """Фоновый импорт трех CSV файлов. Файлы сохраняются на диск, а обработчик
+    (manage.py run_import_worker) фиксирует их пакетами и после каждого пакета сохраняет прогресс:
+    stage и stage_rows указывают, с какой строки продолжить импорт после сбоя. Параллельный импорт
+    таймшитов сохраняет прогресс после каждой части: stage_shards — номера загруженных частей
+    при делении на stage_workers частей, и после сбоя загружаются только остальные.
+    При incremental уже импортированные файлы и строки пропускаются (см. ImportManifest)."""
+
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (PENDING, 'В очереди'),
+        (RUNNING, 'Выполняется'),
+        (DONE, 'Завершен'),
+        (FAILED, 'Ошибка'),
+    ]
+    STAGES = ['positions', 'employees', 'timesheets']
+    MAX_STORED_ERRORS = 1000
+
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    fast_import = models.BooleanField(default=False)
+    incremental = models.BooleanField(default=True)
+    positions_file = models.FileField(upload_to='imports/%Y/%m/%d/')
+    employees_file = models.FileField(upload_to='imports/%Y/%m/%d/')
+    timesheets_file = models.FileField(upload_to='imports/%Y/%m/%d/')
+    stage = models.CharField(max_length=10, default=STAGES[0])
+    stage_rows = models.PositiveBigIntegerField(default=0)
+    stage_workers = models.PositiveSmallIntegerField(default=0)
+    stage_shards = models.JSONField(default=list)
+    rows_processed = models.PositiveBigIntegerField(default=0)
+    position_count = models.PositiveIntegerField(default=0)
+    employee_count = models.PositiveIntegerField(default=0)
+    timesheet_count = models.PositiveIntegerField(default=0)
+    error_count = models.PositiveIntegerField(default=0)
+    errors = models.JSONField(default=list)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Import #{self.pk} ({self.status})"
+
+    @property
+    def rows_per_second(self):
+        if not self.started_at:
+            return 0
+        elapsed = ((self.finished_at or self.updated_at) - self.started_at).total_seconds()
+        return round(self.rows_processed / elapsed, 1) if elapsed > 0 else 0
+
+    def add_errors(self, errors):
+        self.error_count += len(errors)
+        self.errors += errors[:self.MAX_STORED_ERRORS - len(self.errors)]
+
+    def progress(self):
+        return {
+            'id': self.pk,
+            'status': self.status,
+            'stage': self.stage,
+            'rows_processed': self.rows_processed,
+            'rows_per_second': self.rows_per_second,
+            'position_count': self.position_count,
+            'employee_count': self.employee_count,
+            'timesheet_count': self.timesheet_count,
+            'error_count': self.error_count,
+            'errors': self.errors,
+        }
+
+    class Meta:
+        verbose_name = 'Импорт данных'
+        verbose_name_plural = 'Импорты данных'
+        indexes = [
+            models.Index(fields=['status', 'updated_at'], name='importjob_status_idx'),
+        ]
+
+
+class ImportManifest(models.Model):
+    """Загруженный файл построчного импорта: хэш содержимого (sha256) и время завершения импорта.
+    Повторная загрузка файла с тем же хэшем после завершенного импорта ничего не делает,
+    а строки измененного файла сверяются с отпечатками ImportedRow (см. manifests).
+    После изменения или удаления записей файлы импортеров открываются заново (reopen, reopened_at):
+    повторная загрузка файла проверяет строки, а отпечатки таких файлов сверяются с базой — строки,
+    записей которых больше нет, загружаются снова. Пока записи не менялись, известные отпечатки
+    пропускаются без запросов к данным."""
+
+    importer = models.CharField(max_length=10)
+    content_hash = models.CharField(max_length=64)
+    size = models.PositiveBigIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+    # время последнего удаления записей импортера после того, как строки файла были сверены с базой
+    reopened_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.importer} {self.content_hash[:12]}"
+
+    @classmethod
+    def reopen(cls, *importers):
+        """Файлы импортеров (CsvImporter.name) снова считаются незавершенными, а их отпечатки —
+        требующими проверки, пока файл не будет загружен заново (см. manifests.complete_manifest)."""
+        cls.objects.filter(importer__in=importers).update(completed_at=None, reopened_at=timezone.now())
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['importer', 'content_hash'], name='manifest_importer_hash_idx'),
+        ]
+        verbose_name = 'Импортированный файл'
+        verbose_name_plural = 'Импортированные файлы'
+
+
+class ImportedRow(models.Model):
+    """Отпечаток импортированной строки: первые 8 байт blake2b от имени импортера и полей строки.
+    Хранятся для созданных и пропущенных как дубликаты строк; строки с ошибками при следующем
+    импорте проверяются заново. Отпечаток файла, открытого заново после удаления записей
+    (ImportManifest.reopened_at), не пропускает строку, пока ее запись не найдена в базе
+    (см. CsvImporter.missing_rows); проверенный отпечаток переходит к текущему файлу. Удаление файла из ImportManifest
+    удаляет его отпечатки."""
+
+    fingerprint = models.BigIntegerField(primary_key=True)
+    manifest = models.ForeignKey(ImportManifest, on_delete=models.CASCADE, related_name='rows')
+
+    class Meta:
+        verbose_name = 'Отпечаток строки импорта'
+        verbose_name_plural = 'Отпечатки строк импорта'
+
+
+class TimesheetRollup(models.Model):
+    """Сводка для отчетов: сколько секунд сотрудник потратил на задачу за день. День определяется
+    по дате начала таймшита в TIME_ZONE проекта. rate_seconds — сумма секунд, умноженных на часовую
+    ставку, стоимость равна rate_seconds / 3600; целое значение не накапливает ошибок округления
+    при инкрементальном обновлении. Таблица поддерживается сигналами таймшитов и импортерами,
+    полный пересчет — manage.py rebuild_rollups."""
+
+    day = models.DateField()
+    employee = models.ForeignKey(Employee, on_delete=models.CASCADE, related_name='rollups')
+    task = models.ForeignKey(Task, on_delete=models.CASCADE, related_name='rollups')
+    seconds = models.BigIntegerField(default=0)
+    rate_seconds = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.day} {self.employee_id}: {self.task_id}"
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'employee', 'task'], name='unique_rollup_day_employee_task'),
+        ]
+        verbose_name = 'Сводка по дням'
+        verbose_name_plural = 'Сводки по дням'
+
+
+class ReportDataVersion(models.Model):
+    """Версия данных отчетов — одна строка (pk=ROW), номер которой входит в ключи кэша отчетов
+    (см. report_cache). Сдвигается после фиксации каждого изменения таймшитов. Хранится в базе,
+    а не в кэше: инкремент выполняется одним UPDATE и не теряется при параллельных импортах."""
+
+    ROW = 1
+
+    version = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return str(self.version)
+
+
+class ReportTaskHours(models.Model):
+    """Материализованное представление: часы по задачам за все время (миграция 0008).
+    Обновляется manage.py refresh_report_views, refreshed_at — время последнего обновления."""
+
+    task = models.OneToOneField(Task, on_delete=models.DO_NOTHING, primary_key=True, related_name='+')
+    seconds = models.BigIntegerField()
+    refreshed_at = models.DateTimeField()
+
+    class Meta:
+        managed = False
+        db_table = 'report_task_hours'
+
+
+class ReportTaskCost(models.Model):
+    task = models.OneToOneField(Task, on_delete=models.DO_NOTHING, primary_key=True, related_name='+')
+    rate_seconds = models.BigIntegerField()
+    refreshed_at = models.DateTimeField()
+
+    class Meta:
+        managed = False
+        db_table = 'report_task_cost'
+
+
+class ReportEmployeeHours(models.Model):
+    employee = models.OneToOneField(Employee, on_delete=models.DO_NOTHING, primary_key=True, related_name='+')
+    seconds = models.BigIntegerField()
+    refreshed_at = models.DateTimeField()
+
+    class Meta:
+        managed = False
+        db_table = 'report_employee_hours'
+
+
+@receiver(pre_save, sender=Timesheet)
+def timesheet_rollup_pre_save(sender, instance, **kwargs):
+    from .rollups import apply_to_rollups
+    if not instance._state.adding and instance.pk:
+        # вычитаем старую версию таймшита, новая будет добавлена в post_save
+        apply_to_rollups(Timesheet.objects.filter(pk=instance.pk), sign=-1)
+
+
+@receiver(post_save, sender=Timesheet)
+def timesheet_rollup_post_save(sender, instance, **kwargs):
+    from .rollups import apply_to_rollups
+    apply_to_rollups(Timesheet.objects.filter(pk=instance.pk))
+
+
+@receiver(pre_delete, sender=Timesheet)
+def timesheet_rollup_pre_delete(sender, instance, **kwargs):
+    from .rollups import apply_to_rollups
+    apply_to_rollups(Timesheet.objects.filter(pk=instance.pk), sign=-1)
+
+
+@receiver(post_save, sender=Position)
+def position_rollup_post_save(sender, instance, created, **kwargs):
+    from .rollups import rebuild_rollups
+    if not created:
+        # стоимость в сводке рассчитана по ставке на момент записи
+        rebuild_rollups(Employee.objects.filter(position=instance).values('pk'))
+
+
+@receiver(post_save, sender=Employee)
+def employee_rollup_post_save(sender, instance, created, **kwargs):
+    from .rollups import rebuild_rollups
+    if not created:
+        rebuild_rollups([instance.pk])
+
+
+@receiver(post_save, sender=Timesheet)
+@receiver(post_delete, sender=Timesheet)
+@receiver(post_save, sender=Position)
+@receiver(post_delete, sender=Position)
+@receiver(post_save, sender=Employee)
+@receiver(post_delete, sender=Employee)
+@receiver(post_save, sender=Task)
+@receiver(post_delete, sender=Task)
+def report_cache_invalidation(sender, **kwargs):
+    # удаление таймшита через timesheet_delete_trigger тоже приходит сюда по post_delete
+    invalidate_reports()
+
+
+# импортеры, строки которых описывают записи модели: изменение или удаление записи открывает их файлы заново
+REOPENED_IMPORTERS = {
+    Position: ('positions', 'employees'),
+    Employee: ('employees', 'timesheets'),
+    Task: ('timesheets',),
+    Timesheet: ('timesheets',),
+}
+
+
+@receiver(post_save, sender=Position)
+@receiver(post_delete, sender=Position)
+@receiver(post_save, sender=Employee)
+@receiver(post_delete, sender=Employee)
+@receiver(post_save, sender=Task)
+@receiver(post_delete, sender=Task)
+@receiver(post_save, sender=Timesheet)
+@receiver(post_delete, sender=Timesheet)
+def import_manifest_reopen(sender, created=False, **kwargs):
+    # импорт создает записи через bulk_create без сигналов; удаление таймшитов через QuerySet
+    # приходит не сюда, а в archive_and_delete
+    if not created:
+        ImportManifest.reopen(*REOPENED_IMPORTERS[sender])
+
+
 @receiver(pre_delete, sender=Timesheet)
 def timesheet_delete_trigger(sender, instance, **kwargs):
+    # Timesheet.delete, QuerySet.delete и удаление задач архивируют таймшиты в archive_and_delete;
+    # сюда попадают только удаления через Collector в обход этих путей
     TimesheetHistory.objects.create(
-        employee_id=instance.employee.id,
+        employee_id=instance.employee_id,
         task_title=instance.task.task_name,
         start_time=instance.start_time,
         end_time=instance.end_time
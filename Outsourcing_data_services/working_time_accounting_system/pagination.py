@@ -0,0 +1,116 @@
+import json
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+from django.utils.dateparse import parse_datetime
+from django.utils.encoding import force_str
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+class KeysetPaginator:
+    """Постраничный вывод по ключу (start_time, id) вместо OFFSET: страница начинается сразу после
+    (или перед) последней показанной записи, поэтому запрос читает из индекса
+    (employee_id, start_time, id) только page_size + 1 строк независимо от номера страницы.
+    Курсор — закодированная в base64 пара (start_time, id) граничной записи."""
+
+    def __init__(self, queryset, page_size):
+        self.queryset = queryset
+        self.page_size = page_size
+
+    @staticmethod
+    def encode_cursor(obj):
+        return urlsafe_base64_encode(f"{obj.start_time.isoformat()}|{obj.pk}".encode())
+
+    @staticmethod
+    def decode_cursor(cursor):
+        try:
+            start_time, pk = force_str(urlsafe_base64_decode(cursor)).split('|')
+            start_time, pk = parse_datetime(start_time), int(pk)
+        except (ValueError, UnicodeDecodeError):
+            raise InvalidCursor(f"Invalid cursor: '{cursor}'")
+        if start_time is None:
+            raise InvalidCursor(f"Invalid cursor: '{cursor}'")
+        return start_time, pk
+
+    def page_queryset(self, after=None, before=None):
+        """Запрос page_size + 1 записей страницы; для before — в обратном порядке."""
+        if before:
+            start_time, pk = self.decode_cursor(before)
+            # условие start_time <= ... дублирует OR, чтобы база могла искать по диапазону индекса
+            return self.queryset.filter(start_time__lte=start_time).filter(
+                Q(start_time__lt=start_time) | Q(pk__lt=pk)
+            ).order_by('-start_time', '-pk')[:self.page_size + 1]
+        rows = self.queryset.order_by('start_time', 'pk')
+        if after:
+            start_time, pk = self.decode_cursor(after)
+            rows = rows.filter(start_time__gte=start_time).filter(
+                Q(start_time__gt=start_time) | Q(pk__gt=pk)
+            )
+        return rows[:self.page_size + 1]
+
+    def paginate(self, rows, after=None, before=None):
+        if before:
+            has_previous, has_next = len(rows) > self.page_size, True
+            rows = rows[:self.page_size][::-1]
+        else:
+            has_previous, has_next = bool(after), len(rows) > self.page_size
+            rows = rows[:self.page_size]
+
+        previous_cursor = self.encode_cursor(rows[0]) if rows and has_previous else None
+        next_cursor = self.encode_cursor(rows[-1]) if rows and has_next else None
+        return rows, previous_cursor, next_cursor
+
+    def page(self, after=None, before=None):
+        """Возвращает (записи, курсор предыдущей страницы, курсор следующей страницы);
+        курсор равен None, если страницы в этом направлении нет."""
+        return self.paginate(list(self.page_queryset(after, before)), after, before)
+
+    async def apage(self, after=None, before=None):
+        """page для асинхронных представлений (чтение через async ORM)."""
+        return self.paginate([row async for row in self.page_queryset(after, before)], after, before)
+
+
+def estimate_count(queryset):
+    """Оценка числа строк запроса планировщиком PostgreSQL (None для других баз): для запроса без условий —
+    сумма reltuples секций таблицы из статистики (ANALYZE, autovacuum), для запроса с условиями —
+    число строк плана из EXPLAIN. Оба способа не читают саму таблицу."""
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+    with connection.cursor() as cursor:
+        if not queryset.query.where:
+            # для несекционированной таблицы pg_partition_tree возвращает ее саму
+            cursor.execute(
+                "SELECT coalesce(sum(greatest(c.reltuples, 0)), 0)::bigint "
+                "FROM pg_partition_tree(%s::regclass) t JOIN pg_class c ON c.oid = t.relid WHERE t.isleaf",
+                [queryset.model._meta.db_table],
+            )
+            return cursor.fetchone()[0]
+        sql, params = queryset.order_by().query.sql_with_params()
+        cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+        plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]['Plan']['Plan Rows'])
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator для списков админки по большим таблицам: COUNT(*) читает не больше threshold + 1 строк.
+    Если строк больше, используется оценка планировщика (estimate_count) — число страниц и результатов
+    приблизительно, и последние страницы могут оказаться пустыми. Небольшие выборки считаются точно,
+    даже если планировщик сильно переоценил их по условиям поиска."""
+
+    threshold = 100_000
+
+    @cached_property
+    def count(self):
+        estimate = estimate_count(self.object_list)
+        if estimate is None or estimate < self.threshold:
+            return super().count
+        bounded = self.object_list.order_by()[:self.threshold + 1].count()
+        return bounded if bounded <= self.threshold else max(estimate, bounded)
@@ -0,0 +1,126 @@
+import gzip
+import re
+from datetime import datetime
+from zoneinfo import ZoneInfo
+from django.conf import settings
+from django.db import connection, transaction
+
+
+def month_start(value):
+    """Начало месяца в TIME_ZONE проекта для даты или datetime."""
+    if isinstance(value, datetime) and value.tzinfo is not None:
+        value = value.astimezone(ZoneInfo(settings.TIME_ZONE))
+    return datetime(value.year, value.month, 1, tzinfo=ZoneInfo(settings.TIME_ZONE))
+
+
+def add_months(month, months):
+    index = month.year * 12 + month.month - 1 + months
+    return month.replace(year=index // 12, month=index % 12 + 1)
+
+
+# ограничение исключения для каждой секции Timesheet: PostgreSQL не поддерживает его на
+# секционированной таблице, если оно не включает ключ секционирования со сравнением на равенство
+TIMESHEET_PARTITION_SQL = (
+    "ALTER TABLE {partition} ADD CONSTRAINT {name}_no_overlap "
+    "EXCLUDE USING gist (employee_id WITH =, tstzrange(start_time, end_time, '[)') WITH &&)",
+)
+
+
+class MonthlyPartitions:
+    """Помесячные секции таблицы, секционированной PARTITION BY RANGE по столбцу column.
+    Секция за месяц называется <table>_pYYYY_MM, границы месяца считаются в TIME_ZONE проекта.
+    Строки, для которых секции нет, попадают в секцию <table>_default; при создании секции
+    подходящие строки переносятся из нее, поэтому секции можно досоздавать в любой момент.
+    partition_sql — дополнительные команды для новой секции (например, ограничения, которые
+    PostgreSQL не поддерживает на секционированной таблице); {partition} заменяется на имя секции
+    в кавычках, {name} — на имя без кавычек для построения имен ограничений."""
+
+    def __init__(self, table, column='start_time', partition_sql=()):
+        self.table = table
+        self.column = column
+        self.partition_sql = partition_sql
+
+    @property
+    def default_partition(self):
+        return f'{self.table}_default'
+
+    def partition_name(self, month):
+        return f'{self.table}_p{month:%Y_%m}'
+
+    def partitions(self):
+        """Помесячные секции таблицы: {начало месяца: имя секции}."""
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+                "WHERE i.inhparent = %s::regclass",
+                [self.table],
+            )
+            names = [row[0] for row in cursor.fetchall()]
+        pattern = re.compile(rf'^{re.escape(self.table)}_p(\d{{4}})_(\d{{2}})$')
+        partitions = {}
+        for name in names:
+            match = pattern.match(name)
+            if match:
+                partitions[month_start(datetime(int(match[1]), int(match[2]), 1))] = name
+        return dict(sorted(partitions.items()))
+
+    def create(self, month):
+        """Создает секцию за месяц, если ее еще нет. Возвращает имя созданной секции или None."""
+        month = month_start(month)
+        if month in self.partitions():
+            return None
+        name = self.partition_name(month)
+        table, partition, column = (connection.ops.quote_name(value) for value in (self.table, name, self.column))
+        default = connection.ops.quote_name(self.default_partition)
+        bounds = [month.isoformat(), add_months(month, 1).isoformat()]
+        with transaction.atomic(), connection.cursor() as cursor:
+            # секция заполняется строками из секции по умолчанию до подключения,
+            # иначе ATTACH PARTITION отклонит границы, пересекающиеся с ее строками
+            cursor.execute(f"CREATE TABLE {partition} (LIKE {table} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)")
+            cursor.execute(
+                f"WITH moved AS ("
+                f"DELETE FROM {default} WHERE {column} >= %s AND {column} < %s RETURNING *"
+                f") INSERT INTO {partition} SELECT * FROM moved",
+                bounds,
+            )
+            for sql in self.partition_sql:
+                cursor.execute(sql.format(partition=partition, name=name))
+            cursor.execute(
+                f"ALTER TABLE {table} ATTACH PARTITION {partition} "
+                f"FOR VALUES FROM ('{bounds[0]}') TO ('{bounds[1]}')"
+            )
+        return name
+
+    def create_ahead(self, months):
+        """Создает секции с текущего месяца на months месяцев вперед."""
+        current = month_start(datetime.now(ZoneInfo(settings.TIME_ZONE)))
+        return [name for offset in range(months + 1) if (name := self.create(add_months(current, offset)))]
+
+    def split_default(self):
+        """Переносит строки из секции по умолчанию в помесячные секции."""
+        default, column = connection.ops.quote_name(self.default_partition), connection.ops.quote_name(self.column)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT DISTINCT date_trunc('month', {column} AT TIME ZONE %s) FROM {default}",
+                [settings.TIME_ZONE],
+            )
+            months = [row[0] for row in cursor.fetchall()]
+        return [name for month in sorted(months) if (name := self.create(month))]
+
+    def older_than(self, cutoff):
+        """Секции, все строки которых раньше cutoff (месяц секции закончился не позже cutoff)."""
+        return [name for month, name in self.partitions().items() if add_months(month, 1) <= cutoff]
+
+    def dump(self, name, path):
+        """Выгружает секцию в сжатый gzip CSV с заголовком."""
+        with connection.cursor() as cursor, gzip.open(path, 'wt', encoding='utf-8', newline='') as output:
+            cursor.copy_expert(
+                f"COPY {connection.ops.quote_name(name)} TO STDOUT WITH (FORMAT csv, HEADER)", output
+            )
+
+    def drop(self, name):
+        """Отключает секцию от таблицы и удаляет ее."""
+        table, partition = connection.ops.quote_name(self.table), connection.ops.quote_name(name)
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(f"ALTER TABLE {table} DETACH PARTITION {partition}")
+            cursor.execute(f"DROP TABLE {partition}")
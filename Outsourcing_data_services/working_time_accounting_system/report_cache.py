@@ -0,0 +1,85 @@
+import hashlib
+import json
+import threading
+import time
+from asgiref.sync import sync_to_async
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import F
+
+_stats_lock = threading.Lock()
+_stats = {'hits': 0, 'misses': 0}
+
+
+def report_cache():
+    return caches['reports']
+
+
+def get_data_version():
+    """Текущая версия данных отчетов (ReportDataVersion). Если строки версии нет, она создается
+    со значением текущего времени, чтобы не совпасть ни с одной прежней версией."""
+    from .models import ReportDataVersion
+    version = ReportDataVersion.objects.filter(pk=ReportDataVersion.ROW).values_list('version', flat=True).first()
+    if version is None:
+        version = ReportDataVersion.objects.get_or_create(
+            pk=ReportDataVersion.ROW, defaults={'version': time.time_ns()}
+        )[0].version
+    return version
+
+
+def bump_data_version():
+    """UPDATE ... SET version = version + 1 атомарен, поэтому сдвиги версии из параллельных
+    процессов не теряются (инкремент файлового кэша читал и записывал значение раздельно)."""
+    from .models import ReportDataVersion
+    if not ReportDataVersion.objects.filter(pk=ReportDataVersion.ROW).update(version=F('version') + 1):
+        ReportDataVersion.objects.get_or_create(pk=ReportDataVersion.ROW, defaults={'version': time.time_ns()})
+
+
+def invalidate_reports():
+    """Сдвигает версию после фиксации транзакции, чтобы параллельный запрос
+    не закэшировал под новой версией еще не зафиксированные данные."""
+    transaction.on_commit(bump_data_version)
+
+
+def report_key(name, params):
+    digest = hashlib.md5(json.dumps(params, sort_keys=True, default=str).encode()).hexdigest()
+    return f"report:{get_data_version()}:{name}:{digest}"
+
+
+def count_lookup(hit):
+    with _stats_lock:
+        _stats['hits' if hit else 'misses'] += 1
+
+
+def cached_report(name, params, compute):
+    """Возвращает результат compute() из кэша по ключу (версия данных, имя отчета, параметры).
+    Старые версии не удаляются явно — они вытесняются по TTL и MAX_ENTRIES бэкенда."""
+    key = report_key(name, params)
+    cache = report_cache()
+    result = cache.get(key)
+    count_lookup(result is not None)
+    if result is None:
+        result = compute()
+        cache.set(key, result)
+    return result
+
+
+async def acached_report(name, params, compute):
+    """cached_report для асинхронных представлений; compute — корутинная функция."""
+    key = await sync_to_async(report_key)(name, params)
+    cache = report_cache()
+    result = await cache.aget(key)
+    count_lookup(result is not None)
+    if result is None:
+        result = await compute()
+        await cache.aset(key, result)
+    return result
+
+
+def cache_stats():
+    with _stats_lock:
+        stats = dict(_stats)
+    total = stats['hits'] + stats['misses']
+    stats['hit_ratio'] = round(stats['hits'] / total, 3) if total else 0
+    stats['data_version'] = get_data_version()
+    return stats
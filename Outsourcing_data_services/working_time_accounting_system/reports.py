@@ -0,0 +1,153 @@
+import asyncio
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections, connection, connections, router
+from django.db.models import F, Min, Window
+from django.db.models.functions import Rank
+from .models import Employee, Task, TimesheetRollup, ReportTaskHours, ReportTaskCost, ReportEmployeeHours
+
+REPORTS = ('long_tasks', 'cost_tasks', 'employees')
+
+# материализованные представления (миграция 0008): отчет -> (модель, поле значения, поле имени, делитель, знаков)
+REPORT_VIEWS = {
+    'long_tasks': (ReportTaskHours, 'seconds', 'task__task_name', 3600.0, 1),
+    'cost_tasks': (ReportTaskCost, 'rate_seconds', 'task__task_name', 3600.0, 2),
+    'employees': (ReportEmployeeHours, 'seconds', 'employee__employee_name', 3600.0, 1),
+}
+
+
+def table(model):
+    return connection.ops.quote_name(model._meta.db_table)
+
+
+def in_thread(func):
+    """Асинхронная обертка, выполняющая func в отдельном потоке пула со своим соединением с базой
+    (соединения в Django привязаны к потоку). В отличие от async ORM, которая выполняет все запросы
+    запроса по очереди в одном потоке, несколько таких вызовов через asyncio.gather идут в базе
+    параллельно. После вызова соединения потока закрываются так же, как в конце HTTP-запроса: сразу
+    при CONN_MAX_AGE = 0, иначе — когда истечет их срок или они окажутся неисправны."""
+
+    def run(*args, **kwargs):
+        try:
+            return func(*args, **kwargs)
+        finally:
+            close_old_connections()
+
+    return sync_to_async(run, thread_sensitive=False)
+
+
+def build_report(date_from=None, date_to=None, employee=None, task=None, position=None, top_n=5, reports=REPORTS):
+    """Считает рейтинги reports (часы по задачам, стоимость задач, часы сотрудников) одним запросом:
+    CTE агрегирует сводную таблицу TimesheetRollup с учетом фильтров, а RANK() OVER ранжирует итоги.
+    При равенстве значений в рейтинг попадают все записи с одинаковым местом, поэтому строк может быть
+    больше top_n. Фильтры: период по дням (включительно) и id сотрудника, задачи или должности."""
+    conditions, params = [], []
+    if date_from:
+        conditions.append('r.day >= %s')
+        params.append(date_from)
+    if date_to:
+        conditions.append('r.day <= %s')
+        params.append(date_to)
+    if employee:
+        conditions.append('r.employee_id = %s')
+        params.append(employee)
+    if task:
+        conditions.append('r.task_id = %s')
+        params.append(task)
+    if position:
+        conditions.append(f'r.employee_id IN (SELECT id FROM {table(Employee)} WHERE position_id = %s)')
+        params.append(position)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+
+    rankings = {
+        'long_tasks': (
+            "SELECT 'long_tasks' AS report, task_id AS entity_id, round(seconds / 3600.0, 1) AS value, "
+            "RANK() OVER (ORDER BY seconds DESC) AS rank FROM task_totals WHERE seconds > 0"
+        ),
+        'cost_tasks': (
+            "SELECT 'cost_tasks' AS report, task_id AS entity_id, round(rate_seconds / 3600.0, 2) AS value, "
+            "RANK() OVER (ORDER BY rate_seconds DESC) AS rank FROM task_totals WHERE rate_seconds > 0"
+        ),
+        'employees': (
+            "SELECT 'employees' AS report, employee_id AS entity_id, round(seconds / 3600.0, 1) AS value, "
+            "RANK() OVER (ORDER BY seconds DESC) AS rank FROM employee_totals WHERE seconds > 0"
+        ),
+    }
+    sql = (
+        f"WITH base AS ("
+        f"SELECT r.employee_id, r.task_id, sum(r.seconds) AS seconds, sum(r.rate_seconds) AS rate_seconds "
+        f"FROM {table(TimesheetRollup)} r {where} GROUP BY r.employee_id, r.task_id"
+        f"), task_totals AS ("
+        f"SELECT task_id, sum(seconds) AS seconds, sum(rate_seconds) AS rate_seconds FROM base GROUP BY task_id"
+        f"), employee_totals AS ("
+        f"SELECT employee_id, sum(seconds) AS seconds FROM base GROUP BY employee_id"
+        f"), ranked AS ("
+        f"{' UNION ALL '.join(rankings[name] for name in reports)}"
+        f") "
+        f"SELECT ranked.report, ranked.rank, ranked.value, coalesce(k.task_name, e.employee_name) "
+        f"FROM ranked "
+        f"LEFT JOIN {table(Task)} k ON ranked.report <> 'employees' AND k.id = ranked.entity_id "
+        f"LEFT JOIN {table(Employee)} e ON ranked.report = 'employees' AND e.id = ranked.entity_id "
+        f"WHERE ranked.rank <= %s "
+        f"ORDER BY ranked.report, ranked.rank, 4"
+    )
+    # сырой SQL не проходит через роутер: соединение для чтения (реплика или default) выбирается явно
+    with connections[router.db_for_read(TimesheetRollup)].cursor() as cursor:
+        cursor.execute(sql, params + [top_n])
+        rows = cursor.fetchall()
+
+    report = {name: [] for name in reports}
+    for name, rank, value, label in rows:
+        report[name].append({'rank': rank, 'name': label, 'value': float(value)})
+    return report
+
+
+async def abuild_report(top_n=5, **filters):
+    """build_report для асинхронных представлений: тот же единственный запрос выполняется в потоке пула,
+    а цикл событий тем временем обслуживает другие запросы. Рейтинги не разбиваются на параллельные
+    запросы — каждый из них заново агрегировал бы отфильтрованную сводную таблицу."""
+    return await in_thread(build_report)(top_n=top_n, **filters)
+
+
+def refresh_report_views(concurrently=True):
+    """Обновляет материализованные представления отчетов. CONCURRENTLY не блокирует чтение
+    во время обновления, но требует, чтобы представление уже было заполнено."""
+    with connection.cursor() as cursor:
+        for model, *_ in REPORT_VIEWS.values():
+            view = connection.ops.quote_name(model._meta.db_table)
+            cursor.execute(f"REFRESH MATERIALIZED VIEW {'CONCURRENTLY ' if concurrently else ''}{view}")
+
+
+def report_views_refreshed_at():
+    """Время самого старого из обновлений представлений — насколько устарели данные отчета."""
+    refreshed = [model.objects.aggregate(refreshed_at=Min('refreshed_at'))['refreshed_at']
+                 for model, *_ in REPORT_VIEWS.values()]
+    refreshed = [refreshed_at for refreshed_at in refreshed if refreshed_at is not None]
+    return min(refreshed, default=None)
+
+
+def build_report_from_views(top_n=5, reports=REPORTS):
+    """Тот же отчет, что и build_report без фильтров, но по материализованным представлениям:
+    ранжирование идет по заранее посчитанным итогам с индексом по значению."""
+    report = {}
+    for name in reports:
+        model, field, label, divisor, digits = REPORT_VIEWS[name]
+        rows = model.objects.annotate(
+            rank=Window(Rank(), order_by=F(field).desc()),
+        ).filter(rank__lte=top_n).order_by('rank', label).values_list('rank', label, field)
+        report[name] = [
+            {'rank': rank, 'name': title, 'value': round(value / divisor, digits)}
+            for rank, title, value in rows
+        ]
+    return report
+
+
+async def abuild_report_from_views(top_n=5):
+    """build_report_from_views для асинхронных представлений: представления читаются параллельно,
+    вместе с временем их обновления (refreshed_at)."""
+    *parts, refreshed_at = await asyncio.gather(
+        *(in_thread(build_report_from_views)(top_n, reports=(name,)) for name in REPORTS),
+        in_thread(report_views_refreshed_at)(),
+    )
+    report = {name: rows for part in parts for name, rows in part.items()}
+    report['refreshed_at'] = refreshed_at
+    return report
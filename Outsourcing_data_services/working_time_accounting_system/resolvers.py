@@ -0,0 +1,206 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .metrics import RESOLVER_LOOKUPS, RESOLVER_ENTRIES
+from .models import Position, Employee, Task
+
+
+class Resolver:
+    """Кэш объектов модели по значению уникального поля (имени или pk) — LRU в памяти процесса
+    не больше RESOLVER_CACHE_SIZE объектов, каждый живет RESOLVER_CACHE_TTL секунд.
+    resolve(keys) ищет ключи в LRU, затем в общем кэше Django (RESOLVER_CACHE_ALIAS, если задан)
+    и добирает оставшиеся одним запросом filter(<поле>__in=...). Отсутствующие в базе ключи
+    не кэшируются: созданный позже объект будет найден следующим запросом.
+
+    Внутри транзакции найденные объекты попадают в кэш только после ее фиксации — иначе после
+    отката в кэше остались бы созданные в ней объекты. Сохранение и удаление объекта модели
+    сбрасывает ее кэши (см. invalidate_resolvers); в общем кэше для этого сдвигается версия модели,
+    которая входит в ключи, и процессы, заметившие новую версию, очищают свои LRU."""
+
+    def __init__(self, name, model, field):
+        self.name = name
+        self.model = model
+        self.field = field
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        # номер очистки: объекты, прочитанные до очистки, не должны попасть в кэш после нее
+        self._generation = 0
+        self._shared_version = None
+
+    def get(self, key):
+        return self.resolve([key]).get(key)
+
+    def resolve(self, keys):
+        """Возвращает {ключ: объект} для ключей, которые есть в базе."""
+        keys = set(keys)
+        if not keys:
+            return {}
+        shared = shared_cache()
+        version = self.sync_version(shared)
+        generation = self._generation
+
+        found = {}
+        now = time.monotonic()
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is None:
+                    continue
+                expires_at, obj = entry
+                if expires_at <= now:
+                    del self._entries[key]
+                    continue
+                self._entries.move_to_end(key)
+                found[key] = obj
+        RESOLVER_LOOKUPS.inc(len(found), resolver=self.name, result='hit')
+
+        missing = keys - found.keys()
+        if missing and shared is not None:
+            shared_keys = {self.shared_key(version, key): key for key in missing}
+            shared_found = {shared_keys[cache_key]: obj for cache_key, obj in shared.get_many(shared_keys).items()}
+            RESOLVER_LOOKUPS.inc(len(shared_found), resolver=self.name, result='shared_hit')
+            found.update(shared_found)
+            missing -= shared_found.keys()
+            self.defer(self.store, generation, shared_found)
+
+        if missing:
+            RESOLVER_LOOKUPS.inc(len(missing), resolver=self.name, result='miss')
+            loaded = {
+                getattr(obj, self.field): obj
+                for obj in self.model.objects.filter(**{f'{self.field}__in': missing})
+            }
+            found.update(loaded)
+            self.defer(self.store, generation, loaded, version if shared is not None else None)
+        return found
+
+    def prime(self, objects):
+        """Добавляет в кэш созданные объекты (после фиксации текущей транзакции)."""
+        shared = shared_cache()
+        version = self.sync_version(shared)
+        self.defer(
+            self.store, self._generation, {getattr(obj, self.field): obj for obj in objects},
+            version if shared is not None else None,
+        )
+
+    @staticmethod
+    def defer(func, *args):
+        # вне транзакции on_commit выполняет функцию сразу
+        transaction.on_commit(lambda: func(*args))
+
+    def store(self, generation, objects, shared_version=None):
+        if not objects:
+            return
+        expires_at = time.monotonic() + settings.RESOLVER_CACHE_TTL
+        with self._lock:
+            if generation != self._generation:
+                return
+            for key, obj in objects.items():
+                self._entries[key] = (expires_at, obj)
+                self._entries.move_to_end(key)
+            while len(self._entries) > settings.RESOLVER_CACHE_SIZE:
+                self._entries.popitem(last=False)
+            size = len(self._entries)
+        RESOLVER_ENTRIES.set(size, resolver=self.name)
+        if shared_version is not None:
+            shared_cache().set_many(
+                {self.shared_key(shared_version, key): obj for key, obj in objects.items()},
+                timeout=settings.RESOLVER_CACHE_TTL,
+            )
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._generation += 1
+        RESOLVER_ENTRIES.set(0, resolver=self.name)
+
+    def version_key(self):
+        return f'resolver:{self.model._meta.label_lower}:version'
+
+    def shared_key(self, version, key):
+        # ключ хэшируется: имена могут содержать пробелы и быть длиннее допустимого в memcached
+        digest = hashlib.md5(str(key).encode()).hexdigest()
+        return f'resolver:{self.name}:{version}:{digest}'
+
+    def sync_version(self, shared):
+        """Текущая версия модели в общем кэше; если она сменилась, LRU процесса очищается."""
+        if shared is None:
+            return None
+        version = shared.get(self.version_key())
+        if version is None:
+            shared.add(self.version_key(), time.time_ns(), timeout=None)
+            version = shared.get(self.version_key())
+        if version != self._shared_version:
+            self.clear()
+            self._shared_version = version
+        return version
+
+    def bump_version(self):
+        shared = shared_cache()
+        if shared is None:
+            return
+        try:
+            shared.incr(self.version_key())
+        except ValueError:
+            shared.set(self.version_key(), time.time_ns(), timeout=None)
+
+    def stats(self):
+        lookups = {result: 0 for result in ('hit', 'shared_hit', 'miss')}
+        for (resolver, result), count in RESOLVER_LOOKUPS.totals().items():
+            if resolver == self.name:
+                lookups[result] = count
+        total = sum(lookups.values())
+        with self._lock:
+            size = len(self._entries)
+        return {
+            **lookups,
+            'hit_ratio': round((lookups['hit'] + lookups['shared_hit']) / total, 3) if total else 0,
+            'size': size,
+            'max_size': settings.RESOLVER_CACHE_SIZE,
+        }
+
+
+def shared_cache():
+    alias = settings.RESOLVER_CACHE_ALIAS
+    return caches[alias] if alias else None
+
+
+POSITIONS = Resolver('positions', Position, 'position_name')
+EMPLOYEES = Resolver('employees', Employee, 'employee_name')
+TASKS = Resolver('tasks', Task, 'task_name')
+POSITIONS_BY_ID = Resolver('positions_by_id', Position, 'pk')
+EMPLOYEES_BY_ID = Resolver('employees_by_id', Employee, 'pk')
+TASKS_BY_ID = Resolver('tasks_by_id', Task, 'pk')
+RESOLVERS = (POSITIONS, EMPLOYEES, TASKS, POSITIONS_BY_ID, EMPLOYEES_BY_ID, TASKS_BY_ID)
+
+
+def resolver_stats():
+    return {resolver.name: resolver.stats() for resolver in RESOLVERS}
+
+
+def clear_resolvers(model):
+    bumped = set()
+    for resolver in RESOLVERS:
+        if resolver.model is model:
+            resolver.clear()
+            if resolver.version_key() not in bumped:
+                resolver.bump_version()
+                bumped.add(resolver.version_key())
+
+
+@receiver(post_save, sender=Position)
+@receiver(post_delete, sender=Position)
+@receiver(post_save, sender=Employee)
+@receiver(post_delete, sender=Employee)
+@receiver(post_save, sender=Task)
+@receiver(post_delete, sender=Task)
+def invalidate_resolvers(sender, **kwargs):
+    """Кэши сбрасываются сразу — чтобы текущая транзакция не читала старые объекты — и еще раз
+    после фиксации, чтобы отбросить объекты, прочитанные параллельно до нее."""
+    clear_resolvers(sender)
+    transaction.on_commit(lambda: clear_resolvers(sender))
@@ -0,0 +1,70 @@
+from django.conf import settings
+from django.db import connection, transaction
+from .report_cache import invalidate_reports
+from .models import Position, Employee, Timesheet, TimesheetRollup
+
+
+def table(model):
+    return connection.ops.quote_name(model._meta.db_table)
+
+
+def rollup_upsert_sql(source, returning=False):
+    """SQL, который агрегирует таймшиты из source (подзапрос или CTE с колонками employee_id, task_id,
+    start_time, end_time) по (день, сотрудник, задача) и прибавляет результат к TimesheetRollup.
+    Параметры: TIME_ZONE и знак (1 — добавить таймшиты, -1 — вычесть). С returning запрос возвращает
+    id и seconds измененных строк — по ним после вычитания удаляются обнулившиеся (prune_rollups)."""
+    rollup = table(TimesheetRollup)
+    return (
+        f"INSERT INTO {rollup} (day, employee_id, task_id, seconds, rate_seconds) "
+        f"SELECT (t.start_time AT TIME ZONE %s)::date, t.employee_id, t.task_id, "
+        f"%s * sum(extract(epoch FROM t.end_time - t.start_time))::bigint, "
+        f"%s * sum(extract(epoch FROM t.end_time - t.start_time) * p.hourly_rate)::bigint "
+        f"FROM {source} t "
+        f"JOIN {table(Employee)} e ON e.id = t.employee_id "
+        f"JOIN {table(Position)} p ON p.id = e.position_id "
+        f"GROUP BY 1, 2, 3 "
+        f"ON CONFLICT (day, employee_id, task_id) DO UPDATE SET "
+        f"seconds = {rollup}.seconds + EXCLUDED.seconds, "
+        f"rate_seconds = {rollup}.rate_seconds + EXCLUDED.rate_seconds"
+        f"{' RETURNING id, seconds' if returning else ''}"
+    )
+
+
+def rollup_upsert_params(sign=1):
+    return [settings.TIME_ZONE, sign, sign]
+
+
+def apply_to_rollups(timesheets, sign=1):
+    """Прибавляет (sign=1) или вычитает (sign=-1) таймшиты из QuerySet одним запросом INSERT ... SELECT.
+    Строки, обнулившиеся после вычитания, удаляются."""
+    sql, params = timesheets.order_by().values(
+        'employee_id', 'task_id', 'start_time', 'end_time'
+    ).query.sql_with_params()
+    with connection.cursor() as cursor:
+        if sign > 0:
+            cursor.execute(rollup_upsert_sql(f"({sql})"), rollup_upsert_params(sign) + list(params))
+            return
+        cursor.execute(rollup_upsert_sql(f"({sql})", returning=True), rollup_upsert_params(sign) + list(params))
+        prune_rollups(cursor, [rollup_id for rollup_id, seconds in cursor.fetchall() if seconds == 0])
+
+
+def prune_rollups(cursor, ids):
+    """Удаляет обнулившиеся строки сводки с указанными id. Одним запросом с вычитанием это сделать нельзя:
+    строку, измененную в CTE, тот же запрос удалить уже не может. Без удаления таблица только росла бы
+    строками, в которых не осталось ни одного таймшита."""
+    if ids:
+        cursor.execute(f"DELETE FROM {table(TimesheetRollup)} WHERE id = ANY(%s) AND seconds = 0", [ids])
+
+
+def rebuild_rollups(employee_ids=None):
+    """Пересчитывает сводную таблицу с нуля — целиком или только для указанных сотрудников."""
+    with transaction.atomic():
+        timesheets = Timesheet.objects.all()
+        if employee_ids is None:
+            with connection.cursor() as cursor:
+                cursor.execute(f"TRUNCATE {table(TimesheetRollup)}")
+        else:
+            TimesheetRollup.objects.filter(employee_id__in=employee_ids).delete()
+            timesheets = timesheets.filter(employee_id__in=employee_ids)
+        apply_to_rollups(timesheets)
+        invalidate_reports()
@@ -0,0 +1,88 @@
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.utils.decorators import sync_and_async_middleware
+
+# алиас реплики, в которую идет чтение текущего запроса; None — чтение из default.
+# Контекст копируется в потоки sync_to_async, поэтому значение видят и запросы async-представлений
+_read_database = ContextVar('read_database', default=None)
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS', 'TRACE')
+PIN_COOKIE = 'db_primary_until'
+
+
+class ReplicaRouter:
+    """Запись, миграции и чтение по умолчанию — в default. Чтение внутри replica_reads идет в реплику,
+    если только в default не открыта транзакция: в ней запрос должен видеть собственные изменения."""
+
+    def db_for_read(self, model, **hints):
+        alias = _read_database.get()
+        if alias is None or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            # явный default: иначе Django читал бы связанные объекты из базы, откуда загружен объект
+            return DEFAULT_DB_ALIAS
+        return alias
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # реплики содержат те же данные, что и default
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db not in settings.DATABASE_REPLICAS
+
+
+def read_database():
+    """Алиас реплики, выбранной для текущего запроса, или None, если чтение идет из default."""
+    return _read_database.get()
+
+
+def is_pinned(request):
+    """Клиент недавно что-то изменил, и реплика может еще не получить эти изменения."""
+    try:
+        return float(request.COOKIES.get(PIN_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+
+@contextmanager
+def replica_reads(request=None):
+    """Направляет чтение внутри блока в случайную реплику из DATABASE_REPLICAS. Без реплик и для
+    клиента, закрепленного за default после изменения данных (см. replica_pin_middleware), чтение
+    остается в default."""
+    alias = None
+    if settings.DATABASE_REPLICAS and not (request is not None and is_pinned(request)):
+        alias = random.choice(settings.DATABASE_REPLICAS)
+    token = _read_database.set(alias)
+    try:
+        yield alias
+    finally:
+        _read_database.reset(token)
+
+
+def pin_to_primary(request, response):
+    if request.method not in SAFE_METHODS:
+        pin_until = time.time() + settings.DATABASE_REPLICA_PIN_SECONDS
+        response.set_cookie(
+            PIN_COOKIE, f'{pin_until:.3f}', max_age=settings.DATABASE_REPLICA_PIN_SECONDS, httponly=True,
+            samesite='Lax',
+        )
+    return response
+
+
+@sync_and_async_middleware
+def replica_pin_middleware(get_response):
+    """После POST, PUT, PATCH или DELETE клиент DATABASE_REPLICA_PIN_SECONDS секунд читает из default:
+    страница, на которую он перенаправлен, должна показать его изменения, даже если реплика отстает."""
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            return pin_to_primary(request, await get_response(request))
+    else:
+        def middleware(request):
+            return pin_to_primary(request, get_response(request))
+    return middleware
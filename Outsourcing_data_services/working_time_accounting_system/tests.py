@@ -1,3 +1,475 @@
-from django.test import TestCase
+import time
+from django.core.files.uploadedfile import SimpleUploadedFile
+from datetime import date, datetime
+from django.conf import settings
+from django.db import connection, transaction
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from .copy_import import TimesheetCopyImporter
+from .importers import TimesheetImporter
+from .intervals import IntervalIndex
+from .models import Position, Employee, Task, Timesheet, TimesheetRollup
+from .pagination import KeysetPaginator, InvalidCursor
+from .report_cache import cached_report
+from .reports import build_report
+from .resolvers import clear_resolvers
+from .rollups import rebuild_rollups
+from .routers import PIN_COOKIE, replica_pin_middleware, replica_reads
 
-# Create your tests here.
+
+def at(hour, minute=0, day=2, month=1):
+    return timezone.make_aware(datetime(2023, month, day, hour, minute))
+
+
+def csv_file(lines, name='timesheet.csv'):
+    return SimpleUploadedFile(name, ''.join(f'{line}\n' for line in lines).encode())
+
+
+class ImporterTestCase(TestCase):
+    """Кэши resolvers переживают откат транзакции теста, и импорт следующего теста получил бы из них
+    id откаченных записей, поэтому перед каждым тестом они очищаются."""
+
+    def setUp(self):
+        for model in (Position, Employee, Task):
+            clear_resolvers(model)
+
+
+class TimesheetCopyImporterTests(ImporterTestCase):
+    """Быстрый импорт (COPY) должен принимать и отклонять те же строки, что и построчный."""
+
+    @classmethod
+    def setUpTestData(cls):
+        position = Position.objects.create(position_name='Developer', hourly_rate=10)
+        cls.anna = Employee.objects.create(employee_name='Anna', position=position)
+        cls.boris = Employee.objects.create(employee_name='Boris', position=position)
+
+    def import_both(self, lines):
+        """Импортирует файл обоими способами (удаляя таймшиты между ними) и возвращает их результаты."""
+        results = []
+        for importer in (TimesheetImporter, TimesheetCopyImporter):
+            errors, count = importer.import_from_csv(csv_file(lines))
+            intervals = sorted(Timesheet.objects.values_list('task__task_name', 'start_time__hour', 'end_time__hour'))
+            results.append((errors, count, intervals))
+            Timesheet.objects.all().delete()
+        return results
+
+    def test_rejected_row_does_not_reject_later_rows(self):
+        lines = [
+            'A,Anna,2023-01-02 09:00:00,2023-01-02 10:00:00',
+            'B,Anna,2023-01-02 09:30:00,2023-01-02 18:00:00',
+            'C,Anna,2023-01-02 11:00:00,2023-01-02 12:00:00',
+        ]
+        errors, count = TimesheetCopyImporter.import_from_csv(csv_file(lines))
+        self.assertEqual(count, 2)
+        self.assertEqual(
+            sorted(Timesheet.objects.values_list('task__task_name', flat=True)), ['A', 'C']
+        )
+        self.assertEqual(len(errors), 1)
+        self.assertIn('Anna: A', errors[0])
+
+    def test_conflict_is_resolved_in_file_order(self):
+        # вторая строка начинается раньше первой, но принимается первая — как в построчном импорте
+        lines = [
+            'A,Anna,2023-01-02 10:00:00,2023-01-02 12:00:00',
+            'B,Anna,2023-01-02 09:00:00,2023-01-02 11:00:00',
+            'C,Boris,2023-01-02 09:00:00,2023-01-02 11:00:00',
+        ]
+        errors, count = TimesheetCopyImporter.import_from_csv(csv_file(lines))
+        self.assertEqual(count, 2)
+        self.assertEqual(sorted(Timesheet.objects.values_list('task__task_name', flat=True)), ['A', 'C'])
+        self.assertIn('Anna: A', errors[0])
+
+    def test_touching_intervals_and_duplicates(self):
+        lines = [
+            'A,Anna,2023-01-02 09:00:00,2023-01-02 10:00:00',
+            'B,Anna,2023-01-02 10:00:00,2023-01-02 11:00:00',
+            'A,Anna,2023-01-02 09:00:00,2023-01-02 10:00:00',
+        ]
+        errors, count = TimesheetCopyImporter.import_from_csv(csv_file(lines))
+        self.assertEqual((errors, count), ([], 2))
+
+    def test_impossible_date_rejects_only_its_row(self):
+        lines = [
+            'A,Anna,2023-01-02 09:00:00,2023-01-02 10:00:00',
+            'B,Anna,2029-02-30 09:00:00,2029-02-30 10:00:00',
+            'C,Anna,2023-01-02 24:00:00,2023-01-03 01:00:00',
+            'D,Boris,2024-02-29 09:00:00,2024-02-29 10:00:00',
+        ]
+        row_by_row, copy = self.import_both(lines)
+        self.assertEqual(row_by_row[1:], copy[1:])
+        self.assertEqual((len(copy[0]), copy[1]), (2, 2))
+
+    def test_matches_row_by_row_import(self):
+        lines = [
+            'A,Anna,2023-01-02 09:00:00,2023-01-02 10:00:00',
+            'B,Anna,2023-01-02 09:30:00,2023-01-02 18:00:00',
+            'C,Anna,2023-01-02 11:00:00,2023-01-02 12:00:00',
+            'D,Anna,2023-01-02 11:30:00,2023-01-02 13:00:00',
+            'C,Anna,2023-01-02 11:00:00,2023-01-02 12:00:00',
+            'E,Boris,2023-01-02 08:00:00,2023-01-02 20:00:00',
+            'F,Boris,2023-01-02 07:00:00,2023-01-02 09:00:00',
+            'G,Nobody,2023-01-02 07:00:00,2023-01-02 09:00:00',
+            'H,Boris,2023-01-02 21:00:00,2023-01-02 20:00:00',
+        ]
+        row_by_row, copy = self.import_both(lines)
+        self.assertEqual(row_by_row[1:], copy[1:])
+        self.assertEqual(len(row_by_row[0]), len(copy[0]))
+
+
+class IntervalIndexTests(SimpleTestCase):
+    def setUp(self):
+        self.index = IntervalIndex()
+        self.index.add(1, at(9), at(10), 1, 'Anna: A')
+        self.index.add(1, at(12), at(13), 2, 'Anna: B')
+
+    def test_touching_intervals_do_not_overlap(self):
+        self.assertIsNone(self.index.find_overlap(1, at(10), at(12)))
+        self.assertEqual(self.index.check(1, at(8), at(9), 3, 'Anna: C'), (IntervalIndex.OK, None))
+
+    def test_overlap_is_found_on_both_sides(self):
+        self.assertEqual(self.index.find_overlap(1, at(9, 30), at(11))[3], 'Anna: A')
+        self.assertEqual(self.index.find_overlap(1, at(11), at(12, 30))[3], 'Anna: B')
+        self.assertEqual(self.index.find_overlap(1, at(9, 15), at(9, 45))[3], 'Anna: A')
+        self.assertEqual(self.index.find_overlap(1, at(8), at(14))[3], 'Anna: B')
+
+    def test_other_employee_does_not_overlap(self):
+        self.assertIsNone(self.index.find_overlap(2, at(9), at(10)))
+
+    def test_check_adds_only_accepted_intervals(self):
+        status, overlap = self.index.check(1, at(9, 30), at(11), 3, 'Anna: C')
+        self.assertEqual((status, overlap[3]), (IntervalIndex.OVERLAP, 'Anna: A'))
+        # отклоненный интервал не попал в индекс и не мешает следующему
+        self.assertEqual(self.index.check(1, at(10), at(12), 3, 'Anna: C')[0], IntervalIndex.OK)
+        self.assertEqual(self.index.check(1, at(10), at(11), 4, 'Anna: D')[0], IntervalIndex.OVERLAP)
+
+    def test_duplicate_requires_same_task(self):
+        self.assertEqual(self.index.check(1, at(9), at(10), 1, 'Anna: A')[0], IntervalIndex.DUPLICATE)
+        self.assertEqual(self.index.check(1, at(9), at(10), 5, 'Anna: E')[0], IntervalIndex.OVERLAP)
+
+    def test_sweep(self):
+        rows = [
+            (1, at(9), at(12), 'a'),
+            (1, at(10), at(11), 'b'),
+            (1, at(11, 30), at(13), 'c'),
+            (1, at(13), at(14), 'd'),
+            (2, at(13, 30), at(15), 'e'),
+        ]
+        pairs = [(first[3], second[3]) for first, second in IntervalIndex.sweep(rows)]
+        # c пересекается с a, а не с закончившимся раньше b; d касается c; e — другой сотрудник
+        self.assertEqual(pairs, [('a', 'b'), ('a', 'c')])
+
+
+class TimesheetRollupTests(TestCase):
+    """Таймшит, переходящий через полночь (и границу месяца), целиком относится к дню своего начала."""
+
+    @classmethod
+    def setUpTestData(cls):
+        position = Position.objects.create(position_name='Developer', hourly_rate=10)
+        cls.employee = Employee.objects.create(employee_name='Anna', position=position)
+        cls.task = Task.objects.create(task_name='A')
+
+    def rollups(self):
+        # без фильтра seconds > 0: обнулившиеся строки должны удаляться
+        return list(TimesheetRollup.objects.values_list('day', 'seconds', 'rate_seconds'))
+
+    def create_night_shift(self):
+        return Timesheet.objects.create(
+            employee=self.employee, task=self.task, start_time=at(23, day=31), end_time=at(1, 30, day=1, month=2)
+        )
+
+    def test_add_and_subtract_across_midnight(self):
+        timesheet = self.create_night_shift()
+        self.assertEqual(self.rollups(), [(date(2023, 1, 31), 9000, 90000)])
+
+        timesheet.end_time = at(0, 30, day=1, month=2)
+        timesheet.save()
+        self.assertEqual(self.rollups(), [(date(2023, 1, 31), 5400, 54000)])
+
+        timesheet.delete()
+        self.assertEqual(self.rollups(), [])
+
+    def test_moved_timesheet_leaves_no_empty_row(self):
+        timesheet = Timesheet.objects.create(employee=self.employee, task=self.task, start_time=at(9), end_time=at(10))
+        timesheet.start_time, timesheet.end_time = at(9, day=3), at(10, day=3)
+        timesheet.save()
+        self.assertEqual(self.rollups(), [(date(2023, 1, 3), 3600, 36000)])
+
+    def test_bulk_delete_subtracts(self):
+        self.create_night_shift()
+        Timesheet.objects.create(employee=self.employee, task=self.task, start_time=at(9), end_time=at(10))
+        Timesheet.objects.filter(start_time__day=31).archive_and_delete()
+        self.assertEqual(self.rollups(), [(date(2023, 1, 2), 3600, 36000)])
+
+    def test_rebuild_matches_incremental_updates(self):
+        self.create_night_shift()
+        Timesheet.objects.create(employee=self.employee, task=self.task, start_time=at(9), end_time=at(10))
+        incremental = sorted(self.rollups())
+        # полный пересчет (TRUNCATE) нельзя выполнить внутри транзакции теста
+        rebuild_rollups([self.employee.pk])
+        self.assertEqual(sorted(self.rollups()), incremental)
+
+
+class ImportManifestTests(ImporterTestCase):
+    """Повторная загрузка файла пропускает импортированные строки, но возвращает удаленные после импорта."""
+
+    lines = [
+        'A,Anna,2023-01-02 09:00:00,2023-01-02 10:00:00',
+        'B,Anna,2023-01-02 11:00:00,2023-01-02 12:00:00',
+    ]
+
+    @classmethod
+    def setUpTestData(cls):
+        position = Position.objects.create(position_name='Developer', hourly_rate=10)
+        Employee.objects.create(employee_name='Anna', position=position)
+
+    def task_names(self):
+        return sorted(Timesheet.objects.values_list('task__task_name', flat=True))
+
+    def assertNoTimesheetQueries(self, lines):
+        """Импортирует файл с теми же строками, но другим содержимым (пустая строка в конце): все строки
+        известны, и таблица таймшитов не читается."""
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(TimesheetImporter.import_from_csv(csv_file(lines + [''])), ([], 0))
+        table = connection.ops.quote_name(Timesheet._meta.db_table)
+        self.assertEqual([query['sql'] for query in queries if table in query['sql']], [])
+
+    def test_known_rows_are_skipped_without_queries(self):
+        TimesheetImporter.import_from_csv(csv_file(self.lines))
+        self.assertNoTimesheetQueries(self.lines)
+
+    def test_unchanged_file_is_skipped(self):
+        TimesheetImporter.import_from_csv(csv_file(self.lines))
+        self.assertEqual(TimesheetImporter.import_from_csv(csv_file(self.lines)), ([], 0))
+        errors, count = TimesheetImporter.import_from_csv(csv_file(self.lines + ['C,Anna,2023-01-02 13:00:00,2023-01-02 14:00:00']))
+        self.assertEqual((errors, count), ([], 1))
+
+    def test_deleted_timesheets_are_imported_again(self):
+        TimesheetImporter.import_from_csv(csv_file(self.lines))
+        Timesheet.objects.filter(task__task_name='A').delete()
+        self.assertEqual(TimesheetImporter.import_from_csv(csv_file(self.lines)), ([], 1))
+        self.assertEqual(self.task_names(), ['A', 'B'])
+        # строки сверены с базой, и следующая загрузка снова пропускает их без проверки
+        self.assertNoTimesheetQueries(self.lines)
+
+    def test_timesheets_of_deleted_task_are_imported_again(self):
+        TimesheetImporter.import_from_csv(csv_file(self.lines))
+        Task.objects.get(task_name='B').delete()
+        self.assertEqual(TimesheetImporter.import_from_csv(csv_file(self.lines)), ([], 1))
+        self.assertEqual(self.task_names(), ['A', 'B'])
+
+    def test_changed_timesheet_is_imported_again(self):
+        TimesheetImporter.import_from_csv(csv_file(self.lines))
+        timesheet = Timesheet.objects.get(task__task_name='A')
+        timesheet.end_time = at(9, 30)
+        timesheet.save()
+        errors, count = TimesheetImporter.import_from_csv(csv_file(self.lines + ['C,Anna,2023-01-02 13:00:00,2023-01-02 14:00:00']))
+        # строка A проверена заново и пересекается с измененной записью, C — новая
+        self.assertEqual((len(errors), count), (1, 1))
+
+
+class ParallelImportTests(TransactionTestCase):
+    """Параллельный импорт дает тот же результат, что и построчный: части делятся по сотрудникам
+    (Anna и Boris попадают в одну часть из двух, Oleg и Ivan — в другую)."""
+
+    lines = [
+        'A,Anna,2023-01-02 09:00:00,2023-01-02 10:00:00',
+        'B,Oleg,2023-01-02 09:00:00,2023-01-02 10:00:00',
+        'C,Anna,2023-01-02 09:30:00,2023-01-02 11:00:00',
+        'D,Ivan,2023-13-02 09:00:00,2023-01-02 10:00:00',
+        'E,Boris,2023-01-02 12:00:00,2023-01-02 11:00:00',
+        'F,Nobody,2023-01-02 09:00:00,2023-01-02 10:00:00',
+        'G,Oleg,2023-01-02 09:45:00,2023-01-02 12:00:00',
+        'A,Anna,2023-01-02 09:00:00,2023-01-02 10:00:00',
+        'H,Ivan,2023-01-02 09:00:00,2023-01-02 10:00:00',
+        'B,Boris,2023-01-02 10:00:00,2023-01-02 11:00:00',
+    ]
+
+    def setUp(self):
+        position = Position.objects.create(position_name='Developer', hourly_rate=10)
+        for name in ('Anna', 'Boris', 'Oleg', 'Ivan'):
+            Employee.objects.create(employee_name=name, position=position)
+
+    def import_with(self, workers):
+        errors, count = TimesheetImporter.import_from_csv(csv_file(self.lines), incremental=False, workers=workers)
+        timesheets = sorted(Timesheet.objects.values_list(
+            'task__task_name', 'employee__employee_name', 'start_time', 'end_time'
+        ))
+        tasks = sorted(Task.objects.values_list('task_name', flat=True))
+        Task.objects.all().delete()
+        return errors, count, timesheets, tasks
+
+    def test_result_does_not_depend_on_workers(self):
+        serial, parallel = self.import_with(1), self.import_with(2)
+        self.assertEqual(serial, parallel)
+        errors, count, _, tasks = parallel
+        self.assertEqual(count, 4)
+        # ошибки в порядке строк: пересечение C, некорректная дата D, обратный интервал E,
+        # неизвестный сотрудник F, пересечение G (дубликат A пропускается без ошибки)
+        expected = ['Anna: A', '2023-13-02', 'Время окончания', 'Nobody', 'Oleg: B']
+        self.assertEqual(len(errors), len(expected))
+        for error, fragment in zip(errors, expected):
+            self.assertIn(fragment, error)
+        # задача создается только для разобранной строки, как и в построчном импорте
+        self.assertNotIn('D', tasks)
+        self.assertIn('F', tasks)
+
+
+@override_settings(CACHES={
+    **settings.CACHES, 'reports': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'tests'},
+})
+class ReportCacheTests(ImporterTestCase):
+    """Изменение таймшитов сдвигает версию данных после фиксации транзакции, и следующий отчет
+    строится заново, а не берется из кэша."""
+
+    lines = ['A,Anna,2023-01-02 09:00:00,2023-01-02 11:00:00']
+
+    @classmethod
+    def setUpTestData(cls):
+        position = Position.objects.create(position_name='Developer', hourly_rate=10)
+        cls.employee = Employee.objects.create(employee_name='Anna', position=position)
+        cls.task = Task.objects.create(task_name='A')
+
+    def employee_hours(self):
+        return [(row['name'], row['value']) for row in cached_report('report', {}, build_report)['employees']]
+
+    def test_save_invalidates_after_commit(self):
+        self.assertEqual(self.employee_hours(), [])
+        with self.captureOnCommitCallbacks() as callbacks:
+            Timesheet.objects.create(employee=self.employee, task=self.task, start_time=at(9), end_time=at(11))
+            # до фиксации версия прежняя, и отчет берется из кэша
+            self.assertEqual(self.employee_hours(), [])
+        for callback in callbacks:
+            callback()
+        self.assertEqual(self.employee_hours(), [('Anna', 2.0)])
+
+    def test_delete_invalidates(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            timesheet = Timesheet.objects.create(
+                employee=self.employee, task=self.task, start_time=at(9), end_time=at(11)
+            )
+        self.assertEqual(self.employee_hours(), [('Anna', 2.0)])
+        with self.captureOnCommitCallbacks(execute=True):
+            timesheet.delete()
+        self.assertEqual(self.employee_hours(), [])
+
+    def test_import_invalidates(self):
+        self.assertEqual(self.employee_hours(), [])
+        with self.captureOnCommitCallbacks(execute=True):
+            TimesheetImporter.import_from_csv(csv_file(self.lines))
+        self.assertEqual(self.employee_hours(), [('Anna', 2.0)])
+
+
+class KeysetPaginatorTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        position = Position.objects.create(position_name='Developer', hourly_rate=10)
+        task = Task.objects.create(task_name='A')
+        employees = [Employee.objects.create(employee_name=f'Employee {n}', position=position) for n in range(3)]
+        # по три таймшита с одинаковым началом у разных сотрудников: порядок внутри — по id
+        for hour in (9, 10, 11):
+            for employee in employees:
+                Timesheet.objects.create(employee=employee, task=task, start_time=at(hour), end_time=at(hour, 30))
+        cls.expected = list(Timesheet.objects.order_by('start_time', 'pk').values_list('pk', flat=True))
+
+    def paginator(self, page_size):
+        return KeysetPaginator(Timesheet.objects.all(), page_size)
+
+    def ids(self, rows):
+        return [row.pk for row in rows]
+
+    def test_forward_and_backward_with_ties(self):
+        paginator = self.paginator(2)
+        pages, after = [], None
+        while True:
+            rows, previous_cursor, next_cursor = paginator.page(after=after)
+            self.assertEqual(previous_cursor is None, after is None)
+            pages.append((self.ids(rows), previous_cursor))
+            if next_cursor is None:
+                break
+            after = next_cursor
+        self.assertEqual([pk for ids, _ in pages for pk in ids], self.expected)
+        self.assertEqual([len(ids) for ids, _ in pages], [2, 2, 2, 2, 1])
+
+        # назад от последней страницы — те же страницы в обратном порядке
+        before = pages[-1][1]
+        for ids, _ in reversed(pages[:-1]):
+            rows, previous_cursor, next_cursor = paginator.page(before=before)
+            self.assertEqual(self.ids(rows), ids)
+            self.assertIsNotNone(next_cursor)
+            before = previous_cursor
+        self.assertIsNone(before)
+
+    def test_exact_multiple_of_page_size(self):
+        paginator = self.paginator(3)
+        _, _, after = paginator.page()
+        _, _, after = paginator.page(after=after)
+        rows, _, next_cursor = paginator.page(after=after)
+        self.assertEqual(self.ids(rows), self.expected[6:])
+        self.assertIsNone(next_cursor)
+
+    def test_single_page(self):
+        rows, previous_cursor, next_cursor = self.paginator(len(self.expected)).page()
+        self.assertEqual(self.ids(rows), self.expected)
+        self.assertEqual((previous_cursor, next_cursor), (None, None))
+
+    def test_invalid_cursor(self):
+        for cursor in ('garbage', KeysetPaginator.encode_cursor(Timesheet(start_time=at(9), pk=1))[:-3] + '!!'):
+            with self.assertRaises(InvalidCursor):
+                self.paginator(2).page(after=cursor)
+
+
+class IngestApiAuthTests(TestCase):
+    def post(self, **headers):
+        return self.client.post(
+            reverse('api_positions'), [{'position_name': 'Developer', 'hourly_rate': 10}],
+            content_type='application/json', headers=headers,
+        )
+
+    @override_settings(INGEST_API_TOKEN='')
+    def test_disabled_without_token(self):
+        self.assertEqual(self.post().status_code, 403)
+        self.assertFalse(Position.objects.exists())
+
+    @override_settings(INGEST_API_TOKEN='secret')
+    def test_requires_token(self):
+        self.assertEqual(self.post().status_code, 401)
+        self.assertEqual(self.post(Authorization='Token wrong').status_code, 401)
+        response = self.post(Authorization='Token secret')
+        self.assertEqual((response.status_code, response.json()['created']), (200, 1))
+
+
+@override_settings(DATABASE_REPLICAS=['replica_1'], DATABASE_REPLICA_PIN_SECONDS=5)
+class ReplicaRouterTests(TransactionTestCase):
+    """Куда ReplicaRouter направляет чтение. Реплика в тестах не настроена, поэтому проверяется алиас,
+    выбранный для запроса (QuerySet.db), без подключения к нему. TransactionTestCase — потому что
+    TestCase выполняет каждый тест в транзакции, а в ней чтение всегда идет в default."""
+
+    def test_reads_go_to_replica_inside_replica_reads(self):
+        self.assertEqual(Timesheet.objects.all().db, 'default')
+        with replica_reads() as alias:
+            self.assertEqual(alias, 'replica_1')
+            self.assertEqual(Timesheet.objects.all().db, 'replica_1')
+        self.assertEqual(Timesheet.objects.all().db, 'default')
+
+    def test_reads_stay_on_default_inside_transaction(self):
+        with replica_reads(), transaction.atomic():
+            self.assertEqual(Timesheet.objects.all().db, 'default')
+
+    def test_unsafe_request_sets_pin_cookie(self):
+        middleware = replica_pin_middleware(lambda request: HttpResponse())
+        self.assertNotIn(PIN_COOKIE, middleware(RequestFactory().get('/')).cookies)
+        response = middleware(RequestFactory().post('/'))
+        self.assertGreater(float(response.cookies[PIN_COOKIE].value), time.time())
+
+    def test_pinned_request_reads_from_default(self):
+        request = RequestFactory().get('/')
+        request.COOKIES[PIN_COOKIE] = f'{time.time() + 5:.3f}'
+        with replica_reads(request) as alias:
+            self.assertIsNone(alias)
+            self.assertEqual(Timesheet.objects.all().db, 'default')
+        request.COOKIES[PIN_COOKIE] = f'{time.time() - 1:.3f}'
+        with replica_reads(request):
+            self.assertEqual(Timesheet.objects.all().db, 'replica_1')
@@ -1,13 +1,25 @@
 from django.urls import path
-from . import views
+from . import api, views
 
 
 urlpatterns = [
     path('', views.TimesheetManagementView.as_view(), name='timesheet_management'),
     path('import/', views.ImportDataFormView.as_view(), name='import_data'),
-    path('import_result/', views.ImportResultView.as_view(), name='import_result'),
+    path('import_result/<int:job_id>/', views.ImportResultView.as_view(), name='import_result'),
+    path('import_progress/<int:job_id>/', views.ImportProgressView.as_view(), name='import_progress'),
     path('report/', views.ReportView.as_view(), name='report'),
+    path('report/json/', views.ReportJsonView.as_view(), name='report_json'),
+    path('report/export/', views.ReportExportView.as_view(), name='report_export'),
+    path('report/cache_stats/', views.ReportCacheStatsView.as_view(), name='report_cache_stats'),
+    path('resolvers/cache_stats/', views.ResolverCacheStatsView.as_view(), name='resolver_cache_stats'),
     path('submit/', views.EmployeeTimesheetsFormView.as_view(), name='employee_timesheets_submit'),
+    path('employees/autocomplete/', views.EmployeeAutocompleteView.as_view(), name='employee_autocomplete'),
     path('timesheet_list/<int:employee_id>/', views.TimesheetListView.as_view(), name='timesheet_list'),
+    path('export/timesheets/', views.TimesheetExportView.as_view(), name='export_timesheets'),
     path('delete_timesheet/', views.DeleteTimesheetFormView.as_view(), name='delete_timesheet'),
+    path('bulk_delete_timesheets/', views.BulkDeleteTimesheetsFormView.as_view(), name='bulk_delete_timesheets'),
+    path('metrics', views.MetricsView.as_view(), name='metrics'),
+    path('api/positions/', api.PositionIngestView.as_view(), name='api_positions'),
+    path('api/employees/', api.EmployeeIngestView.as_view(), name='api_employees'),
+    path('api/timesheets/', api.TimesheetIngestView.as_view(), name='api_timesheets'),
 ]
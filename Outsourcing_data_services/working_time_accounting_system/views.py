@@ -1,29 +1,97 @@
-from django.shortcuts import render, redirect
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
-from django.urls import reverse_lazy
+from django.http import HttpResponse, JsonResponse
+from django.urls import reverse, reverse_lazy
 from django.views import View
-from .importers import PositionImporter, EmployeeImporter, TimesheetImporter
-from .forms import ImportForm, EmployeeTimesheetsForm, DeleteTimesheetForm
-from django.db import transaction, connection
-from django.db.models import Sum, F, ExpressionWrapper, IntegerField, FloatField, Q
-from .models import Timesheet
-from django.db.models.functions import Cast, Round, Extract
+from .autocomplete import cached_search_employees
+from .exports import aexport_response, atimesheet_rows, timesheet_rows, report_rows, TIMESHEET_HEADER, REPORT_HEADER
+from .forms import (
+    ImportForm, EmployeeTimesheetsForm, DeleteTimesheetForm, BulkDeleteTimesheetsForm, ReportFilterForm, TimesheetFilterForm,
+    TimesheetExportForm, ExportFormatForm,
+)
+from .jobs import enqueue_import
+from .metrics import render as render_metrics
+from .pagination import KeysetPaginator
+from .report_cache import acached_report, cache_stats
+from .reports import abuild_report, abuild_report_from_views
+from .resolvers import resolver_stats
+from .routers import replica_reads
+from django.db import transaction, connection, router
+from django.db.models import Q
+from .models import Timesheet, ImportJob
 from django.views.generic import TemplateView, ListView, FormView
 from django.db.models.signals import pre_delete
 
 
-class TimesheetListView(ListView):
+class ReplicaReadMixin:
+    """Чтение представления идет в реплику (см. routers.replica_reads) — для страниц, которые только
+    читают данные и допускают отставание реплики на доли секунды. Для async-представлений реплика
+    выбирается внутри корутины, чтобы значение действовало, пока она выполняется. TemplateResponse
+    отрисовывается здесь же: шаблон тоже читает данные (например, варианты полей выбора)."""
+
+    def dispatch(self, request, *args, **kwargs):
+        if self.view_is_async:
+            return self.adispatch(request, *args, **kwargs)
+        with replica_reads(request):
+            response = super().dispatch(request, *args, **kwargs)
+            if hasattr(response, 'render'):
+                response.render()
+        return response
+
+    async def adispatch(self, request, *args, **kwargs):
+        with replica_reads(request):
+            response = await super().dispatch(request, *args, **kwargs)
+            if hasattr(response, 'render'):
+                await sync_to_async(response.render)()
+        return response
+
+
+class TimesheetListView(ReplicaReadMixin, ListView):
+    """Таймшиты сотрудника по возрастанию start_time, постранично по ключу (см. KeysetPaginator).
+    Имена сотрудника и задачи загружаются тем же запросом через select_related.
+    Представление асинхронное: страница читается через async ORM."""
+
     template_name = 'index.html'
     context_object_name = 'timesheets'
 
-    def get_queryset(self):
-        employee_id = self.kwargs['employee_id']
-        return Timesheet.objects.filter(employee_id=employee_id)
+    async def get(self, request, *args, **kwargs):
+        self.filter_form = TimesheetFilterForm(request.GET or None)
+        filters = self.filter_form.cleaned_data if self.filter_form.is_valid() else {}
+
+        paginator = KeysetPaginator(
+            self.get_queryset(filters), filters.get('page_size') or TimesheetFilterForm.DEFAULT_PAGE_SIZE
+        )
+        self.object_list, self.previous_cursor, self.next_cursor = await paginator.apage(
+            filters.get('after'), filters.get('before')
+        )
+        return self.render_to_response(self.get_context_data())
+
+    def get_queryset(self, filters=None):
+        filters = filters or {}
+        return Timesheet.objects.filter(employee_id=self.kwargs['employee_id']).for_period(
+            filters.get('date_from'), filters.get('date_to')
+        ).select_related('employee', 'task')
+
+    def page_query(self, **cursor):
+        query = self.request.GET.copy()
+        query.pop('after', None)
+        query.pop('before', None)
+        query.update(cursor)
+        return query.urlencode()
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context["employee_timesheets_form"] = EmployeeTimesheetsForm()
         context["delete_timesheet_form"] = DeleteTimesheetForm()
+        context["bulk_delete_timesheets_form"] = BulkDeleteTimesheetsForm()
+        context["timesheet_filter_form"] = self.filter_form
+        context["export_query"] = self.page_query(employee=self.kwargs['employee_id'])
+        if self.previous_cursor:
+            context["previous_page_query"] = self.page_query(before=self.previous_cursor)
+        if self.next_cursor:
+            context["next_page_query"] = self.page_query(after=self.next_cursor)
         return context
 
 
@@ -36,7 +104,7 @@ class DeleteTimesheetFormView(FormView):
     def form_valid(self, form):
         timesheet_id = form.cleaned_data.get('timesheet_id')
         try:
-            timesheet = Timesheet.objects.get(id=timesheet_id)
+            timesheet = Timesheet.objects.select_related('employee').get(id=timesheet_id)
         except Timesheet.DoesNotExist:
             messages.error(self.request, f'Timesheet with ID {timesheet_id} does not exist')
             return redirect('timesheet_management')
@@ -47,6 +115,25 @@ class DeleteTimesheetFormView(FormView):
         return super().form_valid(form)
 
 
+class BulkDeleteTimesheetsFormView(FormView):
+    """Удаляет все таймшиты, подходящие под условия формы, одним запросом с архивацией в историю
+    (см. TimesheetQuerySet.archive_and_delete)."""
+
+    template_name = 'index.html'
+    form_class = BulkDeleteTimesheetsForm
+    success_url = reverse_lazy('timesheet_management')
+
+    def form_valid(self, form):
+        deleted = form.timesheets().archive_and_delete()
+        messages.success(self.request, f'{deleted} timesheets have been deleted')
+        return super().form_valid(form)
+
+    def form_invalid(self, form):
+        for error in form.errors.values():
+            messages.error(self.request, error.as_text())
+        return redirect('timesheet_management')
+
+
 class EmployeeTimesheetsFormView(FormView):
     form_class = EmployeeTimesheetsForm
     template_name = "index.html"
@@ -65,97 +152,142 @@ class TimesheetManagementView(TemplateView):
         context = super().get_context_data(**kwargs)
         context["employee_timesheets_form"] = EmployeeTimesheetsForm()
         context["delete_timesheet_form"] = DeleteTimesheetForm()
+        context["bulk_delete_timesheets_form"] = BulkDeleteTimesheetsForm()
         return context
 
 
 class ImportDataFormView(FormView):
+    """Файлы сохраняются на диск и ставятся в очередь фонового импорта (manage.py run_import_worker),
+    чтобы обработка больших файлов не упиралась в таймаут запроса."""
+
     template_name = 'import.html'
     form_class = ImportForm
-    success_url = reverse_lazy('import_result')
 
     def form_valid(self, form):
-        positions = form.cleaned_data['positions_file']
-        employees = form.cleaned_data['employees_file']
-        timesheets = form.cleaned_data['timesheets_file']
-
-        position_errors, position_count = PositionImporter.import_from_csv(positions)
-        employee_errors, employee_count = EmployeeImporter.import_from_csv(employees)
-        timesheet_errors, timesheet_count = TimesheetImporter.import_from_csv(timesheets)
-
-        for error in position_errors:
-            messages.error(self.request, error)
-        for error in employee_errors:
-            messages.error(self.request, error)
-        for error in timesheet_errors:
-            messages.error(self.request, error)
-
-        self.request.session['import_results'] = {
-            'position_count': position_count,
-            'employee_count': employee_count,
-            'timesheet_count': timesheet_count,
-        }
+        self.job = enqueue_import(
+            form.cleaned_data['positions_file'],
+            form.cleaned_data['employees_file'],
+            form.cleaned_data['timesheets_file'],
+            fast_import=form.cleaned_data['fast_import'],
+            incremental=form.cleaned_data['incremental'],
+        )
         return super().form_valid(form)
 
+    def get_success_url(self):
+        return reverse('import_result', args=[self.job.pk])
+
 
 class ImportResultView(TemplateView):
     template_name = 'import_result.html'
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        import_results = self.request.session.get('import_results', None)
-        if import_results:
-            context.update(import_results)
+        context['job'] = get_object_or_404(ImportJob, pk=self.kwargs['job_id'])
         return context
 
 
-class ReportView(TemplateView):
+class ImportProgressView(View):
+    def get(self, request, job_id):
+        job = get_object_or_404(ImportJob, pk=job_id)
+        return JsonResponse(job.progress())
+
+
+class ReportMixin:
+    """Отчет строится по сводной таблице TimesheetRollup (reports.build_report), поэтому время ответа
+    зависит от числа дней, сотрудников и задач, а не от объема таймшитов. Представления отчета
+    асинхронные: все три рейтинга считаются одним запросом в потоке пула (reports.abuild_report),
+    и процесс под ASGI обслуживает другие запросы, пока идет запрос к базе.
+    Результат кэшируется до следующего изменения данных (см. report_cache).
+    При REPORT_USE_MATERIALIZED_VIEWS отчет без фильтров читается из материализованных представлений,
+    а в refreshed_at передается время их последнего обновления."""
+
+    async def aget_report(self):
+        form = ReportFilterForm(self.request.GET or None)
+        # проверка формы обращается к базе (поля выбора сотрудника, задачи и должности)
+        params = await sync_to_async(form.report_params)()
+        filtered = any(value for key, value in params.items() if key != 'top_n')
+        if settings.REPORT_USE_MATERIALIZED_VIEWS and not filtered:
+            return form, params, await abuild_report_from_views(params['top_n'])
+        return form, params, await acached_report('report', params, lambda: abuild_report(**params))
+
+
+class ReportView(ReplicaReadMixin, ReportMixin, TemplateView):
     template_name = 'report.html'
 
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-        context['top5_long_tasks'] = self.top5_long_tasks()
-        context['top5_cost_tasks'] = self.top5_cost_tasks()
-        context['top5_employees'] = self.top5_employees()
-        return context
+    async def get(self, request, *args, **kwargs):
+        form, params, report = await self.aget_report()
+        context = self.get_context_data(form=form, top_n=params['top_n'], **report)
+        return self.render_to_response(context)
 
-    def top5_long_tasks(self):
-        long_tasks = (
-            Timesheet.objects.annotate(
-                spent_hours=ExpressionWrapper(
-                    Cast(Extract(F("end_time") - F("start_time"), 'epoch'), output_field=IntegerField()) / 3600,
-                    output_field=IntegerField()
-                )
-            ).values("task__task_name").annotate(
-                total_hours=Sum("spent_hours")
-            ).order_by("-total_hours")[:5]
-        )
-        return long_tasks
-
-    def top5_cost_tasks(self):
-        cost_tasks = (
-            Timesheet.objects.annotate(
-                spent_hours=ExpressionWrapper(
-                    Cast(Extract(F("end_time") - F("start_time"), 'epoch'), output_field=IntegerField()) / 3600,
-                    output_field=FloatField()
-                )
-            ).annotate(
-                total_cost=ExpressionWrapper(
-                    F("spent_hours") * F("employee__position__hourly_rate"),
-                    output_field=IntegerField()
-                )
-            ).values("task__task_name").annotate(
-                total_cost_sum=Sum("total_cost")
-            ).order_by("-total_cost_sum")[:5]
+
+class ReportJsonView(ReplicaReadMixin, ReportMixin, View):
+    async def get(self, request):
+        form, params, report = await self.aget_report()
+        if form.is_bound and not form.is_valid():
+            return JsonResponse({'errors': form.errors}, status=400)
+        return JsonResponse({'params': params, **report})
+
+
+class ReportExportView(ReplicaReadMixin, ReportMixin, View):
+    async def get(self, request):
+        form, params, report = await self.aget_report()
+        format_form = ExportFormatForm(request.GET)
+        if form.is_bound and not form.is_valid() or not format_form.is_valid():
+            return JsonResponse({'errors': {**form.errors, **format_form.errors}}, status=400)
+        return await aexport_response(
+            request, format_form.cleaned_data['format'], 'report', report_rows(report), REPORT_HEADER
         )
-        return cost_tasks
-
-    def top5_employees(self):
-        employees = (
-            Timesheet.objects.values("employee__employee_name").annotate(
-                total_hours=Round(
-                    Sum(Cast(Extract(F("end_time") - F("start_time"), 'epoch'), output_field=IntegerField())) / 3600,
-                    output_field=IntegerField()
-                )
-            ).order_by("-total_hours")[:5]
+
+
+class TimesheetExportView(ReplicaReadMixin, View):
+    """CSV повторяет формат timesheet.csv без заголовка, чтобы выгрузку можно было импортировать обратно."""
+
+    async def get(self, request):
+        form = TimesheetExportForm(request.GET)
+        if not await sync_to_async(form.is_valid)():
+            return JsonResponse({'errors': form.errors}, status=400)
+        data = form.cleaned_data
+        filters = {
+            'employee': data['employee'] and data['employee'].pk,
+            'task': data['task'] and data['task'].pk,
+            'date_from': data['date_from'],
+            'date_to': data['date_to'],
+        }
+        # CSV читается после выхода из представления, поэтому выбранная база передается в выгрузку явно
+        filters['using'] = router.db_for_read(Timesheet)
+        header = TIMESHEET_HEADER if data['format'] == 'xlsx' else None
+        return await aexport_response(
+            request, data['format'], 'timesheets', timesheet_rows(**filters), header, atimesheet_rows(**filters)
         )
-        return employees
+
+
+class ReportCacheStatsView(View):
+    def get(self, request):
+        return JsonResponse(cache_stats())
+
+
+class EmployeeAutocompleteView(ReplicaReadMixin, View):
+    """Подсказки сотрудников по началу имени, подстроке и похожести (см. autocomplete.search_employees):
+    ?q=<текст>&limit=<число>, не больше EMPLOYEE_AUTOCOMPLETE_MAX_LIMIT."""
+
+    def get(self, request):
+        try:
+            limit = int(request.GET.get('limit', settings.EMPLOYEE_AUTOCOMPLETE_LIMIT))
+        except ValueError:
+            return JsonResponse({'errors': ['limit must be an integer']}, status=400)
+        limit = max(1, min(limit, settings.EMPLOYEE_AUTOCOMPLETE_MAX_LIMIT))
+        return JsonResponse({'results': cached_search_employees(request.GET.get('q', ''), limit)})
+
+
+class ResolverCacheStatsView(View):
+    """Попадания, промахи и размер кэшей resolvers в этом процессе."""
+
+    def get(self, request):
+        return JsonResponse(resolver_stats())
+
+
+class MetricsView(View):
+    """Метрики процесса в текстовом формате Prometheus (см. metrics)."""
+
+    def get(self, request):
+        return HttpResponse(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,5 @@
+#!/bin/sh
+# Выполняется образом postgres при инициализации тома data: разрешает реплике (сервис db-replica)
+# подключаться для потоковой репликации тем же пользователем, что и приложение.
+set -e
+echo "host replication $POSTGRES_USER all md5" >> "$PGDATA/pg_hba.conf"